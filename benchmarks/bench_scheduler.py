@@ -0,0 +1,237 @@
+"""
+排程效能測試
+
+測量 `Task` 與 `BooFlow.run` 的排程成本，結果會輸出成 JSON ，可以與其他版本的結果比較。
+
+Usage:
+    $ python benchmarks/bench_scheduler.py --output result.json
+
+    $ python benchmarks/bench_scheduler.py --sizes 100 1000 1000000 --shapes chain random_layered
+
+    # 與舊版本的結果比較，任何一項變慢超過 20% 時 exit code 為 1
+    $ python benchmarks/bench_scheduler.py --compare baseline.json --threshold 1.2
+
+測量項目:
+    - build: `Task.__init__`
+    - build_memory: `Task.__init__` 的記憶體使用峰值 (tracemalloc)
+    - drain: 用 `next` / `report` 跑完所有任務 (全部成功)
+    - drain_with_failures: 用 `next` / `report` 跑完所有任務 (約 5% 的任務失敗)
+    - run: 以 `true` 當作任務指令，測量 `BooFlow.run` 的完整執行時間 (只在任務數量不超過 `--run-max-nodes` 時測量)
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from typing import List, Callable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from booflow import BooFlow, Task  # noqa: E402
+from dags import SHAPES  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+
+def timeit(func: Callable, repeat: int) -> float:
+    """執行 `repeat` 次，回傳最短的執行時間 (秒)"""
+
+    best = float("inf")
+
+    for _ in range(repeat):
+        gc.collect()
+
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def peak_memory(func: Callable) -> int:
+    """回傳執行 `func` 時的記憶體使用峰值 (bytes)，回傳值會保留到測量結束，才不會被提早釋放"""
+
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        result = func()  # noqa: F841
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def drain(order: List[tuple], faile_rate: float = 0.0, seed: int = 0):
+    """建立 `Task` 並以 `next` / `report` 跑完所有任務，每次會取出所有可執行的任務後再一起回報"""
+
+    rng = random.Random(seed)
+    task_obj = Task(order)
+
+    while not task_obj.is_empty:
+        ready = []
+        task_name = task_obj.next
+
+        while task_name is not None:
+            ready.append(task_name)
+            task_name = task_obj.next
+
+        for task_name in ready:
+            task_obj.report(task_name, rng.random() >= faile_rate)
+
+
+def booflow_run(order: List[tuple], names: List[str], max_workers: int):
+    """以 `true` 當作任務指令執行 `BooFlow.run`"""
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        config = {
+            "log_file_path": os.path.join(tmp_dir, "bench.log"),
+            "history_db": None,
+            "uptodate_cache": None,
+            "checkpoint_file": None,
+            "max_workers": max_workers,
+        }
+
+        tasks = [{"task_name": i, "command": "true"} for i in names]
+
+        BooFlow(tasks, order, config).run()
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.decode("utf8").strip() or "unknown"
+
+    except OSError:
+        return "unknown"
+
+
+def run_benchmarks(args) -> dict:
+    results = []
+
+    for shape in args.shapes:
+        for size in args.sizes:
+            order, names = SHAPES[shape](size)
+
+            def record(benchmark: str, measure: Callable[[], float], unit: str = "seconds"):
+                item = {"shape": shape, "edges": len(order), "nodes": len(names), "benchmark": benchmark}
+
+                # 例如遞迴太深，記錄錯誤後繼續測量其他項目
+                try:
+                    item[unit] = measure()
+                    text = f"{item[unit]:.6g} {unit}"
+
+                except Exception as e:
+                    item["error"] = f"{type(e).__name__}: {e}"
+                    text = item["error"]
+
+                results.append(item)
+                print(f"{shape:>15} {len(order):>9} edges  {benchmark:<20} {text}", flush=True)
+
+            record("build", lambda: timeit(lambda: Task(order), args.repeat))
+            record("build_memory", lambda: peak_memory(lambda: Task(order)), unit="bytes")
+            record("drain", lambda: timeit(lambda: drain(order), args.repeat))
+            record("drain_with_failures", lambda: timeit(lambda: drain(order, faile_rate=0.05), args.repeat))
+
+            if len(names) <= args.run_max_nodes:
+                record("run", lambda: timeit(lambda: booflow_run(order, names, args.max_workers), 1))
+
+    return {
+        "revision": git_revision(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """比較兩次的結果，回傳是否有任何一項變慢超過 `threshold` 倍"""
+
+    def key(i: dict):
+        return (i["shape"], i["edges"], i["benchmark"])
+
+    def value(i: dict) -> float:
+        return i.get("seconds", i.get("bytes"))
+
+    baseline_map = {key(i): value(i) for i in baseline["results"] if "error" not in i}
+
+    regressed = False
+
+    print(f"\ncompare with {baseline.get('revision')} ({baseline.get('label')})")
+
+    for i in current["results"]:
+        old = baseline_map.get(key(i))
+
+        if "error" in i:
+            if old:
+                regressed = True
+                print(f"{i['shape']:>15} {i['edges']:>9} edges  {i['benchmark']:<20} {i['error']}  <-- regression")
+
+            continue
+
+        if not old:
+            continue
+
+        ratio = value(i) / old
+        mark = ""
+
+        if ratio > threshold:
+            regressed = True
+            mark = "  <-- regression"
+
+        print(f"{i['shape']:>15} {i['edges']:>9} edges  {i['benchmark']:<20} x{ratio:.2f}{mark}")
+
+    return regressed
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="booflow 排程效能測試")
+    parser.add_argument("--shapes", nargs="+", default=list(SHAPES), choices=list(SHAPES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="每個 DAG 的邊數")
+    parser.add_argument("--repeat", type=int, default=3, help="每一項重複測量的次數 (取最短時間)")
+    parser.add_argument("--run-max-nodes", type=int, default=1000, help="只在任務數量不超過這個值時測量 BooFlow.run")
+    parser.add_argument("--max-workers", type=int, default=8, help="測量 BooFlow.run 時的 max_workers")
+    parser.add_argument("--label", default="", help="這次測量的標籤")
+    parser.add_argument("--output", help="結果輸出的 JSON 檔案")
+    parser.add_argument("--compare", help="要比較的舊結果 JSON 檔案")
+    parser.add_argument("--threshold", type=float, default=1.2, help="變慢超過幾倍時視為效能退步")
+
+    args = parser.parse_args(argv)
+
+    result = run_benchmarks(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf8") as f:
+            baseline = json.load(f)
+
+        if compare(result, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
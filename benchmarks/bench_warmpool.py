@@ -0,0 +1,129 @@
+"""
+warm pool 效能測試
+
+比較 `Cron.run` 執行很短的 Python script 時，每個任務從開始執行到結束的時間:
+
+- cold: 每次都啟動新的直譯器 (目前的執行方式)
+- warm: 由 `WarmPool` 中已經 import 好模組的直譯器 fork 出子程序執行
+
+測量用的 script 只會 import `--imports` 指定的模組並輸出一行文字，所以測量到的幾乎都是啟動成本。
+
+Usage:
+    $ python benchmarks/bench_warmpool.py
+
+    # 模擬 import pandas / numpy 的任務
+    $ python benchmarks/bench_warmpool.py --imports pandas numpy --runs 20 --output result.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from booflow import Cron  # noqa: E402
+from booflow.warmpool import WarmPool  # noqa: E402
+from bench_scheduler import git_revision  # noqa: E402
+
+
+def measure(script: str, runs: int, pool: WarmPool = None) -> List[float]:
+    """執行 `runs` 次 script ，回傳每次執行的時間 (秒)"""
+
+    durations = []
+
+    for _ in range(runs):
+        cron = Cron({"task_name": "bench", "command": f"{sys.executable} {script}"})
+        cron.warm_pool = pool
+
+        start = time.perf_counter()
+        result = cron.run()
+        durations.append(time.perf_counter() - start)
+
+        if not result[0]:
+            raise RuntimeError(f"script 執行失敗: {result}")
+
+    return durations
+
+
+def summary(durations: List[float]) -> dict:
+    ordered = sorted(durations)
+
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="booflow warm pool 效能測試")
+    parser.add_argument("--imports", nargs="*", default=["json", "decimal"], help="script 與 warm pool 預先 import 的模組")
+    parser.add_argument("--runs", type=int, default=50, help="每一種執行方式執行幾次")
+    parser.add_argument("--label", default="", help="這次測量的標籤")
+    parser.add_argument("--output", help="結果輸出的 JSON 檔案")
+
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        script = os.path.join(tmp_dir, "task.py")
+
+        with open(script, "w", encoding="utf8") as f:
+            f.writelines(f"import {i}\n" for i in args.imports)
+            f.write("print('done')\n")
+
+        start = time.perf_counter()
+        pool = WarmPool(size=1, preload=args.imports)
+        pool_start = time.perf_counter() - start
+
+        try:
+            # 先各執行一次，排除第一次讀取檔案的影響
+            measure(script, 1)
+            measure(script, 1, pool)
+
+            results = {"cold": summary(measure(script, args.runs)), "warm": summary(measure(script, args.runs, pool))}
+
+        finally:
+            pool.close()
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"imports: {args.imports}  runs: {args.runs}  warm pool start: {pool_start * 1000:.1f} ms")
+
+    for mode, item in results.items():
+        print(f"{mode:>5}  mean {item['mean'] * 1000:8.2f} ms  p50 {item['p50'] * 1000:8.2f} ms  p95 {item['p95'] * 1000:8.2f} ms")
+
+    print(f"speedup (p50): x{results['cold']['p50'] / results['warm']['p50']:.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(
+                {
+                    "revision": git_revision(),
+                    "label": args.label,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "timestamp": time.time(),
+                    "imports": args.imports,
+                    "runs": args.runs,
+                    "pool_start_seconds": pool_start,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
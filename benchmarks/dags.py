@@ -0,0 +1,84 @@
+"""
+測試用的 DAG 產生器
+
+每個產生器都會回傳 `(tasks_order, task_names)` ，可以直接給 `Task` 或 `BooFlow` 使用，
+`edges` 參數為大約的邊數 (任務順序數量)。
+"""
+
+import random
+from typing import List, Tuple, Callable, Dict
+
+__all__ = ["SHAPES", "chain", "fan_out", "fan_in", "diamond", "random_layered"]
+
+
+def _name(i: int) -> str:
+    return f"t{i}"
+
+
+def chain(edges: int) -> Tuple[List[tuple], List[str]]:
+    """一條長鏈: t0 -> t1 -> ... -> tN"""
+
+    names = [_name(i) for i in range(edges + 1)]
+
+    return [(names[i], names[i + 1]) for i in range(edges)], names
+
+
+def fan_out(edges: int) -> Tuple[List[tuple], List[str]]:
+    """一個任務完成後，所有其他任務都可以執行: t0 -> (t1 ... tN)"""
+
+    names = [_name(i) for i in range(edges + 1)]
+
+    return [(names[0], names[i]) for i in range(1, edges + 1)], names
+
+
+def fan_in(edges: int) -> Tuple[List[tuple], List[str]]:
+    """所有任務完成後，最後一個任務才能執行: (t1 ... tN) -> t0"""
+
+    names = [_name(i) for i in range(edges + 1)]
+
+    return [(names[i], names[0]) for i in range(1, edges + 1)], names
+
+
+def diamond(edges: int) -> Tuple[List[tuple], List[str]]:
+    """串接的菱形: a -> (b, c) -> d -> (e, f) -> g ...，每個菱形有 4 個邊"""
+
+    count = max(1, edges // 4)
+    names = [_name(i) for i in range(count * 3 + 1)]
+    order = []
+
+    for i in range(count):
+        top, left, right, bottom = names[i * 3], names[i * 3 + 1], names[i * 3 + 2], names[i * 3 + 3]
+        order.extend([(top, left), (top, right), (left, bottom), (right, bottom)])
+
+    return order, names
+
+
+def random_layered(edges: int, width: int = 100, fan: int = 4, seed: int = 0) -> Tuple[List[tuple], List[str]]:
+    """隨機的分層 DAG ，每一層有 `width` 個任務，每個任務會依賴前面幾層中隨機 `fan` 個任務"""
+
+    rng = random.Random(seed)
+
+    node_count = max(width + 1, edges // fan + width)
+    names = [_name(i) for i in range(node_count)]
+    order = []
+
+    for i in range(width, node_count):
+        layer_start = (i // width) * width
+        lower = max(0, layer_start - width * 3)
+
+        for _ in range(fan):
+            order.append((names[rng.randrange(lower, layer_start)], names[i]))
+
+            if len(order) >= edges:
+                return order, names[: i + 1]
+
+    return order, names
+
+
+SHAPES: Dict[str, Callable[[int], Tuple[List[tuple], List[str]]]] = {
+    "chain": chain,
+    "fan_out": fan_out,
+    "fan_in": fan_in,
+    "diamond": diamond,
+    "random_layered": random_layered,
+}
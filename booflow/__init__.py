@@ -19,13 +19,39 @@ Usage:
 """
 
 import os
+import json
+import time
+import queue
+import heapq
+import uuid
+import random
+import functools
+import asyncio
 import logging
+import logging.handlers
+import signal
+import tempfile
+import threading
 import subprocess
 from datetime import datetime
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from array import array
 from collections import deque, defaultdict
-from typing import List, Dict, Tuple, Optional
+from collections.abc import Mapping
+from typing import Any, Callable, List, Dict, Tuple, Optional
 
-__all__ = ["BooFlow"]
+from booflow.history import History
+from booflow import planner
+from booflow.metrics import SchedulerMetrics
+from booflow.checkpoint import Checkpoint
+from booflow.fanout import MapState, validate_map
+from booflow.resources import Resources
+from booflow.trace import Trace
+from booflow.uptodate import UpToDateCache
+from booflow.warmpool import WarmPool, WarmProcess, is_python_script
+from booflow.workflow import CompiledWorkflow, WorkflowError, compile_workflow, select_workflow
+
+__all__ = ["BooFlow", "WorkflowError"]
 
 
 class BooFlow:
@@ -54,26 +80,227 @@ class BooFlow:
 
         如果你有想要額外設定的參數
 
-        >>> config = {"log_file_path" : "./my_log.log"}
+        >>> config = {"log_file_path" : "./my_log.log", "max_workers" : 4, "scheduling" : "critical_path"}
+
+        `max_workers` 為同時執行的任務數量 (默認為 1，也就是依序執行)
+
+        `scheduling` 為可執行任務的排程策略，詳見 :class:`Task` ，任務過去的執行時間來自執行紀錄資料庫 (`history_db`)
 
         開始執行任務
 
         >>> bf = BooFlow(tasks, order, config)
         >>> bf.run()
+
+        如果是在 asyncio 的環境中，可以使用 :meth:`BooFlow.arun` ，不會阻塞 event loop
+
+        >>> result = await bf.arun()
+
+        如果上一次執行在途中被中斷，可以接續執行，已經成功的任務不會再執行
+
+        >>> bf.run(resume=True)
+
+        只執行流程中的一部分任務 (例如修正某個任務後，只重新執行它與它的下游任務)
+
+        >>> BooFlow(tasks, order, {"start_from" : ["task1"]}).run()
+
+        `targets` 為只執行目標任務與它們依賴的上游任務， `exclude` 為不執行的任務，詳見 :func:`booflow.workflow.select_workflow`
+
+        同一個 `BooFlow` 可以重複執行，任務依賴圖只會在建立時產生一次
     """
 
     def __init__(self, tasks: List[Dict], order: List[tuple], config: Optional[dict] = {}):
-        self.task_obj = Task(tasks_order=order)
+        self.config = config
+
+        # 檢查並編譯流程定義 (有錯誤時拋出 `WorkflowError`)，設定 `plan_cache` 時會快取編譯結果，詳見 :mod:`booflow.workflow`
+        self.plan_cache = self.config.get("plan_cache")
+        self.compiled = compile_workflow(tasks, order, cache_file=self.plan_cache)
+
+        # 只執行流程中的一部分任務，沒有被選到的任務不會進入任務依賴圖，詳見 :func:`select_workflow`
+        self.targets = self.config.get("targets")
+        self.start_from = self.config.get("start_from")
+        self.exclude = self.config.get("exclude")
+
+        # 完整流程的任務數量
+        self.total_task_count = len(self.compiled.names)
+
+        if self.targets or self.start_from or self.exclude:
+            tasks, order = select_workflow(self.compiled, tasks, order, self.targets, self.start_from, self.exclude)
+            self.compiled = compile_workflow(tasks, order)._replace(warnings=self.compiled.warnings)
+
         self.task_list = tasks
+        self.order = order
 
-        self.config = config
+        self.max_workers = self.config.get("max_workers", 1)
+
+        if not isinstance(self.max_workers, int) or self.max_workers < 1:
+            raise ValueError(f"max_workers 必須是大於 0 的整數，目前為: {self.max_workers}")
+
+        # 節點的 CPU 、記憶體容量與 pool 上限
+        resources = self.config.get("resources", {})
+        self.resources = Resources(resources.get("cpus"), resources.get("memory"), self.config.get("pools"))
+
+        # arun 同時執行的任務數量上限，默認與 max_workers 相同
+        self.max_concurrency = self.config.get("max_concurrency", self.max_workers)
+
+        if not isinstance(self.max_concurrency, int) or self.max_concurrency < 1:
+            raise ValueError(f"max_concurrency 必須是大於 0 的整數，目前為: {self.max_concurrency}")
 
         self._init_log_dir()
 
+        # 執行紀錄資料庫，設定為 None 時不紀錄
+        history_db = self.config.get("history_db", os.path.join(self._get_root_path(), "log", "history.db"))
+        self.history = History(history_db) if history_db else None
+
+        # 每個任務過去的執行時間 (秒)，只有 `critical_path` 排程會用到
+        self.durations = {}
+
+        if self.history is not None and self.config.get("scheduling") == Task.CRITICAL_PATH:
+            self.durations = self.history.task_durations()
+
+        # 任務增量執行快取，設定為 None 時每次都會執行所有任務
+        uptodate_cache = self.config.get(
+            "uptodate_cache", os.path.join(self._get_root_path(), "log", "uptodate.json")
+        )
+        self.uptodate = UpToDateCache(uptodate_cache) if uptodate_cache else None
+
+        # 執行狀態檢查點，設定為 None 時不紀錄 (也就無法接續執行)
+        checkpoint_file = self.config.get(
+            "checkpoint_file", os.path.join(self._get_root_path(), "log", "checkpoint.jsonl")
+        )
+        self.checkpoint = Checkpoint(checkpoint_file, self.compiled.fingerprint) if checkpoint_file else None
+
+        # 這次執行的 id
+        self.run_id = None
+
+        # 這次執行的任務輸出資料夾，詳見 :meth:`BooFlow._get_output_dir`
+        self.output_dir = None
+
+        # 這次執行中每個任務每一次執行的資訊 (執行時間與資源使用量)，詳見 `Cron.attempts`
+        self.task_attempts = {}
+
+        # 整個流程的執行期限 (秒)，超過時會中斷所有執行中與等待中的任務
+        self.deadline = self.config.get("deadline")
+
+        # 這次執行中因為超過執行期限 (或是被取消) 而被中斷的任務
+        self.cut_off_tasks = set()
+
+        # 是否有其他執行緒要求取消這次執行，以及用來喚醒等待中的排程迴圈的 future ，詳見 :meth:`BooFlow.cancel`
+        self._cancelled = threading.Event()
+        self._wakeup = None
+
+        # 排程監控指標，可以寫入 `metrics_file` (textfile collector) 或是透過 `metrics_port` 的 HTTP 服務取得
+        self.metrics = SchedulerMetrics()
+        self.metrics_file = self.config.get("metrics_file")
+        self.metrics_port = self.config.get("metrics_port")
+        self.metrics_interval = self.config.get("metrics_interval", 15)
+
+        self._metrics_server = None
+        self._metrics_written_at = None
+
+        # 這次執行的時間軸，只有在 `run` / `arun` 指定 `trace_file` 時才會紀錄
+        self._trace = None
+
+        # 這次執行同時執行的任務數量上限 ( `run` 為 `max_workers` ， `arun` 為 `max_concurrency`)
+        self._slots = self.max_workers
+
+        # 預先啟動的 Python 直譯器設定 ({"size", "preload", "python"})，設定為 None 時不使用，詳見 :mod:`booflow.warmpool`
+        self.warm_pool_config = self.config.get("warm_pool")
+        self._warm_pool = None
+
+        # task_name -> 任務設定
+        self._task_configs = {i["task_name"]: i for i in tasks}
+
+        # 延遲展開的 map 任務設定，詳見 :mod:`booflow.fanout`
+        self.map_configs = {i["task_name"]: i for i in tasks if "map" in i}
+
+        for map_config in self.map_configs.values():
+            validate_map(map_config)
+
+        # 執行中的 map 任務 (task_name -> MapState) ，以及還沒有回報最後結果的實例 (instance name -> (MapState, 參數, 實例設定))
+        self._active_maps: Dict[str, MapState] = {}
+        self._map_instances: Dict[str, Tuple[MapState, str, dict]] = {}
+
+        self.task_obj = Task(
+            tasks_order=order,
+            policy=self.config.get("scheduling", Task.FIFO),
+            durations=self.durations,
+            impact_index=bool(self.config.get("impact_report")),
+            compiled=self.compiled,
+        )
+
     def _init_log_dir(self):
         if not os.path.exists(os.path.join(self._get_root_path(), "log")):
             os.mkdir(os.path.join(self._get_root_path(), "log"))
 
+    def _resources_log(self, logger: "Logger", task_map: Dict[str, "Cron"]):
+        """紀錄節點資源容量，以及宣告的資源超過節點容量的任務"""
+
+        memory = "不限制" if self.resources.memory is None else f"{self.resources.memory}MB"
+
+        logger.logger.info(f"節點資源: cpus={self.resources.cpus} memory={memory} pools={self.resources.pools}")
+
+        for cron in task_map.values():
+            if self.resources.is_oversized(cron):
+                logger.logger.warning(
+                    f"任務 {cron.name} 宣告的資源 (cpus={cron.cpus} memory={cron.memory}MB) 超過節點容量，會以節點容量計算"
+                )
+
+    def _dispatch(self, logger: "Logger", submit: Callable[["Cron"], Any], task_map: Dict[str, "Cron"], pending: List[str], running: dict):
+        """將 `pending` 中資源足夠的任務交給 `submit` 開始執行，直到執行中的任務達到上限 ( `run` 的 `max_workers` 或是 `arun` 的 `max_concurrency`)
+
+        依照 `pending` 的順序檢查，第一個因為 CPU 或記憶體不足而無法執行的任務會保留它需要的資源，
+        後面的任務只能使用剩下的資源，這樣需要大量資源的任務不會一直被小任務插隊而等不到資源。
+
+        Args:
+            logger (Logger): log 紀錄器
+
+            submit (Callable[[Cron], Any]): 開始執行一次任務，回傳代表這次執行的 future (或是 asyncio.Task)
+
+            task_map (Dict[str, Cron]): task_name 與 Cron 物件之間的映射表
+
+            pending (List[str]): 等待資源的任務，開始執行的任務會被移除
+
+            running (dict): future -> Cron ，正在執行中的任務
+        """
+
+        reserved = None
+        waiting = []
+
+        for idx, task_name in enumerate(pending):
+            if len(running) >= self._slots:
+                waiting.extend(pending[idx:])
+                break
+
+            cron = task_map[task_name]
+
+            if not self.resources.pool_available(cron):
+                waiting.append(task_name)
+
+            elif self.resources.fits(cron, reserved or (0, 0)):
+                self.resources.acquire(cron)
+
+                extra = {"task": task_name, "attempt": cron.attempt + 1, "event": "start"}
+
+                if cron.attempt == 0:
+                    self.metrics.tasks_started.inc()
+                    logger.logger.info(f"開始執行任務: {task_name}", extra=extra)
+
+                else:
+                    logger.logger.info(f"重新嘗試執行 {task_name} (第 {cron.attempt + 1} 次執行)", extra=extra)
+
+                running[submit(cron)] = cron
+
+                if self._trace is not None:
+                    self._trace.start(task_name)
+
+            else:
+                if reserved is None:
+                    reserved = self.resources.demand(cron)
+
+                waiting.append(task_name)
+
+        pending[:] = waiting
+
     @staticmethod
     def _get_root_path() -> str:
         """取得專案根目錄
@@ -84,68 +311,134 @@ class BooFlow:
 
         return os.path.abspath(os.path.dirname(__name__))
 
-    def _generate_cron_dict(self, tasks: List[dict]) -> Dict[str, "Cron"]:
+    def _generate_cron_dict(self, tasks: List[dict], output_dir: Optional[str] = None) -> Dict[str, "Cron"]:
         """建立 task_name 與 Cron 物件之間的映射表
 
         Args:
             tasks (List[dict]): 排程任務清單
 
+            output_dir (Optional[str], optional): 任務輸出檔案存放的資料夾
+
         Returns:
             List[dict]: {"task_name1" : "Cron1", "task_name2" : "Cron2", ....}
         """
 
-        return {i["task_name"]: Cron(i) for i in tasks}
+        tail_size = self.config.get("output_tail_size", Cron.TAIL_SIZE)
 
-    def run(self):
-        """啟動排程"""
+        return {i["task_name"]: Cron(i, output_dir=output_dir, tail_size=tail_size) for i in tasks}
 
-        task_map = self._generate_cron_dict(self.task_list)
+    def _get_log_file(self) -> str:
+        """取得這次執行的 log 檔案路徑"""
 
         if self.config.get("log_file_path"):
-            logger = Logger("booflow", self.config["log_file_path"])
+            return self.config["log_file_path"]
 
-        else:
-            log_dir = os.path.join(self._get_root_path(), "log")
-            log_file = datetime.now().strftime("%Y-%m-%d_%H:%S") + ".log"
+        log_dir = os.path.join(self._get_root_path(), "log")
+        log_file = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".log"
+
+        return os.path.join(log_dir, log_file)
+
+    def _get_output_dir(self, log_file: str) -> str:
+        """取得這次執行的任務輸出資料夾
+
+        默認為 log 檔案所在資料夾中的 `output/<開始時間 (到微秒)>_<隨機字串>` ，
+        每次執行都是不同的資料夾 (即使是同一個 log 檔案)，不會覆蓋其他執行的輸出
+        """
 
-            logger = Logger("booflow", os.path.join(log_dir, log_file))
+        if self.config.get("output_dir"):
+            return self.config["output_dir"]
 
-        logger.logger.info("開始執行")
+        name = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}_{uuid.uuid4().hex[:8]}"
+
+        return os.path.join(os.path.dirname(log_file), "output", name)
+
+    def _init_logger(self, log_file: str, output_dir: str) -> "Logger":
+        """建立這次執行的 log 紀錄器，並記錄基本訊息"""
+
+        # 同一個 BooFlow 重複執行時，只需要還原任務狀態
+        if self.run_id is not None:
+            self.task_obj.reset()
+
+        self.run_id = uuid.uuid4().hex
+
+        logger = Logger("booflow", log_file, run_id=self.run_id, log_format=self.config.get("log_format", "text"))
+
+        self._run_start = time.monotonic()
+        self.task_attempts = {}
+        self.cut_off_tasks = set()
+        self._active_maps = {}
+        self._map_instances = {}
+
+        if self.history is not None:
+            self.history.start_run(self.run_id, time.time())
+
+        logger.logger.info(f"開始執行 (run id: {self.run_id})", extra={"event": "run_start"})
+        logger.logger.info(f"任務輸出存放位置: {output_dir}")
+        logger.logger.info(f"排程策略: {self.task_obj.policy}")
+
+        for warning in self.compiled.warnings:
+            logger.logger.warning(warning)
+
+        if len(self.compiled.names) < self.total_task_count:
+            logger.logger.info(
+                f"只執行選到的 {len(self.compiled.names)} / {self.total_task_count} 個任務 "
+                f"(targets: {self.targets}, start_from: {self.start_from}, exclude: {self.exclude})"
+            )
+
+        if self.config.get("impact_report"):
+            report = ", ".join(f"{name}={count}" for name, count in self.task_obj.impact_report())
+            logger.logger.info(f"失敗影響範圍 (失敗時會被取消的任務數量): {report}")
 
         # BETTER 這邊的 log 紀錄可能可以想辦法簡潔一點
         # 基本訊息
         logger.tasks_order_queue_log(self.task_obj.tasks_order_queue)
         logger.div_line()
 
-        while not self.task_obj.is_empty:
-            task_name = self.task_obj.next
+        return logger
 
-            logger.logger.info(f"開始執行任務: {task_name}")
+    def _restore(self, logger: "Logger", resume: bool):
+        """開啟檢查點，如果是接續執行，會從檢查點中還原已經成功的任務
 
-            result = task_map[task_name].run()
+        Args:
+            logger (Logger): log 紀錄器
 
-            if not result[0]:
-                logger.logger.error(
-                    f"任務 {task_name} 執行失敗，錯誤種類: {result[1]} ， 詳細錯誤訊息: \n{result[2]}"
-                )
+            resume (bool): 是否接續上一次的執行
+        """
 
-                while task_map[task_name].retry_time != 0:
-                    logger.logger.error(f"重新嘗試執行 {task_name} ...")
-                    result = task_map[task_name].retry()
+        if self.checkpoint is None:
+            return
 
-                self.task_obj.report(task_name, result[0])
+        statuses = None
 
-                logger.logger.info(
-                    f"因為 {task_name} 失敗，導致 {str(self.task_obj.faile_tasks[task_name])} 無法執行"
-                )
+        if resume:
+            if self.checkpoint.is_changed():
+                logger.logger.warning("任務清單或任務順序在上一次執行後已經改變，無法接續執行，將重新執行所有任務")
 
             else:
-                logger.logger.info(f"任務 {task_name} 執行完成")
-                self.task_obj.report(task_name, result[0])
+                statuses = self.checkpoint.load()
+
+                if statuses is None:
+                    logger.logger.info("沒有可以接續的執行紀錄，將重新執行所有任務")
+
+        if statuses is not None:
+            restored = self.task_obj.restore(name for name, status in statuses.items() if status)
 
+            logger.logger.info(f"接續上一次的執行，略過已經完成的任務: {str(restored)}")
             logger.div_line()
 
-        logger.logger.info("執行結束")
+        self.checkpoint.open(resume=statuses is not None)
+
+    def _finish(self, logger: "Logger") -> dict:
+        """紀錄執行結果
+
+        Returns:
+            dict: {"success_tasks" : 執行成功的任務, "faile_tasks" : 執行失敗的任務, "not_execute_tasks" : 沒有執行的任務,
+                "task_attempts" : {"task_name" : 每一次執行的資訊 (執行時間與資源使用量，詳見 `Cron.attempts`)},
+                "cut_off_tasks" : 因為超過執行期限 (`deadline`) 或是被取消而被中斷的任務 (也會包含在 `faile_tasks` 中),
+                "cancelled" : 這次執行是否被取消 (詳見 :meth:`BooFlow.cancel`)}
+        """
+
+        logger.logger.info("執行結束", extra={"event": "run_end", "duration": time.monotonic() - self._run_start})
         logger.logger.info(f"執行成功的任務: {str(self.task_obj.success_tasks)}")
 
         faile_tasks_list = set([i for i in self.task_obj.faile_tasks])
@@ -160,368 +453,2325 @@ class BooFlow:
 
         logger.logger.info(f"沒有執行的任務: {str(not_execute_task)}")
 
-        return "OK"
+        if self.cut_off_tasks:
+            logger.logger.warning(f"超過執行期限或被取消而中斷的任務: {str(self.cut_off_tasks)}")
 
+        if self.uptodate is not None:
+            self.uptodate.save()
 
-class Logger:
-    """封裝 `logging`"""
+        # 只有所有任務都成功 (或是已經是最新的) 時，檢查點才算完成；
+        # 有任務失敗、超過執行期限或是被取消時保留檢查點，下一次可以接續執行
+        if self.checkpoint is not None:
+            self.checkpoint.close(finished=not faile_tasks_list and not self.cut_off_tasks and not self._cancelled.is_set())
 
-    def __init__(self, log_name: str, log_file: str, level: int = logging.INFO):
-        logger = logging.getLogger(log_name)
-        formatter = logging.Formatter('[ %(asctime)s %(levelname)s] %(message)s')
-        file_handler = logging.FileHandler(log_file, mode='a')
-        file_handler.setFormatter(formatter)
+        if self.history is not None:
+            self.history.finish_run(self.run_id, time.time(), len(self.task_obj.success_tasks), len(faile_tasks_list))
 
-        logger.setLevel(level)
-        logger.addHandler(file_handler)
+        return {
+            "success_tasks": set(self.task_obj.success_tasks),
+            "faile_tasks": faile_tasks_list,
+            "not_execute_tasks": not_execute_task,
+            "task_attempts": dict(self.task_attempts),
+            "cut_off_tasks": set(self.cut_off_tasks),
+            "cancelled": self._cancelled.is_set(),
+        }
 
-        self.logger = logger
+    def run(self, resume: bool = False, trace_file: Optional[str] = None) -> dict:
+        """啟動排程
 
-    def tasks_order_queue_log(self, tasks_order_queue: deque):
-        """將 `tasks_order_queue` 資訊紀錄至 log 中"""
+        Args:
+            resume (bool, optional): 是否接續上一次被中斷的執行，已經成功的任務不會再執行
 
-        s = " -> ".join(list(tasks_order_queue))
+            trace_file (Optional[str], optional): 將這次執行的時間軸輸出到這個檔案 (Trace Event Format)，
+                可以用 Perfetto 或是 `chrome://tracing` 開啟，詳見 :class:`booflow.trace.Trace`
 
-        self.logger.info(f"任務清單: {s}")
+        Returns:
+            dict: 執行結果，詳見 :meth:`BooFlow._finish`
+        """
 
-    def div_line(self):
-        """分隔線"""
+        self._cancelled.clear()
+        self._wakeup = Future()
+        self._slots = self.max_workers
 
-        self.logger.info("-" * 20)
+        log_file = self._get_log_file()
+        output_dir = self.output_dir = self._get_output_dir(log_file)
 
+        task_map = self._generate_cron_dict(self.task_list, output_dir)
 
-class Cron:
-    """針對每一個 command 的類別"""
+        logger = self._init_logger(log_file, output_dir)
 
-    def __init__(self, config: dict) -> None:
-        """建立 Cron 實例
+        self._start_metrics()
+        self._trace = Trace(self.run_id) if trace_file else None
 
-        Args:
-            config (dict): 排程設定資訊
-        """
+        try:
+            self._restore(logger, resume)
 
-        self.name = config.get("task_name")
-        self.cmd = self.__parse_cmd(config.get("command"))
-        self.timeout = config.get("timeout")
+            self._resources_log(logger, task_map)
+            self._start_warm_pool(logger, task_map)
 
-        if config.get("retry") is None:
-            self.retry_time = 3
-        else:
-            self.retry_time = config.get("retry")
+            # future -> Cron ，正在執行中的任務
+            running = {}
 
-    def __repr__(self) -> str:
-        return f"Cron: {self.__format__} , Name: {self.name}, Cmd: {self.cmd}"
+            # 已經從 `Task` 取出，但還在等待資源的任務
+            pending = []
 
-    def __parse_cmd(self, cmd: str) -> list:
-        """將指令字串解析成 list
+            # 等待重新執行的任務 (開始時間, 序號, task_name)，等待期間不會佔用 worker 與資源
+            retries = []
+            retry_seq = 0
 
-        Args:
-            cmd (str): 指令字串，例如 "python3 main.py".
+            # 每次最多從 `Task` 取出多少個任務來檢查資源
+            window = max(64, self.max_workers * 4)
 
-        Returns:
-            list: 回傳解析後的指令 => ["python3", "main.py"]
-        """
+            deadline_at = self._deadline_at()
 
-        return cmd.split()
+            # 是否已經中斷過執行中的任務，之後只需要等待它們結束，不需要再依照執行期限喚醒
+            cut_off = False
 
-    def run(self) -> Tuple[bool, str, str]:
-        """執行指令
-            會分成以下幾種狀況
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                submit = functools.partial(executor.submit, self._execute_task)
 
-            1. 執行成功，則回傳 (True, None, stdout)
-            2. 程式錯誤，則回傳 (False, "program error", stderr)
-            3. 執行逾時，則回傳 (False, "time out", None)
-            4. 未知錯誤，則回傳 (False, "unknow error", error)
+                while not self.task_obj.is_empty or running or pending or retries or self._active_maps:
+                    if cut_off or self._should_cut_off(deadline_at):
+                        # 超過執行期限或被取消後不會再開始新的任務
+                        cut = pending + [i[2] for i in retries]
 
-        Returns:
-            Tuple[bool, str]: 詳見說明
-        """
+                        pending.clear()
+                        retries.clear()
 
-        try:
-            r = subprocess.run(
-                self.cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=self.timeout,
-            )
+                        # 中斷後才變成可以執行的任務 (例如上游任務剛好在中斷前完成) 也會標記為被中斷
+                        self._cut_off(logger, task_map, cut, () if cut_off else running.values())
 
-            if r.stderr:
-                return (
-                    False,
-                    "program error",
-                    r.stderr.decode("utf8").replace("\n", ""),
-                )
+                        cut_off = True
+                        deadline_at = None
 
-            else:
-                return (True, None, r.stdout.decode("utf8").replace("\n", ""))
+                        if self._expand_maps(logger, task_map, pending):
+                            continue
 
-        except subprocess.TimeoutExpired:
-            return (False, "time out", None)
+                    else:
+                        # 時間到的重新執行任務優先執行
+                        now = time.monotonic()
+                        due = []
 
-        except Exception as e:
-            return (False, "unknow error", str(e))
+                        while retries and retries[0][0] <= now:
+                            due.append(heapq.heappop(retries)[2])
 
-    def retry(self) -> Tuple[bool, str, str]:
-        """重新執行一次 run 函示，並將 retry_time 減 1
+                        pending[:0] = due
 
-        Returns:
-            Tuple[bool, str, str]: run 函示的回傳值
-        """
+                        while len(pending) < window:
+                            task_name = self.task_obj.next
 
-        if self.retry_time == 0:
-            return
+                            if task_name is None:
+                                break
 
-        self.retry_time -= 1
+                            if task_name in self.map_configs:
+                                self._start_map(logger, task_name)
+                                continue
 
-        return self.run()
+                            pending.append(task_name)
 
+                        # 有 map 任務完成時，下游任務可能已經可以執行，重新從 `Task` 取出
+                        if self._expand_maps(logger, task_map, pending):
+                            continue
 
-class Task:
-    """任務佇列管理
+                        if self.task_obj.policy == Task.CRITICAL_PATH:
+                            pending.sort(key=lambda i: (task_map[i].attempt == 0, -self._rank(i)))
 
-    管理任務執行的順序，會根據演算法給出在目前狀態下，可以執行的任務名稱。
+                        self._dispatch(logger, submit, task_map, pending, running)
 
-    Args:
-        - tasks_orders (List[tuple]): 任務順序清單
+                    self.metrics.ready_tasks.set(self.task_obj.ready_count + len(pending) + len(retries))
+                    self.metrics.running_tasks.set(len(running))
 
-    Attribute:
+                    if not running:
+                        if retries:
+                            # 等待期間被取消時會提早結束
+                            wait([self._wakeup], timeout=self._wait_timeout(retries, deadline_at))
+                            continue
 
-        - tasks_order_queue (dequeu): 任務執行佇列。
+                        break
 
-        - next (str): 回傳一個在目前狀態可以執行的任務名稱 (也就是說這個任務的依賴任務已經完成)。
+                    # 被取消時 `_wakeup` 會完成，讓等待提早結束
+                    waiting = running if self._wakeup.done() else [*running, self._wakeup]
 
-        - is_empty (bool): 檢查目前的任務佇列是否為空的，如果是空的回傳 `True` ，反之回傳 `False`。
+                    done, _ = wait(
+                        waiting, timeout=self._wait_timeout(retries, deadline_at), return_when=FIRST_COMPLETED
+                    )
 
-        - success_task (set): 順利執行完成的任務集合。
+                    for future in done:
+                        if future is self._wakeup:
+                            continue
 
-        - faile_task (defaultidict(set)): 執行失敗的任務字典 ( 其中 `key` 為失敗的任務名稱，而 `value` 為因為依賴這個任務而無法執行的任務集合) 。
+                        cron = running.pop(future)
+                        result = future.result()
 
-    Usage:
-        - 初始化物件時會自動產生任務有向圖等相關屬性。
-        - 使用 :meth:`Task.next` 取得一個目前狀態下可以開始執行的任務名。
-        - 使用 :meth:`Task.is_empty` 來檢查任務佇列是否為空。
-        - 使用 :meth:`Task.remove_faile_task()` 移除一個失敗的任務，如果有其他任務依賴這個任務，也會被移除，並將相關訊息記錄到 `faile_task` 中，並且會自動更新 `graph` 、 `tasks_order` 等。
-        - 使用 :meth:`Task.remove_success_task()` 移除一個成功的任務，並且將訊息記錄到 `success_tasks` 中，並且會自動更新 `graph` 、 `tasks_order` 等。
-    """
+                        self.resources.release(cron)
+                        self._trace_finish(cron, result)
 
-    def __init__(self, tasks_order: List[tuple]):
-        self._tasks_order = tasks_order
+                        if not result[0] and cron.retry_time > 0 and not cron.cut_off:
+                            delay = cron.next_retry_delay()
 
-        # 獨立的任務佇列 ( 沒有依賴其他任務 )
-        self._independent_tasks_queue = deque()
+                            self._report_retry(logger, cron, result, delay)
 
-        # 先把 tasks_order 轉換成 graph
-        self._graph, self._indegree, self._reverse_dependencies_graph = self._tasks_order_to_graph(
-            self._tasks_order
-        )
+                            heapq.heappush(retries, (time.monotonic() + delay, retry_seq, cron.name))
+                            retry_seq += 1
 
-        self.tasks_order_queue = self._gen_tasks_queue(self._graph, self._indegree)
-        self.success_tasks = set()
-        self.faile_tasks = defaultdict(set)
+                        else:
+                            self._report_task(logger, cron, result)
 
-    def _tasks_order_to_graph(
-        self, tasks_order: List[tuple]
-    ) -> Tuple[defaultdict, defaultdict, defaultdict]:
-        """將任務順序列表轉換成有向圖，前兩個回傳的值可以給 :meth:`Task._gen_tasks_queue` 當參數傳入
+            return self._finish(logger)
+
+        finally:
+            self._wakeup = None
+            self._stop_warm_pool()
+            self._stop_metrics()
+            self._save_trace(logger, trace_file)
+            logger.close()
+
+    async def arun(self, resume: bool = False, trace_file: Optional[str] = None) -> dict:
+        """在 asyncio event loop 中啟動排程
+
+        所有可以執行的任務都會在同一個執行緒中以 asyncio subprocess 執行，
+        同時執行的任務數量由 `max_concurrency` 限制，任務宣告的 `cpus` 、 `memory` 與 `pool` 也與 `run` 相同會被限制。
 
         Args:
-            tasks_order (List[tuple]): 任務順序清單
+            resume (bool, optional): 是否接續上一次被中斷的執行，詳見 :meth:`BooFlow.run`
+
+            trace_file (Optional[str], optional): 時間軸輸出檔案，詳見 :meth:`BooFlow.run` ，
+                每個軌道代表 `max_concurrency` 中的一個執行位置
 
         Returns:
-            Tuple[defaultdict, defaultdict, defaultdict]: ( 有向圖資料結構 (`graph`), 入度字典 (`indegree`), 反向關聯有向圖 (`reverse_dependencies_graph`) )
+            dict: 執行結果，詳見 :meth:`BooFlow._finish`
         """
-        graph = defaultdict(set)
-        indegree = defaultdict(int)
-        # 加入反向關聯
-        reverse_dependencies = defaultdict(set)
 
-        for start, end in tasks_order:
-            if end not in graph[start]:
-                graph[start].add(end)
-                indegree[start]
-                indegree[end] += 1
-                reverse_dependencies[end].add(start)
+        self._cancelled.clear()
+        self._wakeup = asyncio.get_running_loop().create_future()
+        self._slots = self.max_concurrency
 
-        return graph, indegree, reverse_dependencies
+        log_file = self._get_log_file()
+        output_dir = self.output_dir = self._get_output_dir(log_file)
 
-    def _gen_tasks_queue(self, graph: defaultdict, indegree: defaultdict) -> deque:
-        """生成 tasks 執行順序佇列，在使用這個方法前，應該執行 :meth:`Task._tasks_order_to_graph` 方法
+        task_map = self._generate_cron_dict(self.task_list, output_dir)
 
-        Args:
-            graph (defaultdict): 經由 :meth:`Task._tasks_order_to_graph` 生成的 graph.
+        logger = self._init_logger(log_file, output_dir)
 
-            indegree (defaultdict): 經由 :meth:`Task._tasks_order_to_graph` 生成的 indegree.
+        self._start_metrics()
+        self._trace = Trace(self.run_id) if trace_file else None
 
-        Returns:
-            deque: 任務執行順序佇列
-        """
+        try:
+            self._restore(logger, resume)
 
-        task_queue = deque()
-        queue = deque()
+            self._resources_log(logger, task_map)
 
-        for idx, item in indegree.items():
-            if item == 0:
-                queue.append(idx)
+            # 結束的任務會由 done callback 放入，每個任務結束只需要 O(1) ，不需要每次都檢查所有執行中的任務；
+            # 被取消時 `_wakeup` 也會放入，讓等待提早結束
+            completed = asyncio.Queue()
+            self._wakeup.add_done_callback(completed.put_nowait)
 
-        while queue:
-            current_task = queue.popleft()
-            task_queue.append(current_task)
-            for next_task in graph[current_task]:
-                indegree[next_task] -= 1
-                if indegree[next_task] == 0:
-                    queue.append(next_task)
+            submit = functools.partial(self._asubmit, completed)
 
-        return task_queue
+            # asyncio.Task -> Cron ，正在執行中的任務
+            running = {}
 
-    def _remove_faile_task(self, graph: defaultdict, target: str, root_target: str):
-        """輔助 :meth:`Task.remove_faile_task` 方法，使用遞迴的方式刪除跟 `target` 相關的節點，並將刪除的任務加入 `faile_tasks`
+            # 已經從 `Task` 取出，但還在等待資源的任務，與 `run` 相同，只有開始執行時才會建立 coroutine
+            pending = []
 
-        Args:
-            graph (defaultdict): 要從哪個 graph 中刪除節點
+            # 等待重新執行的任務 (開始時間, 序號, task_name)，等待期間不會佔用執行位置與資源
+            retries = []
+            retry_seq = 0
 
-            target (str): 要刪除的任務名 (節點)
-        """
+            # 每次最多從 `Task` 取出多少個任務來檢查資源
+            window = max(64, self.max_concurrency * 4)
 
-        if graph.get(target):
-            target_items = graph[target]
+            deadline_at = self._deadline_at()
 
-            del graph[target]
+            # 是否已經中斷過執行中的任務，之後只需要等待它們結束，不需要再依照執行期限喚醒
+            cut_off = False
 
-            for item in target_items:
-                self.faile_tasks[root_target].add(item)
-                self._remove_faile_task(graph, item, root_target=root_target)
+            while not self.task_obj.is_empty or running or pending or retries or self._active_maps:
+                if cut_off or self._should_cut_off(deadline_at):
+                    cut = pending + [i[2] for i in retries]
 
-    def remove_faile_task(self, target):
-        """從 graph 中移除失敗的任務，如果有其他任務依賴這個任務，也會一起刪除"""
+                    pending.clear()
+                    retries.clear()
 
-        self.faile_tasks[target]
+                    self._cut_off(logger, task_map, cut, () if cut_off else running.values())
 
-        self._remove_faile_task(self._graph, target, root_target=target)
+                    cut_off = True
+                    deadline_at = None
 
-    def remove_success_task(self, target: str):
-        """從 graph 中除成功的任務，並將任務加入至 `success_tasks`
+                    if self._expand_maps(logger, task_map, pending):
+                        continue
 
-        Args:
-            target (str): 要移除的 task name
-        """
+                else:
+                    now = time.monotonic()
+                    due = []
 
-        self.success_tasks.add(target)
+                    while retries and retries[0][0] <= now:
+                        due.append(heapq.heappop(retries)[2])
 
-        # target 是獨立任務
-        if not self._graph.get(target):
-            return
+                    pending[:0] = due
 
-        del self._graph[target]
+                    while len(pending) < window:
+                        task_name = self.task_obj.next
 
-        # 檢查任務中是否有獨立的任務，如果有就加入到 independent_tasks_queue 中
-        # 先使用反向關聯圖檢查依賴的任務
-        for end, start_set in self._reverse_dependencies_graph.items():
-            # 如果 start_set 長度是 1 就代表此時任務只依賴一個任務
-            # 如果又剛好依賴的任務是要刪除的任務，那麼該任務就有可能會變成獨立任務
-            if len(start_set) == 1 and target in start_set:
-                # 如果在 graph 中該任務不是一個 key 的話，就表示該任務是獨立任務
-                # 可以想成因為該節點沒有指向下一個節點
-                if not self._graph.get(end):
-                    self._independent_tasks_queue.append(end)
+                        if task_name is None:
+                            break
 
-    def _graph_to_tasks_order(self, graph: defaultdict) -> List[tuple]:
-        """將 graph 轉換成 tasks_orders
+                        if task_name in self.map_configs:
+                            self._start_map(logger, task_name)
+                            continue
 
-        Args:
-            graph (defaultdict(set)): 要轉換的 graph
+                        pending.append(task_name)
 
-        Returns:
-            List[tuple]: 將傳入的 `graph` 轉換後的任務順序清單
+                    if self._expand_maps(logger, task_map, pending):
+                        continue
 
-        """
+                    if self.task_obj.policy == Task.CRITICAL_PATH:
+                        pending.sort(key=lambda i: (task_map[i].attempt == 0, -self._rank(i)))
 
-        new_tasks = []
-        for start, end_set in graph.items():
-            for end in end_set:
-                new_tasks.append((start, end))
+                    self._dispatch(logger, submit, task_map, pending, running)
 
-        return new_tasks
+                self.metrics.ready_tasks.set(self.task_obj.ready_count + len(pending) + len(retries))
+                self.metrics.running_tasks.set(len(running))
 
-    def update_tasks_order_queue(self):
-        """在使用 `remove_success_task` 或 `remove_faile_task` 需要使用這個函示
+                if not running and not retries:
+                    break
 
-        會根據目前的 `self_graph` 重新生成新的 `tasks_order`，在由 `tasks_order` 重新生成 `graph` 等相關屬性
-        最後再重新生成新的 `tasks_order_queue`
+                try:
+                    done = [await asyncio.wait_for(completed.get(), timeout=self._wait_timeout(retries, deadline_at))]
 
-        """
+                except asyncio.TimeoutError:
+                    continue
 
-        # 如果使用了 `remove_success_task` 或 `remove_faile_task` 更新了 graph
-        # 要依序更新 graph -> tasks_orders -> graph -> tasks_order_queue
-        # 先把新的 graph 轉換成 tasks_order
-        self._tasks_order = self._graph_to_tasks_order(self._graph)
+                while not completed.empty():
+                    done.append(completed.get_nowait())
 
-        # 更新相關屬性
-        self._graph, self._indegree, self._reverse_dependencies_graph = self._tasks_order_to_graph(
-            self._tasks_order
-        )
-        self.tasks_order_queue = self._gen_tasks_queue(self._graph, self._indegree)
+                for aio_task in done:
+                    if aio_task is self._wakeup:
+                        continue
 
-    def is_task_can_be_execute(self, task_name: str) -> bool:
-        """判斷傳入的 task 在目前的狀態是否可以執行 (有可能依賴任務還沒完成)
+                    cron = running.pop(aio_task)
+                    result = aio_task.result()
+
+                    self.resources.release(cron)
+                    self._trace_finish(cron, result)
+
+                    if not result[0] and cron.retry_time > 0 and not cron.cut_off:
+                        delay = cron.next_retry_delay()
+
+                        self._report_retry(logger, cron, result, delay)
+
+                        heapq.heappush(retries, (time.monotonic() + delay, retry_seq, cron.name))
+                        retry_seq += 1
+
+                    else:
+                        self._report_task(logger, cron, result)
+
+            return self._finish(logger)
+
+        finally:
+            self._wakeup = None
+            self._stop_metrics()
+            self._save_trace(logger, trace_file)
+            logger.close()
+
+    def plan(self, max_workers: Optional[int] = None, durations: Optional[Dict[str, float]] = None) -> dict:
+        """不實際執行任務，模擬排程估計整個流程的執行時間，詳見 :mod:`booflow.planner`
 
         Args:
-            task_name (str): 要判斷的任務名
+            max_workers (Optional[int], optional): 同時執行的任務數量，默認為 `max_workers`
+
+            durations (Optional[Dict[str, float]], optional): 每個任務預估的執行時間 (秒)，
+                會覆蓋執行紀錄資料庫 (`history_db`) 中的執行時間，都沒有資料的任務使用已知任務的平均執行時間
+
+        Raises:
+            ValueError: `max_workers` 不是大於 0 的整數 (流程定義的錯誤在建立 `BooFlow` 時就會拋出 `WorkflowError`)
 
         Returns:
-            bool: 如果可以執行，回傳 `True` ，反之 `False`
+            dict: {"max_workers" : 同時執行的任務數量, "makespan" : 預估的執行時間,
+                "critical_path" : 關鍵路徑上的任務, "critical_path_length" : 關鍵路徑長度 (任何 worker 數量下執行時間的下限),
+                "max_parallelism" : 最大有效平行度 (worker 數量超過這個值不會更快),
+                "utilization" : worker 使用率, "total_work" : 所有任務執行時間總和,
+                "estimated_tasks" : 沒有執行時間資料、使用平均執行時間的任務}
         """
 
-        if self._reverse_dependencies_graph.get(task_name):
-            for dependen_task in self._reverse_dependencies_graph.get(task_name):
-                if dependen_task not in self.success_tasks:
-                    return False
+        max_workers = self.max_workers if max_workers is None else max_workers
 
-        return True
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise ValueError(f"max_workers 必須是大於 0 的整數，目前為: {max_workers}")
 
-    def report(self, task_name: str, status: bool):
-        """在任務執行完後回報是否成功執行完成
+        policy = self.task_obj.policy
+        names = self.task_obj.task_names
 
-            會將 `task_name` 添加到 `success_tasks` 或 `faile_tasks` 中，
-            並會重新計算 `graph` 等參數，最後重新生成新的 `tasks_order_queue`。
+        known = self.history.task_durations() if self.history is not None else {}
+        known.update(durations or {})
 
-        Args:
-            task_name (str): 任務名稱
-            status (bool): 使否成功執行完成，如果是就填入 `True` ，反之就 `False`
-        """
+        filled, estimated = planner.fill_durations(names, known)
 
-        if status:
-            self.remove_success_task(task_name)
+        path, path_length = planner.critical_path(self.task_obj, filled)
 
-        else:
-            self.remove_faile_task(task_name)
+        result = planner.simulate(
+            Task(self.order, policy=policy, durations=filled, compiled=self.compiled), filled, max_workers
+        )
+        unbounded = planner.simulate(
+            Task(self.order, policy=policy, durations=filled, compiled=self.compiled), filled, max(len(names), 1)
+        )
 
-        self.update_tasks_order_queue()
+        makespan = result["makespan"]
 
-    @property
-    def next(self) -> str:
-        """取得在目前狀態下，可以開始執行的任務名稱 (也就是這個任務依賴的任務已經完成，或是這個任務是獨立的任務)
+        return {
+            "max_workers": max_workers,
+            "makespan": makespan,
+            "critical_path": path,
+            "critical_path_length": path_length,
+            "max_parallelism": unbounded["peak_running"],
+            "utilization": result["busy_time"] / (makespan * max_workers) if makespan > 0 else 0.0,
+            "total_work": result["busy_time"],
+            "estimated_tasks": estimated,
+        }
 
-        Returns:
-            str: 回傳一個任務名稱
-        """
+    def _start_warm_pool(self, logger: "Logger", task_map: Dict[str, "Cron"]):
+        """如果有設定 `warm_pool` ，且有 `python script.py` 類型的任務，啟動預先 import 好模組的直譯器"""
 
-        if self.tasks_order_queue:
-            first_task = self.tasks_order_queue[0]
+        if not self.warm_pool_config:
+            return
+
+        crons = [i for i in task_map.values() if i.warm and is_python_script(i.cmd)]
 
-            if self.is_task_can_be_execute(first_task):
-                return self.tasks_order_queue.popleft()
+        if not crons:
+            return
 
-        if self._independent_tasks_queue:
-            return self._independent_tasks_queue.popleft()
+        config = self.warm_pool_config if isinstance(self.warm_pool_config, dict) else {}
 
-        return None
+        start = time.monotonic()
+
+        self._warm_pool = WarmPool(
+            size=config.get("size", self.max_workers), preload=config.get("preload", ()), python=config.get("python")
+        )
+
+        for cron in crons:
+            cron.warm_pool = self._warm_pool
+
+        logger.logger.info(
+            f"已啟動 {self._warm_pool.size} 個預先 import {self._warm_pool.preload} 的直譯器"
+            f" ({time.monotonic() - start:.3f}s)，以下任務會使用: {[i.name for i in crons]}"
+        )
+
+    def _stop_warm_pool(self):
+        if self._warm_pool is not None:
+            self._warm_pool.close()
+            self._warm_pool = None
+
+    def _trace_finish(self, cron: "Cron", result: Tuple[bool, str, str]):
+        """在時間軸上紀錄任務這一次執行 (或是略過執行)"""
+
+        if self._trace is None:
+            return
+
+        attempt = cron.attempts[-1] if cron.attempts and not cron.skipped else None
+
+        self._trace.finish(cron.name, attempt, result, skipped=cron.skipped)
+
+    def _save_trace(self, logger: "Logger", trace_file: Optional[str]):
+        """輸出這次執行的時間軸，任務順序會畫成箭頭"""
+
+        if self._trace is None:
+            return
+
+        self._trace.save(trace_file, self.task_obj.edges())
+        self._trace = None
+
+        logger.logger.info(f"執行時間軸已輸出至: {trace_file}")
+
+    def _start_metrics(self):
+        """如果有設定 `metrics_port` ，在執行期間啟動指標的 HTTP 服務"""
+
+        self._metrics_written_at = None
+
+        if self.metrics_port is not None:
+            self._metrics_server = self.metrics.registry.serve(self.metrics_port)
+
+    def _write_metrics(self, force: bool = False):
+        """如果有設定 `metrics_file` ，將指標寫入檔案，執行期間最多每 `metrics_interval` 秒寫入一次"""
+
+        if self.metrics_file is None:
+            return
+
+        now = time.monotonic()
+
+        if force or self._metrics_written_at is None or now - self._metrics_written_at >= self.metrics_interval:
+            self.metrics.registry.write_textfile(self.metrics_file)
+            self._metrics_written_at = now
+
+    def _stop_metrics(self):
+        """寫入最後的指標，並停止 HTTP 服務"""
+
+        self.metrics.ready_tasks.set(0)
+        self.metrics.running_tasks.set(0)
+
+        self._write_metrics(force=True)
+
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+
+    def cancel(self) -> bool:
+        """取消執行中的 `run` / `arun` ，可以在其他執行緒中呼叫，不會等待執行結束
+
+        與超過執行期限 (`deadline`) 相同，會中斷所有執行中的任務，還沒開始執行的任務都會標記為被中斷，
+        執行結果的 `cancelled` 為 `True`
+
+        Returns:
+            bool: 目前是否有執行中的 `run` / `arun`
+        """
+
+        wakeup = self._wakeup
+
+        if wakeup is None:
+            return False
+
+        self._cancelled.set()
+
+        if isinstance(wakeup, asyncio.Future):
+            wakeup.get_loop().call_soon_threadsafe(self._set_wakeup, wakeup)
+
+        else:
+            self._set_wakeup(wakeup)
+
+        return True
+
+    @staticmethod
+    def _set_wakeup(wakeup):
+        try:
+            if not wakeup.done():
+                wakeup.set_result(None)
+
+        except InvalidStateError:
+            pass
+
+    def _should_cut_off(self, deadline_at: Optional[float]) -> bool:
+        """是否已經超過執行期限，或是被取消"""
+
+        return self._cancelled.is_set() or (deadline_at is not None and time.monotonic() >= deadline_at)
+
+    def _deadline_at(self) -> Optional[float]:
+        """取得這次執行的期限 (`time.monotonic`)，沒有設定 `deadline` 時回傳 `None`"""
+
+        if self.deadline is None:
+            return None
+
+        return time.monotonic() + self.deadline
+
+    @staticmethod
+    def _wait_timeout(retries: list, deadline_at: Optional[float]) -> Optional[float]:
+        """計算等待任務完成的時間上限: 到下一個重新執行的任務，或是執行期限為止"""
+
+        wakeups = [i for i in (retries[0][0] if retries else None, deadline_at) if i is not None]
+
+        if not wakeups:
+            return None
+
+        return max(min(wakeups) - time.monotonic(), 0)
+
+    def _cut_off(self, logger: "Logger", task_map: Dict[str, "Cron"], task_names: List[str], running):
+        """超過執行期限 (`deadline`) 或是被取消 (:meth:`BooFlow.cancel`)，中斷所有執行中的任務，並將還沒開始執行的任務標記為被中斷
+
+        被中斷的任務會當作執行失敗回報，依賴它們的任務也不會執行
+
+        Args:
+            logger (Logger): log 紀錄器
+
+            task_map (Dict[str, Cron]): task_name 與 Cron 物件之間的映射表
+
+            task_names (List[str]): 已經從 `Task` 取出，但還沒有開始執行 (或是在等待重新執行) 的任務
+
+            running (Iterable[Cron]): 執行中的任務
+        """
+
+        reason = "執行被取消" if self._cancelled.is_set() else "超過執行期限"
+
+        for cron in running:
+            if not cron.cut_off:
+                logger.logger.warning(f"{reason}，中斷執行中的任務: {cron.name}")
+                cron.terminate()
+
+        # map 任務不再產生新的實例，還沒有結果的實例會在回報時紀錄
+        for state in self._active_maps.values():
+            state.stopped = True
+
+            for cron in list(state.running.values()):
+                if not cron.cut_off:
+                    cron.terminate()
+
+        task_name = self.task_obj.next
+
+        while task_name is not None:
+            task_names.append(task_name)
+            task_name = self.task_obj.next
+
+        for task_name in task_names:
+            cron = task_map[task_name]
+            cron.cut_off = True
+
+            self._report_task(logger, cron, (False, "cut off", None))
+
+    def _task_config(self, task_name: str) -> dict:
+        """取得任務 (或是 map 任務的實例) 的設定"""
+
+        instance = self._map_instances.get(task_name)
+
+        return self._task_configs[task_name] if instance is None else instance[2]
+
+    def _rank(self, task_name: str) -> float:
+        """任務的 upward rank ， map 任務的實例使用 map 任務的 rank"""
+
+        instance = self._map_instances.get(task_name)
+
+        return self.task_obj.rank[task_name if instance is None else instance[0].name]
+
+    def _start_map(self, logger: "Logger", task_name: str) -> MapState:
+        """開始執行 map 任務，實例會在有空閒的 worker 時才產生"""
+
+        state = MapState(self.map_configs[task_name], self._slots)
+        self._active_maps[task_name] = state
+
+        self.metrics.tasks_started.inc()
+        logger.logger.info(
+            f"開始執行 map 任務: {task_name} (同時最多 {state.max_in_flight} 個實例)",
+            extra={"task": task_name, "attempt": 1, "event": "start"},
+        )
+
+        return state
+
+    def _expand_instance(self, state: MapState, cron: "Cron") -> Optional["Cron"]:
+        """產生 map 任務的下一個實例，參數已經全部讀取完時回傳 `None`
+
+        Args:
+            state (MapState): 執行中的 map 任務
+
+            cron (Cron): map 任務本身，實例會使用相同的輸出資料夾
+        """
+
+        expanded = state.expand()
+
+        if expanded is None:
+            return None
+
+        config, item = expanded
+
+        instance = Cron(config, output_dir=cron.output_dir, tail_size=cron.tail_size)
+
+        if self._warm_pool is not None and instance.warm and is_python_script(instance.cmd):
+            instance.warm_pool = self._warm_pool
+
+        state.running[instance.name] = instance
+        self._map_instances[instance.name] = (state, item, config)
+
+        return instance
+
+    def _expand_maps(self, logger: "Logger", task_map: Dict[str, "Cron"], pending: List[str]) -> bool:
+        """為執行中的 map 任務產生實例並加入 `pending` ，等待資源的任務不超過同時執行的任務數量上限，
+        並回報所有實例都已經結束的 map 任務
+
+        Returns:
+            bool: 是否有 map 任務結束
+        """
+
+        finished = False
+
+        for state in list(self._active_maps.values()):
+            # 已經回報結果的實例不需要再保留
+            for task_name in state.finished_names:
+                task_map.pop(task_name, None)
+
+            state.finished_names.clear()
+
+            while state.can_expand and len(pending) < self._slots:
+                instance = self._expand_instance(state, task_map[state.name])
+
+                if instance is None:
+                    break
+
+                task_map[instance.name] = instance
+                pending.append(instance.name)
+
+            if state.finished:
+                cron = task_map[state.name]
+                result = self._close_map(logger, state)
+
+                cron.cut_off = state.stopped
+
+                self._report_task(logger, cron, result)
+                finished = True
+
+        return finished
+
+    def _close_map(self, logger: "Logger", state: MapState) -> Tuple[bool, str, str]:
+        """結束 map 任務，回傳 map 任務的執行結果"""
+
+        state.close()
+        del self._active_maps[state.name]
+
+        if state.error is not None:
+            logger.logger.error(f"map 任務 {state.name} 無法讀取參數來源: {state.error}")
+
+        logger.logger.info(f"map 任務 {state.name} 結束: {state.succeeded} 個實例成功， {len(state.failed)} 個實例失敗")
+
+        return state.result()
+
+    def _report_instance(self, logger: "Logger", cron: "Cron", result: Tuple[bool, str, str], state: MapState, item: str):
+        """紀錄 map 任務實例最後的執行結果，詳見 :meth:`BooFlow._report_task`
+
+        實例不會回報給 `Task` ，也不會紀錄在檢查點與 `task_attempts` 中，只會寫入執行紀錄資料庫
+        """
+
+        task_name = cron.name
+
+        state.instance_done(task_name, item, result[0])
+
+        extra = {"task": task_name, "attempt": cron.attempt, "duration": cron.duration}
+
+        if result[0]:
+            self.metrics.tasks_succeeded.inc()
+
+        else:
+            self.metrics.tasks_failed.inc()
+
+            if result[1] == "time out":
+                self.metrics.tasks_timed_out.inc()
+
+        if not result[0]:
+            logger.logger.error(
+                f"任務 {task_name} (參數: {item}) 執行失敗，錯誤種類: {result[1]} ， 詳細錯誤訊息: \n{result[2]}",
+                extra={**extra, "event": "cut_off" if cron.cut_off else "faile"},
+            )
+
+        elif cron.skipped:
+            logger.logger.info(f"任務 {task_name} 的指令與輸入都沒有改變，略過執行", extra={**extra, "event": "skip"})
+
+        else:
+            logger.logger.info(f"任務 {task_name} 執行完成", extra={**extra, "event": "success"})
+
+            if cron.fingerprint is not None:
+                self.uptodate.update(task_name, cron.fingerprint)
+
+        # 指標使用 map 任務的名稱，不會因為實例數量而增加
+        duration = self.metrics.task_duration.labels(state.name)
+
+        for attempt in cron.attempts:
+            logger.attempt_log(task_name, attempt)
+            duration.observe(attempt["duration"])
+
+        if self.history is not None:
+            self.history.record(self.run_id, task_name, cron.attempts)
+
+        self._write_metrics()
+
+    def _is_up_to_date(self, cron: "Cron") -> bool:
+        """檢查任務的指令與輸入檔案是否與上一次成功執行時相同，只有設定了 `inputs` 或 `outputs` 的任務才會檢查
+
+        會將這次的指紋紀錄在 `cron.fingerprint` ，如果不需要執行，會將 `cron.skipped` 設為 `True`
+        """
+
+        if self.uptodate is None or not (cron.inputs or cron.outputs):
+            return False
+
+        cron.skipped, cron.fingerprint = self.uptodate.check(cron.name, cron.command, cron.inputs, cron.outputs)
+
+        return cron.skipped
+
+    def _execute_task(self, cron: "Cron") -> Tuple[bool, str, str]:
+        """在 worker 執行緒中執行一次任務，第一次執行前如果任務的輸入沒有改變，不會執行任務，直接當作執行成功
+
+        重新執行由 :meth:`BooFlow.run` 排程，等待重新執行的期間不會佔用 worker
+
+        Args:
+            cron (Cron): 要執行的任務
+
+        Returns:
+            Tuple[bool, str, str]: 這一次執行的結果，詳見 :meth:`Cron.run`
+        """
+
+        if cron.attempt == 0:
+            if self._is_up_to_date(cron):
+                return (True, None, None)
+
+            return cron.run()
+
+        return cron.retry()
+
+    def _asubmit(self, completed: asyncio.Queue, cron: "Cron") -> asyncio.Task:
+        """:meth:`BooFlow.arun` 中開始執行一次任務，結束時會放入 `completed`"""
+
+        aio_task = asyncio.ensure_future(self._aexecute_task(cron))
+        aio_task.add_done_callback(completed.put_nowait)
+
+        return aio_task
+
+    async def _aexecute_task(self, cron: "Cron") -> Tuple[bool, str, str]:
+        """:meth:`BooFlow._execute_task` 的 asyncio 版本，重新執行與資源由 :meth:`BooFlow.arun` 排程"""
+
+        if cron.attempt == 0:
+            # 計算輸入檔案的 hash 可能需要讀取大量資料，放到執行緒中執行，避免阻塞 event loop
+            if await asyncio.get_running_loop().run_in_executor(None, self._is_up_to_date, cron):
+                return (True, None, None)
+
+            return await cron.arun()
+
+        return await cron.aretry()
+
+    def _report_to_task(self, task_name: str, status: bool):
+        """回報任務結果給 `Task` ，並紀錄花費的時間"""
+
+        start = time.perf_counter()
+
+        self.task_obj.report(task_name, status)
+
+        self.metrics.report_seconds.observe(time.perf_counter() - start)
+
+    def _report_retry(self, logger: "Logger", cron: "Cron", result: Tuple[bool, str, str], delay: float):
+        """紀錄任務這一次執行失敗，將在 `delay` 秒後重新執行"""
+
+        self.metrics.tasks_retried.inc()
+
+        if self._trace is not None:
+            self._trace.retry(cron.name, delay)
+
+        if result[1] == "time out":
+            self.metrics.tasks_timed_out.inc()
+
+        extra = {"task": cron.name, "attempt": cron.attempt, "duration": cron.duration}
+
+        logger.logger.error(
+            f"任務 {cron.name} 執行失敗，錯誤種類: {result[1]} ， 詳細錯誤訊息: \n{result[2]}",
+            extra={**extra, "event": "faile"},
+        )
+        logger.logger.info(
+            f"任務 {cron.name} 將在 {delay:.2f} 秒後重新嘗試執行 (剩餘 {cron.retry_time} 次)",
+            extra={**extra, "event": "retry"},
+        )
+
+    def _report_task(self, logger: "Logger", cron: "Cron", result: Tuple[bool, str, str]):
+        """將任務最後的執行結果 (成功，或是用完重新執行次數後仍然失敗) 紀錄至 log ，並回報給 `Task`
+
+        只會在主執行緒中呼叫，所以 log 的紀錄與 `Task` 的狀態更新不會互相干擾
+
+        Args:
+            logger (Logger): log 紀錄器
+
+            cron (Cron): 執行完成的任務
+
+            result (Tuple[bool, str, str]): 最後一次執行的結果，詳見 :meth:`Cron.run`
+        """
+
+        task_name = cron.name
+
+        instance = self._map_instances.pop(task_name, None)
+
+        if instance is not None:
+            self._report_instance(logger, cron, result, instance[0], instance[1])
+            return
+
+        if not result[0] and cron.cut_off:
+            self.cut_off_tasks.add(task_name)
+
+        extra = {"task": task_name, "attempt": cron.attempt, "duration": cron.duration}
+
+        if result[0]:
+            self.metrics.tasks_succeeded.inc()
+
+        else:
+            self.metrics.tasks_failed.inc()
+
+            if result[1] == "time out":
+                self.metrics.tasks_timed_out.inc()
+
+        if not result[0]:
+            logger.logger.error(
+                f"任務 {task_name} 執行失敗，錯誤種類: {result[1]} ， 詳細錯誤訊息: \n{result[2]}",
+                extra={**extra, "event": "cut_off" if cron.cut_off else "faile"},
+            )
+
+            self._report_to_task(task_name, result[0])
+
+            logger.logger.info(
+                f"因為 {task_name} 失敗，導致 {str(self.task_obj.faile_tasks[task_name])} 無法執行"
+            )
+
+        elif cron.skipped:
+            logger.logger.info(f"任務 {task_name} 的指令與輸入都沒有改變，略過執行", extra={**extra, "event": "skip"})
+            self._report_to_task(task_name, result[0])
+
+        else:
+            logger.logger.info(f"任務 {task_name} 執行完成", extra={**extra, "event": "success"})
+            self._report_to_task(task_name, result[0])
+
+            if cron.fingerprint is not None:
+                self.uptodate.update(task_name, cron.fingerprint)
+
+        duration = self.metrics.task_duration.labels(task_name)
+
+        for attempt in cron.attempts:
+            logger.attempt_log(task_name, attempt)
+            duration.observe(attempt["duration"])
+
+        self.task_attempts[task_name] = cron.attempts
+
+        if self.checkpoint is not None:
+            self.checkpoint.record(task_name, result[0])
+
+        if self.history is not None:
+            self.history.record(self.run_id, task_name, cron.attempts)
+
+        self._write_metrics()
+
+        logger.div_line()
+
+
+class _RunAdapter(logging.LoggerAdapter):
+    """在每一筆 log 中加上這次執行的 run_id ，呼叫時可以用 `extra` 加上其他欄位 (task, attempt, event, duration)"""
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+
+        return msg, kwargs
+
+
+class _JsonFormatter(logging.Formatter):
+    """將 log 轉換成一行 JSON ，欄位固定，方便 log 收集系統解析"""
+
+    FIELDS = ("run_id", "task", "attempt", "event", "duration")
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {"time": record.created, "level": record.levelname}
+
+        for field in self.FIELDS:
+            data[field] = getattr(record, field, None)
+
+        data["message"] = record.getMessage()
+
+        return json.dumps(data, ensure_ascii=False)
+
+
+class Logger:
+    """封裝 `logging`
+
+    log 會先放入佇列，由背景的 `QueueListener` 執行緒寫入檔案，排程不需要等待檔案寫入。
+    每次執行都會建立新的 `Logger` ，執行結束時需要呼叫 :meth:`Logger.close` 移除 handler ，
+    才不會在同一個程序中重複執行時，把同一行 log 寫入多次。
+
+    Args:
+        log_name (str): `logging` 的 logger 名稱
+
+        log_file (str): log 檔案位置
+
+        level (int, optional): log 等級
+
+        run_id (Optional[str], optional): 這次執行的 id ，會加在每一筆 log 中，只有這次執行的 log 會寫入 `log_file`
+
+        log_format (str, optional): log 格式， `"text"` (默認) 或是 `"json"` (JSON lines)
+    """
+
+    FORMATS = ("text", "json")
+
+    def __init__(
+        self,
+        log_name: str,
+        log_file: str,
+        level: int = logging.INFO,
+        run_id: Optional[str] = None,
+        log_format: str = "text",
+    ):
+        if log_format not in self.FORMATS:
+            raise ValueError(f"未知的 log 格式: {log_format}，可以使用的格式: {self.FORMATS}")
+
+        logger = logging.getLogger(log_name)
+        logger.setLevel(level)
+
+        if log_format == "json":
+            formatter = _JsonFormatter()
+        else:
+            formatter = logging.Formatter('[ %(asctime)s %(levelname)s] %(message)s')
+
+        self._file_handler = logging.FileHandler(log_file, mode='a', encoding="utf8")
+        self._file_handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+
+        self._queue_handler = logging.handlers.QueueHandler(log_queue)
+
+        # 同一個程序中同時有多個排程在執行時，只紀錄這次執行的 log
+        self._queue_handler.addFilter(lambda record: getattr(record, "run_id", None) == run_id)
+
+        self._listener = logging.handlers.QueueListener(log_queue, self._file_handler)
+        self._listener.start()
+
+        logger.addHandler(self._queue_handler)
+
+        self._logger = logger
+        self.logger = _RunAdapter(logger, {"run_id": run_id})
+
+    def close(self):
+        """移除 handler ，並等待佇列中的 log 都寫入檔案"""
+
+        if self._listener is None:
+            return
+
+        self._logger.removeHandler(self._queue_handler)
+
+        self._listener.stop()
+        self._listener = None
+
+        self._file_handler.close()
+
+    def tasks_order_queue_log(self, tasks_order_queue: deque):
+        """將 `tasks_order_queue` 資訊紀錄至 log 中"""
+
+        s = " -> ".join(list(tasks_order_queue))
+
+        self.logger.info(f"任務清單: {s}")
+
+    def attempt_log(self, task_name: str, attempt: dict):
+        """將任務一次執行的執行時間與資源使用量，以 `key=value` 的格式紀錄至 log 中
+
+        Args:
+            task_name (str): 任務名稱
+
+            attempt (dict): `Cron.attempts` 中的執行資訊
+        """
+
+        summary = f"task={task_name} attempt={attempt['attempt']} wall={attempt['duration']:.3f}s"
+
+        rusage = attempt.get("rusage")
+
+        if rusage is not None:
+            summary += (
+                f" user={rusage['user_time']:.3f}s sys={rusage['system_time']:.3f}s"
+                f" max_rss={rusage['max_rss_kb']}KB"
+                f" block_in={rusage['block_in']} block_out={rusage['block_out']}"
+                f" ctx_switches={rusage['voluntary_ctx_switches']}/{rusage['involuntary_ctx_switches']}"
+            )
+
+        self.logger.info(
+            f"資源使用: {summary}",
+            extra={"task": task_name, "attempt": attempt["attempt"], "event": "attempt", "duration": attempt["duration"]},
+        )
+
+    def div_line(self):
+        """分隔線"""
+
+        self.logger.info("-" * 20)
+
+
+class Cron:
+    """針對每一個 command 的類別
+
+    指令的 stdout 與 stderr 會直接寫入檔案，不會保留在記憶體中，
+    回傳的訊息只會包含輸出的最後 `tail_size` bytes。
+    """
+
+    # 回傳訊息中最多保留的輸出長度 (bytes)
+    TAIL_SIZE = 4096
+
+    def __init__(self, config: dict, output_dir: Optional[str] = None, tail_size: int = TAIL_SIZE) -> None:
+        """建立 Cron 實例
+
+        Args:
+            config (dict): 排程設定資訊
+
+            output_dir (Optional[str], optional): 輸出檔案存放的資料夾，每次執行都會產生 `<task_name>.<attempt>.stdout` 與 `<task_name>.<attempt>.stderr` ，
+                如果沒有設定，輸出會寫入暫存檔，執行結束後就會刪除
+
+            tail_size (int, optional): 回傳訊息中最多保留的輸出長度 (bytes)
+        """
+
+        self.name = config.get("task_name")
+        self.command = config.get("command")
+        self.cmd = self.__parse_cmd(self.command)
+        self.timeout = config.get("timeout")
+
+        # 輸入與輸出檔案 (路徑或 glob)，用來判斷任務是否需要重新執行
+        self.inputs = self.__as_list(config.get("inputs"))
+        self.outputs = self.__as_list(config.get("outputs"))
+
+        # 任務需要的資源 (沒有宣告時不佔用)，以及所屬的 pool
+        self.cpus = config.get("cpus", 0)
+        self.memory = config.get("memory", 0)
+        self.pool = config.get("pool")
+
+        # 分散式執行時，只有擁有所有 label 的 worker 可以執行這個任務，詳見 :mod:`booflow.distributed`
+        self.labels = set(self.__as_list(config.get("labels")))
+
+        # `python script.py` 類型的指令是否可以用 warm pool 執行 (需要由 `BooFlow` 設定 `warm_pool`)
+        self.warm = config.get("warm", True)
+        self.warm_pool = None
+
+        # 這次執行的指紋，以及是否因為輸入沒有改變而略過執行
+        self.fingerprint = None
+        self.skipped = False
+
+        self.output_dir = output_dir
+        self.tail_size = tail_size
+
+        # 目前是第幾次執行 (包含重新執行)
+        self.attempt = 0
+
+        # 逾時或被中斷時，送出 SIGTERM 後等待多久才送出 SIGKILL (秒)
+        self.kill_grace = config.get("kill_grace", 5.0)
+
+        # 是否因為超過整個流程的執行期限 (deadline) 而被中斷，詳見 :meth:`Cron.terminate`
+        self.cut_off = False
+
+        # 目前正在執行的子程序，以及這次執行被終止的原因 ("time out" 或 "cut off")
+        self._proc = None
+        self._kill_reason = None
+        self._kill_time = None
+        self._exited = threading.Event()
+        self._lock = threading.Lock()
+
+        # 最後一次執行花費的時間 (秒)
+        self.duration = None
+
+        # 每一次執行的資訊，詳見 :meth:`Cron._finish_attempt`
+        self.attempts = []
+
+        if config.get("retry") is None:
+            self.retry_time = 3
+        else:
+            self.retry_time = config.get("retry")
+
+        # 重新執行前等待的時間 (秒)，第 n 次重新執行會等待 retry_delay * retry_backoff ^ (n - 1) 秒，
+        # 最多等待 retry_max_delay 秒，並加上 ±retry_jitter 比例的隨機時間，避免多個任務同時重試
+        self.retry_delay = config.get("retry_delay", 1.0)
+        self.retry_backoff = config.get("retry_backoff", 2.0)
+        self.retry_max_delay = config.get("retry_max_delay", 60.0)
+        self.retry_jitter = config.get("retry_jitter", 0.1)
+
+    def __repr__(self) -> str:
+        return f"Cron: {self.__format__} , Name: {self.name}, Cmd: {self.cmd}"
+
+    @staticmethod
+    def __as_list(value) -> list:
+        """將單一字串或清單統一轉換成清單"""
+
+        if value is None:
+            return []
+
+        if isinstance(value, str):
+            return [value]
+
+        return list(value)
+
+    def __parse_cmd(self, cmd: str) -> list:
+        """將指令字串解析成 list
+
+        Args:
+            cmd (str): 指令字串，例如 "python3 main.py".
+
+        Returns:
+            list: 回傳解析後的指令 => ["python3", "main.py"]
+        """
+
+        return cmd.split()
+
+    def run(self) -> Tuple[bool, str, str]:
+        """執行指令
+            會分成以下幾種狀況
+
+            1. 執行成功，則回傳 (True, None, stdout)
+            2. 程式錯誤，則回傳 (False, "program error", stderr)
+            3. 執行逾時，則回傳 (False, "time out", None)
+            4. 被中斷 (詳見 :meth:`Cron.terminate`)，則回傳 (False, "cut off", None)
+            5. 未知錯誤，則回傳 (False, "unknow error", error)
+
+            指令會在新的 session (process group) 中執行，逾時或被中斷時會終止整個 process group ，
+            指令產生的子程序 (例如 shell script 啟動的其他程式) 不會在任務結束後繼續執行。
+
+        Returns:
+            Tuple[bool, str]: 詳見說明
+        """
+
+        stdout_file, stderr_file = self._open_output()
+        start_time, start = time.time(), time.monotonic()
+
+        proc = None
+        result = None
+        rusage = None
+
+        try:
+            if self.uses_warm_pool:
+                proc = self.warm_pool.spawn(self.cmd, stdout_file, stderr_file)
+
+            else:
+                proc = subprocess.Popen(self.cmd, stdout=stdout_file, stderr=stderr_file, start_new_session=True)
+
+            self._start_attempt(proc)
+
+            killed, rusage = self._wait(proc)
+
+            if killed:
+                result = (False, killed, None)
+
+            else:
+                result = self._read_output(stdout_file, stderr_file)
+
+        except Exception as e:
+            result = (False, "unknow error", str(e))
+
+        finally:
+            self._finish_attempt(result, start_time, start, proc, stdout_file, stderr_file, rusage)
+
+        return result
+
+    @property
+    def uses_warm_pool(self) -> bool:
+        """`run` 是否會用 warm pool 中預先啟動的直譯器執行指令，詳見 :mod:`booflow.warmpool`"""
+
+        return self.warm and self.warm_pool is not None and is_python_script(self.cmd)
+
+    def terminate(self):
+        """中斷任務 (例如超過整個流程的執行期限)，可以在其他執行緒中呼叫，不會等待子程序結束
+
+        會將 `cut_off` 設為 `True` ，之後也不會再重新執行；如果指令正在執行，
+        會對整個 process group 送出 SIGTERM ，超過 `kill_grace` 秒後送出 SIGKILL
+        """
+
+        self.cut_off = True
+
+        proc = self._proc
+
+        if proc is not None:
+            threading.Thread(target=self._kill, args=(proc, "cut off"), daemon=True).start()
+
+    def _start_attempt(self, proc):
+        """紀錄目前正在執行的子程序，如果任務在子程序建立前就已經被中斷，會直接終止子程序"""
+
+        with self._lock:
+            self._proc = proc
+            self._kill_reason = None
+            self._kill_time = None
+            self._exited = threading.Event()
+
+        if self.cut_off:
+            threading.Thread(target=self._kill, args=(proc, "cut off"), daemon=True).start()
+
+    @staticmethod
+    def _signal_group(proc, sig: int):
+        """對子程序所在的 process group 送出訊號，不支援 process group 的系統只會送給子程序"""
+
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(proc.pid, sig)
+
+            else:
+                proc.kill()
+
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    @staticmethod
+    def _group_alive(pgid: int) -> bool:
+        """檢查 process group 中除了 group leader 以外，是否還有沒有結束的程序
+
+        只有在有 `/proc` 的系統上能檢查，其他系統一律回傳 `True`
+        """
+
+        if not os.path.isdir("/proc"):
+            return True
+
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit() or int(entry) == pgid:
+                continue
+
+            try:
+                with open(f"/proc/{entry}/stat", "r") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+
+            except (OSError, IndexError):
+                continue
+
+            # fields[0]: 狀態, fields[2]: process group id
+            if fields[2] == str(pgid) and fields[0] != "Z":
+                return True
+
+        return False
+
+    def _kill(self, proc, reason: str):
+        """終止子程序所在的整個 process group: 先送出 SIGTERM ，超過 `kill_grace` 秒還沒結束就送出 SIGKILL
+
+        Args:
+            proc: 要終止的子程序
+
+            reason (str): 終止的原因，會成為這次執行的錯誤種類
+        """
+
+        with self._lock:
+            if self._proc is not proc or self._kill_reason is not None:
+                return
+
+            self._kill_reason = reason
+            self._kill_time = time.monotonic()
+            exited = self._exited
+
+            self._signal_group(proc, signal.SIGTERM)
+
+        if exited.wait(self.kill_grace):
+            return
+
+        with self._lock:
+            if self._proc is proc:
+                self._signal_group(proc, signal.SIGKILL)
+
+    def _sweep_group(self, proc):
+        """子程序已經結束，但同一個 process group 中可能還有其他程序，
+        等到 SIGTERM 的寬限時間結束後，如果還有程序沒有結束就送出 SIGKILL
+        """
+
+        deadline = self._kill_time + self.kill_grace
+
+        while self._group_alive(proc.pid):
+            if time.monotonic() >= deadline:
+                self._signal_group(proc, signal.SIGKILL)
+                return
+
+            time.sleep(0.05)
+
+    def _wait(self, proc: subprocess.Popen) -> Tuple[Optional[str], Optional[dict]]:
+        """等待子程序結束，超過 `timeout` 時會終止子程序所在的整個 process group
+
+        在支援 `os.wait4` 的系統上，會取得子程序的資源使用量 (rusage)。
+        先用 `os.waitid(WNOWAIT)` 等待子程序結束但不回收，確定不會再送出訊號後，
+        才用 `os.wait4` 回收子程序，避免訊號送到被重複使用的 pid (process group id) 。
+
+        由 warm pool 執行的子程序 (:class:`WarmProcess`) 不是這個程序的子程序，會透過 zygote 等待與回收。
+
+        Args:
+            proc (subprocess.Popen): 子程序
+
+        Returns:
+            Tuple[Optional[str], Optional[dict]]: (被終止的原因，沒有被終止時為 `None` ,
+                資源使用量，詳見 :meth:`Cron._rusage_to_dict` ，不支援時為 `None`)
+        """
+
+        warm = isinstance(proc, WarmProcess)
+
+        if not warm and (not hasattr(os, "wait4") or not hasattr(os, "waitid")):
+            try:
+                proc.wait(timeout=self.timeout)
+
+            except subprocess.TimeoutExpired:
+                self._kill_reason = "time out"
+                proc.kill()
+
+            proc.wait()
+
+            with self._lock:
+                self._proc = None
+
+            return self._kill_reason, None
+
+        timer = None
+
+        if self.timeout is not None:
+            timer = threading.Timer(self.timeout, self._kill, args=(proc, "time out"))
+            timer.daemon = True
+            timer.start()
+
+        try:
+            if warm:
+                proc.wait_exited()
+
+            else:
+                os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+
+        except BaseException:
+            with self._lock:
+                self._proc = None
+
+            raise
+
+        finally:
+            self._exited.set()
+
+            if timer is not None:
+                timer.cancel()
+                timer.join()
+
+        with self._lock:
+            killed = self._kill_reason is not None
+
+        if killed:
+            self._sweep_group(proc)
+
+        with self._lock:
+            self._proc = None
+
+        if warm:
+            return self._kill_reason, proc.reap()
+
+        _, status, rusage = os.wait4(proc.pid, 0)
+
+        proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+        return self._kill_reason, self._rusage_to_dict(rusage)
+
+    @staticmethod
+    def _rusage_to_dict(rusage) -> dict:
+        """將 `resource.struct_rusage` 轉換成 dict
+
+        Returns:
+            dict: {"user_time" : 使用者 CPU 時間 (秒), "system_time" : 系統 CPU 時間 (秒), "max_rss_kb" : 最大常駐記憶體 (KB),
+                "block_in" : 區塊讀取次數, "block_out" : 區塊寫入次數,
+                "voluntary_ctx_switches" : 自願 context switch 次數, "involuntary_ctx_switches" : 非自願 context switch 次數}
+        """
+
+        return {
+            "user_time": rusage.ru_utime,
+            "system_time": rusage.ru_stime,
+            "max_rss_kb": rusage.ru_maxrss,
+            "block_in": rusage.ru_inblock,
+            "block_out": rusage.ru_oublock,
+            "voluntary_ctx_switches": rusage.ru_nvcsw,
+            "involuntary_ctx_switches": rusage.ru_nivcsw,
+        }
+
+    async def arun(self) -> Tuple[bool, str, str]:
+        """:meth:`Cron.run` 的 asyncio 版本，回傳值與 :meth:`Cron.run` 相同
+
+        與 :meth:`Cron.run` 相同，在支援 `os.wait4` 的系統上會自己回收子程序並紀錄資源使用量 (rusage)，
+        其他系統上子程序由 asyncio 回收，不會紀錄資源使用量
+
+        Returns:
+            Tuple[bool, str]: 詳見 :meth:`Cron.run`
+        """
+
+        stdout_file, stderr_file = self._open_output()
+        start_time, start = time.time(), time.monotonic()
+
+        proc = None
+        result = None
+        rusage = None
+
+        try:
+            if hasattr(os, "wait4") and hasattr(os, "waitid"):
+                # 不交給 asyncio 回收，才能用 `os.wait4` 取得資源使用量
+                proc = subprocess.Popen(self.cmd, stdout=stdout_file, stderr=stderr_file, start_new_session=True)
+
+            else:
+                proc = await asyncio.create_subprocess_exec(
+                    *self.cmd, stdout=stdout_file, stderr=stderr_file, start_new_session=True
+                )
+
+            self._start_attempt(proc)
+
+            killed, rusage = await self._await(proc)
+
+            if killed:
+                result = (False, killed, None)
+
+            else:
+                result = self._read_output(stdout_file, stderr_file)
+
+        except Exception as e:
+            result = (False, "unknow error", str(e))
+
+        finally:
+            self._finish_attempt(result, start_time, start, proc, stdout_file, stderr_file, rusage)
+
+        return result
+
+    async def _await(self, proc) -> Tuple[Optional[str], Optional[dict]]:
+        """:meth:`Cron._wait` 的 asyncio 版本，等待期間不會佔用執行緒
+
+        `proc` 為 `subprocess.Popen` 時，與 :meth:`Cron._wait` 相同，等待子程序結束但不回收，
+        確定不會再送出訊號後才用 `os.wait4` 回收子程序並取得資源使用量
+
+        Args:
+            proc: 子程序 ( `subprocess.Popen` 或是 asyncio 的 `Process`)
+
+        Returns:
+            Tuple[Optional[str], Optional[dict]]: 詳見 :meth:`Cron._wait`
+        """
+
+        loop = asyncio.get_running_loop()
+        exited = asyncio.ensure_future(self._await_exit(proc))
+
+        try:
+            # 逾時後仍然需要等待子程序結束，不能取消 `exited`
+            await asyncio.wait_for(asyncio.shield(exited), timeout=self.timeout)
+
+        except asyncio.TimeoutError:
+            threading.Thread(target=self._kill, args=(proc, "time out"), daemon=True).start()
+
+            await exited
+
+        self._exited.set()
+
+        with self._lock:
+            self._proc = None
+            killed = self._kill_reason
+
+        if killed:
+            await loop.run_in_executor(None, self._sweep_group, proc)
+
+        if not isinstance(proc, subprocess.Popen):
+            return killed, None
+
+        # 子程序已經結束，不會阻塞
+        _, status, rusage = os.wait4(proc.pid, 0)
+
+        proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+        return killed, self._rusage_to_dict(rusage)
+
+    @staticmethod
+    async def _await_exit(proc):
+        """等待子程序結束，`subprocess.Popen` 的子程序不會被回收 (與 `os.waitid(WNOWAIT)` 相同)
+
+        支援 `os.pidfd_open` 時透過 event loop 等待，否則在執行緒中呼叫 `os.waitid`
+        """
+
+        if not isinstance(proc, subprocess.Popen):
+            await proc.wait()
+            return
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            pidfd = os.pidfd_open(proc.pid)
+
+        except (AttributeError, OSError):
+            # 不支援 pidfd 的系統 (Python 3.9 以前，或是 Linux 5.3 以前)
+            await loop.run_in_executor(None, os.waitid, os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+            return
+
+        # 子程序結束時 pidfd 會變成可以讀取
+        readable = loop.create_future()
+
+        loop.add_reader(pidfd, lambda: readable.done() or readable.set_result(None))
+
+        try:
+            await readable
+
+        finally:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+
+    def _finish_attempt(self, result, start_time: float, start: float, proc, stdout_file, stderr_file, rusage=None):
+        """紀錄這次執行的資訊到 `attempts` ，並關閉輸出檔案
+
+        Args:
+            result (Tuple[bool, str, str]): 執行結果，如果執行途中被中斷則為 `None`
+
+            start_time (float): 開始執行的時間 (timestamp)
+
+            start (float): 開始執行的時間 (`time.monotonic`)
+
+            proc: 執行的子程序，如果子程序沒有成功建立則為 `None`
+
+            stdout_file: stdout 輸出檔案
+
+            stderr_file: stderr 輸出檔案
+
+            rusage (Optional[dict], optional): 子程序的資源使用量，詳見 :meth:`Cron._rusage_to_dict`
+        """
+
+        self.duration = time.monotonic() - start
+
+        self.attempts.append(
+            {
+                "attempt": self.attempt,
+                "start_time": start_time,
+                "end_time": start_time + self.duration,
+                "duration": self.duration,
+                "returncode": proc.returncode if proc is not None else None,
+                "failure_kind": result[1] if result is not None else None,
+                "output_size": os.fstat(stdout_file.fileno()).st_size + os.fstat(stderr_file.fileno()).st_size,
+                "rusage": rusage,
+            }
+        )
+
+        stdout_file.close()
+        stderr_file.close()
+
+    def _open_output(self):
+        """開啟這次執行的 stdout 與 stderr 輸出檔案，並將 `attempt` 加 1
+
+        Returns:
+            Tuple[BinaryIO, BinaryIO]: (stdout 檔案, stderr 檔案)
+        """
+
+        self.attempt += 1
+
+        if self.output_dir is None:
+            return tempfile.TemporaryFile(), tempfile.TemporaryFile()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        prefix = os.path.join(self.output_dir, f"{str(self.name).replace(os.sep, '_')}.{self.attempt}")
+
+        return open(prefix + ".stdout", "w+b"), open(prefix + ".stderr", "w+b")
+
+    def _read_tail(self, file) -> str:
+        """讀取輸出檔案最後 `tail_size` bytes ，並移除換行符號"""
+
+        size = os.fstat(file.fileno()).st_size
+
+        file.seek(max(0, size - self.tail_size))
+
+        return file.read().decode("utf8", errors="replace").replace("\n", "")
+
+    def _read_output(self, stdout_file, stderr_file) -> Tuple[bool, str, str]:
+        """依照輸出檔案判斷執行結果，有 stderr 輸出就當作程式錯誤"""
+
+        if os.fstat(stderr_file.fileno()).st_size:
+            return (False, "program error", self._read_tail(stderr_file))
+
+        else:
+            return (True, None, self._read_tail(stdout_file))
+
+    def next_retry_delay(self) -> float:
+        """計算下一次重新執行前要等待的時間 (秒)，依照目前已經執行的次數做 exponential backoff
+
+        Returns:
+            float: 等待時間
+        """
+
+        delay = min(self.retry_delay * self.retry_backoff ** max(self.attempt - 1, 0), self.retry_max_delay)
+
+        if self.retry_jitter:
+            delay *= 1 + random.uniform(-self.retry_jitter, self.retry_jitter)
+
+        return max(delay, 0.0)
+
+    def retry(self) -> Tuple[bool, str, str]:
+        """重新執行一次 run 函示，並將 retry_time 減 1
+
+        Returns:
+            Tuple[bool, str, str]: run 函示的回傳值
+        """
+
+        if self.retry_time == 0:
+            return
+
+        self.retry_time -= 1
+
+        return self.run()
+
+    async def aretry(self) -> Tuple[bool, str, str]:
+        """:meth:`Cron.retry` 的 asyncio 版本
+
+        Returns:
+            Tuple[bool, str, str]: arun 函示的回傳值
+        """
+
+        if self.retry_time == 0:
+            return
+
+        self.retry_time -= 1
+
+        return await self.arun()
+
+
+class _NameView(Mapping):
+    """以任務名稱讀取依照任務 id 存放的陣列 (唯讀)"""
+
+    def __init__(self, ids: Dict[str, int], values):
+        self._ids = ids
+        self._values = values
+
+    def __getitem__(self, task_name: str):
+        return self._values[self._ids[task_name]]
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class Task:
+    """任務佇列管理
+
+    管理任務執行的順序，會根據演算法給出在目前狀態下，可以執行的任務名稱。
+
+    內部會維護每個任務「尚未完成的依賴任務數量」 (`indegree`) 以及一個可執行任務佇列，
+    每次回報任務結果時，只會更新該任務的下游任務，所以整個排程的成本為 O(V + E)。
+
+    為了能處理非常大的流程，任務名稱會轉換成連續的整數 id ，有向圖以 CSR (compressed sparse row)
+    格式存放在 `array` 中 (任務 i 的下游任務為 `_edges[_offsets[i]:_offsets[i + 1]]`)，
+    每個邊只需要 4 bytes ，對外的介面仍然使用任務名稱。
+
+    Args:
+        - tasks_orders (List[tuple]): 任務順序清單
+
+        - policy (str): 可執行任務的排程策略
+
+            - `"fifo"`: 依照任務變成可執行的先後順序 (默認)
+            - `"critical_path"`: 優先執行「到結束為止最長路徑」(upward rank) 最長的任務
+
+        - durations (Optional[Dict[str, float]]): 每個任務預估的執行時間 (秒)，只有 `critical_path` 會用到，
+          沒有資料的任務會使用已知任務的平均執行時間
+
+        - impact_index (bool): 是否預先計算每個任務所有下游任務的 bitset ，
+          開啟後 :meth:`Task.impact_count` 不需要走訪有向圖 (記憶體用量約為 任務數量^2 / 8 bytes，適合任務數量不多的流程)
+
+        - compiled (Optional[CompiledWorkflow]): 已經編譯好的工作流程 (詳見 :mod:`booflow.workflow`)，
+          設定時直接使用其中的有向圖與拓撲排序，不會再從 `tasks_order` 建立
+
+    Attribute:
+
+        - tasks_order_queue (dequeu): 任務執行佇列 (依照拓撲排序的任務順序，用於紀錄)。
+
+        - next (str): 回傳一個在目前狀態可以執行的任務名稱 (也就是說這個任務的依賴任務已經完成)。
+
+        - is_empty (bool): 檢查目前是否還有等待執行的任務，如果沒有回傳 `True` ，反之回傳 `False`。
+
+        - success_task (set): 順利執行完成的任務集合。
+
+        - faile_task (defaultidict(set)): 執行失敗的任務字典 ( 其中 `key` 為失敗的任務名稱，而 `value` 為因為依賴這個任務而無法執行的任務集合) 。
+
+    Usage:
+        - 初始化物件時會自動產生任務有向圖等相關屬性。
+        - 使用 :meth:`Task.next` 取得一個目前狀態下可以開始執行的任務名。
+        - 使用 :meth:`Task.is_empty` 來檢查是否還有等待執行的任務。
+        - 使用 :meth:`Task.report` 回報任務的執行結果。
+        - 使用 :meth:`Task.remove_faile_task()` 移除一個失敗的任務，如果有其他任務依賴這個任務，也會被移除，並將相關訊息記錄到 `faile_task` 中。
+        - 使用 :meth:`Task.remove_success_task()` 移除一個成功的任務，並且將訊息記錄到 `success_tasks` 中，依賴任務都完成的下游任務會加入可執行任務佇列。
+    """
+
+    # 排程策略
+    FIFO = "fifo"
+    CRITICAL_PATH = "critical_path"
+    POLICIES = (FIFO, CRITICAL_PATH)
+
+    # 任務狀態 (存放在 bytearray 中)
+    WAITING = 0
+    READY = 1
+    RUNNING = 2
+    SUCCESS = 3
+    FAILE = 4
+    CANCEL = 5
+
+    def __init__(
+        self,
+        tasks_order: List[tuple],
+        policy: str = FIFO,
+        durations: Optional[Dict[str, float]] = None,
+        impact_index: bool = False,
+        compiled: Optional["CompiledWorkflow"] = None,
+    ):
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的排程策略: {policy}，可以使用的策略: {self.POLICIES}")
+
+        self._tasks_order = tasks_order
+        self.policy = policy
+
+        if compiled is None:
+            # 先把 tasks_order 轉換成 graph
+            self._names, self._ids, self._offsets, self._edges, self._indegree = self._tasks_order_to_graph(self._tasks_order)
+
+            # 依照拓撲排序的任務 id
+            self._topo_order = self._gen_tasks_queue(self._offsets, self._edges, array("i", self._indegree))
+
+        else:
+            self._names, self._ids = compiled.names, compiled.ids
+            self._offsets, self._edges, self._indegree = compiled.offsets, compiled.edges, compiled.indegree
+            self._topo_order = compiled.topo_order
+
+        # 反向關聯，只有 `is_task_can_be_execute` 會用到，第一次使用時才建立
+        self._reverse_offsets = None
+        self._reverse_edges = None
+
+        # 執行時 `_indegree` 會被更新，保留原本的入度讓 `reset` 複製
+        self._initial_indegree = self._indegree
+
+        # 每個任務的 upward rank ，只有 `critical_path` 會用到
+        self.rank = {}
+        self._rank = None
+
+        if self.policy == self.CRITICAL_PATH:
+            self._rank = self._gen_upward_rank(self._offsets, self._edges, self._topo_order, self._names, durations or {})
+            self.rank = _NameView(self._ids, self._rank)
+
+        # 每個任務所有下游任務的 bitset (第 i 個位元代表任務 id i)
+        self._descendants = None
+
+        if impact_index:
+            self._descendants = self._gen_descendants(self._offsets, self._edges, self._topo_order)
+
+        self.reset()
+
+    def reset(self):
+        """將所有任務還原成還沒有執行的狀態，有向圖與 rank 不需要重新建立 (例如常駐排程每次執行前)"""
+
+        self._indegree = array("i", self._initial_indegree)
+
+        self.tasks_order_queue = deque(self._names[i] for i in self._topo_order)
+        self.success_tasks = set()
+        self.faile_tasks = defaultdict(set)
+
+        # 每個任務目前的狀態
+        self._status = bytearray(len(self._names))
+
+        # 可執行任務佇列 ( 依賴任務都已經完成 )，存放任務 id
+        # `fifo` 使用 deque ， `critical_path` 使用 (-rank, 序號, 任務 id) 的 heap
+        self._ready_queue = deque() if self.policy == self.FIFO else []
+        self._ready_seq = 0
+
+        # 在可執行任務佇列中，還沒有被 `next` 取出的任務數量
+        self._ready_count = 0
+
+        for idx, degree in enumerate(self._indegree):
+            if degree == 0:
+                self._status[idx] = self.READY
+                self._push_ready(idx)
+                self._ready_count += 1
+
+        # 還在等待依賴任務完成的任務數量
+        self._waiting_count = len(self._names) - self._ready_count
+
+    @staticmethod
+    def _tasks_order_to_graph(tasks_order: List[tuple]) -> Tuple[List[str], Dict[str, int], array, array, array]:
+        """將任務順序列表轉換成 CSR 格式的有向圖
+
+        任務 id 依照任務名稱第一次出現在 `tasks_order` 中的順序編號，
+        有向圖中的下游任務會依照 `tasks_order` 中出現的順序排列，重複的任務順序只會保留一個，
+        只有一個任務的 tuple (例如 `("A",)`) 代表沒有依賴關係的獨立任務
+
+        Args:
+            tasks_order (List[tuple]): 任務順序清單
+
+        Returns:
+            Tuple[List[str], Dict[str, int], array, array, array]: ( 任務 id -> 任務名稱 (`names`), 任務名稱 -> 任務 id (`ids`),
+                每個任務下游任務的起始位置 (`offsets`), 下游任務 id (`edges`), 入度陣列 (`indegree`) )
+        """
+
+        ids = {}
+        setdefault = ids.setdefault
+
+        src = array("i")
+        dst = array("i")
+
+        for item in tasks_order:
+            if len(item) == 1:
+                setdefault(item[0], len(ids))
+                continue
+
+            start, end = item
+
+            src.append(setdefault(start, len(ids)))
+            dst.append(setdefault(end, len(ids)))
+
+        names = list(ids)
+        count = len(names)
+
+        # 依照上游任務做 counting sort ，同一個任務的下游任務會保持原本的順序
+        offsets = array("q", bytes(8 * (count + 1)))
+
+        for s in src:
+            offsets[s + 1] += 1
+
+        for idx in range(count):
+            offsets[idx + 1] += offsets[idx]
+
+        position = offsets[:-1]
+        edges = array("i", bytes(4 * len(src)))
+
+        for s, e in zip(src, dst):
+            edges[position[s]] = e
+            position[s] += 1
+
+        del src, dst, position
+
+        # 去除重複的邊並計算入度， `mark[e]` 記錄最後一個指向 e 的上游任務 id + 1
+        mark = array("i", bytes(4 * count))
+        indegree = array("i", bytes(4 * count))
+
+        write = 0
+        start = 0
+
+        for idx in range(count):
+            end = offsets[idx + 1]
+            offsets[idx] = write
+
+            for k in range(start, end):
+                e = edges[k]
+
+                if mark[e] != idx + 1:
+                    mark[e] = idx + 1
+                    edges[write] = e
+                    indegree[e] += 1
+                    write += 1
+
+            start = end
+
+        offsets[count] = write
+        del edges[write:]
+
+        return names, ids, offsets, edges, indegree
+
+    @staticmethod
+    def _gen_tasks_queue(offsets: array, edges: array, indegree: array) -> array:
+        """生成 tasks 執行順序 (任務 id)，在使用這個方法前，應該執行 :meth:`Task._tasks_order_to_graph` 方法
+
+        注意，這個方法會修改傳入的 `indegree`
+
+        Args:
+            offsets (array): 經由 :meth:`Task._tasks_order_to_graph` 生成的 offsets.
+
+            edges (array): 經由 :meth:`Task._tasks_order_to_graph` 生成的 edges.
+
+            indegree (array): 經由 :meth:`Task._tasks_order_to_graph` 生成的 indegree.
+
+        Returns:
+            array: 依照拓撲排序的任務 id
+        """
+
+        # 拓撲排序的結果同時當作 BFS 的佇列使用
+        task_queue = array("i", (idx for idx, degree in enumerate(indegree) if degree == 0))
+        head = 0
+
+        while head < len(task_queue):
+            current_task = task_queue[head]
+            head += 1
+
+            for k in range(offsets[current_task], offsets[current_task + 1]):
+                next_task = edges[k]
+                indegree[next_task] -= 1
+
+                if indegree[next_task] == 0:
+                    task_queue.append(next_task)
+
+        return task_queue
+
+    @staticmethod
+    def _gen_upward_rank(
+        offsets: array, edges: array, topo_order: array, names: List[str], durations: Dict[str, float]
+    ) -> array:
+        """計算每個任務的 upward rank ，也就是從這個任務開始到整個流程結束的最長路徑長度 (包含任務本身的執行時間)
+
+        Args:
+            offsets (array): 經由 :meth:`Task._tasks_order_to_graph` 生成的 offsets.
+
+            edges (array): 經由 :meth:`Task._tasks_order_to_graph` 生成的 edges.
+
+            topo_order (array): 經由 :meth:`Task._gen_tasks_queue` 生成的任務執行順序
+
+            names (List[str]): 任務 id -> 任務名稱
+
+            durations (Dict[str, float]): 每個任務預估的執行時間 (秒)
+
+        Returns:
+            array: 依照任務 id 存放的 upward rank
+        """
+
+        known = [d for d in durations.values() if d is not None]
+        default_duration = sum(known) / len(known) if known else 1.0
+
+        rank = array("d", bytes(8 * len(names)))
+
+        # 依照拓撲排序反向計算，下游任務的 rank 一定會先算好
+        for idx in reversed(topo_order):
+            duration = durations.get(names[idx])
+
+            if duration is None:
+                duration = default_duration
+
+            rank[idx] = duration + max((rank[edges[k]] for k in range(offsets[idx], offsets[idx + 1])), default=0)
+
+        return rank
+
+    @staticmethod
+    def _gen_descendants(offsets: array, edges: array, topo_order: array) -> List[int]:
+        """計算每個任務所有下游任務 (遞移閉包) 的 bitset
+
+        Args:
+            offsets (array): 經由 :meth:`Task._tasks_order_to_graph` 生成的 offsets.
+
+            edges (array): 經由 :meth:`Task._tasks_order_to_graph` 生成的 edges.
+
+            topo_order (array): 經由 :meth:`Task._gen_tasks_queue` 生成的任務執行順序
+
+        Returns:
+            List[int]: 依照任務 id 存放的 bitset
+        """
+
+        descendants = [0] * len(topo_order)
+
+        # 依照拓撲排序反向計算，下游任務的 bitset 一定會先算好
+        for idx in reversed(topo_order):
+            bits = 0
+
+            for k in range(offsets[idx], offsets[idx + 1]):
+                e = edges[k]
+                bits |= (1 << e) | descendants[e]
+
+            descendants[idx] = bits
+
+        return descendants
+
+    def _iter_descendants(self, idx: int):
+        """依序產生任務所有下游任務的 id"""
+
+        if self._descendants is not None:
+            bits = self._descendants[idx]
+
+            while bits:
+                low = bits & -bits
+                yield low.bit_length() - 1
+                bits ^= low
+
+            return
+
+        visited = bytearray(len(self._names))
+        stack = [idx]
+
+        while stack:
+            current = stack.pop()
+
+            for k in range(self._offsets[current], self._offsets[current + 1]):
+                item = self._edges[k]
+
+                if not visited[item]:
+                    visited[item] = 1
+                    stack.append(item)
+                    yield item
+
+    def _reverse_graph(self) -> Tuple[array, array]:
+        """取得 CSR 格式的反向關聯有向圖，任務 i 依賴的任務為 `reverse_edges[reverse_offsets[i]:reverse_offsets[i + 1]]`
+
+        Returns:
+            Tuple[array, array]: (`reverse_offsets`, `reverse_edges`)
+        """
+
+        if self._reverse_offsets is None:
+            count = len(self._names)
+            offsets, edges = self._offsets, self._edges
+
+            reverse_offsets = array("q", bytes(8 * (count + 1)))
+
+            for e in edges:
+                reverse_offsets[e + 1] += 1
+
+            for idx in range(count):
+                reverse_offsets[idx + 1] += reverse_offsets[idx]
+
+            position = reverse_offsets[:-1]
+            reverse_edges = array("i", bytes(4 * len(edges)))
+
+            for idx in range(count):
+                for k in range(offsets[idx], offsets[idx + 1]):
+                    e = edges[k]
+                    reverse_edges[position[e]] = idx
+                    position[e] += 1
+
+            self._reverse_offsets, self._reverse_edges = reverse_offsets, reverse_edges
+
+        return self._reverse_offsets, self._reverse_edges
+
+    def _push_ready(self, idx: int):
+        """將任務加入可執行任務佇列"""
+
+        if self.policy == self.FIFO:
+            self._ready_queue.append(idx)
+
+        else:
+            heapq.heappush(self._ready_queue, (-self._rank[idx], self._ready_seq, idx))
+            self._ready_seq += 1
+
+    def _pop_ready(self) -> int:
+        """從可執行任務佇列中取出下一個任務"""
+
+        if self.policy == self.FIFO:
+            return self._ready_queue.popleft()
+
+        return heapq.heappop(self._ready_queue)[2]
+
+    def _take_out(self, idx: int):
+        """將任務從等待或可執行的狀態中移出 (更新計數)"""
+
+        status = self._status[idx]
+
+        if status == self.READY:
+            self._ready_count -= 1
+
+        elif status == self.WAITING:
+            self._waiting_count -= 1
+
+    def _remove_faile_task(self, target: int, root_target: str):
+        """輔助 :meth:`Task.remove_faile_task` 方法，取消跟 `target` 相關的任務，並將取消的任務加入 `faile_tasks`
+
+        使用堆疊 (stack) 走訪下游任務，不會因為流程太深而超過遞迴上限，
+        每個任務被取消時就會改變狀態，所以最多只會走訪一次 (已經被取消的任務不會再走訪)
+
+        Args:
+            target (int): 要取消下游任務的任務 id (節點)
+
+            root_target (str): 失敗的任務名
+        """
+
+        status, offsets, edges, names = self._status, self._offsets, self._edges, self._names
+        cancelled = self.faile_tasks[root_target]
+
+        stack = [target]
+
+        while stack:
+            current = stack.pop()
+
+            for k in range(offsets[current], offsets[current + 1]):
+                item = edges[k]
+
+                if status[item] != self.WAITING:
+                    continue
+
+                self._waiting_count -= 1
+                status[item] = self.CANCEL
+                cancelled.add(names[item])
+
+                stack.append(item)
+
+    def remove_faile_task(self, target: str):
+        """將失敗的任務標記為失敗，如果有其他任務依賴這個任務，也會一起取消"""
+
+        idx = self._ids[target]
+
+        self.faile_tasks[target]
+
+        self._take_out(idx)
+        self._status[idx] = self.FAILE
+
+        self._remove_faile_task(idx, root_target=target)
+
+    def remove_success_task(self, target: str):
+        """將成功的任務加入至 `success_tasks`，並更新下游任務的 `indegree`
+
+        如果下游任務的依賴任務都已經完成，就會加入可執行任務佇列
+
+        Args:
+            target (str): 要移除的 task name
+        """
+
+        idx = self._ids[target]
+
+        self.success_tasks.add(target)
+
+        self._take_out(idx)
+        self._status[idx] = self.SUCCESS
+
+        status, indegree, edges = self._status, self._indegree, self._edges
+
+        for k in range(self._offsets[idx], self._offsets[idx + 1]):
+            end = edges[k]
+
+            if status[end] != self.WAITING:
+                continue
+
+            indegree[end] -= 1
+
+            if indegree[end] == 0:
+                self._waiting_count -= 1
+                status[end] = self.READY
+                self._push_ready(end)
+                self._ready_count += 1
+
+    def restore(self, success_tasks) -> set:
+        """還原已經成功的任務 (例如從檢查點接續執行)，下游任務會依照一般的規則變成可執行
+
+        只有依賴任務都已經成功的任務才會被還原，所以會依照拓撲排序處理
+
+        Args:
+            success_tasks (Iterable[str]): 已經成功的任務名稱
+
+        Returns:
+            set: 實際還原的任務名稱
+        """
+
+        success_tasks = set(success_tasks)
+        restored = set()
+
+        for idx in self._topo_order:
+            task_name = self._names[idx]
+
+            if task_name in success_tasks and self._status[idx] == self.READY:
+                self.remove_success_task(task_name)
+                restored.add(task_name)
+
+        return restored
+
+    def update_tasks_order_queue(self):
+        """依照目前的狀態重新整理 `tasks_order_queue` ，只保留還沒有執行的任務
+
+        任務狀態已經在 `remove_success_task` 與 `remove_faile_task` 中增量更新，
+        這個方法只是為了紀錄用途，排程時不需要呼叫
+        """
+
+        self.tasks_order_queue = deque(
+            task_name
+            for task_name in self.tasks_order_queue
+            if self._status[self._ids[task_name]] in (self.WAITING, self.READY)
+        )
+
+    def is_task_can_be_execute(self, task_name: str) -> bool:
+        """判斷傳入的 task 在目前的狀態是否可以執行 (有可能依賴任務還沒完成)
+
+        Args:
+            task_name (str): 要判斷的任務名
+
+        Returns:
+            bool: 如果可以執行，回傳 `True` ，反之 `False`
+        """
+
+        idx = self._ids.get(task_name)
+
+        if idx is None:
+            return True
+
+        reverse_offsets, reverse_edges = self._reverse_graph()
+
+        for k in range(reverse_offsets[idx], reverse_offsets[idx + 1]):
+            if self._status[reverse_edges[k]] != self.SUCCESS:
+                return False
+
+        return True
+
+    def edges(self):
+        """依序產生所有的任務順序
+
+        Yields:
+            Tuple[str, str]: (上游任務名稱, 下游任務名稱)
+        """
+
+        names, offsets, edges = self._names, self._offsets, self._edges
+
+        for idx, name in enumerate(names):
+            for k in range(offsets[idx], offsets[idx + 1]):
+                yield name, names[edges[k]]
+
+    @property
+    def task_names(self) -> List[str]:
+        """所有任務名稱 (依照任務 id ，也就是第一次出現在任務順序中的順序)"""
+
+        return list(self._names)
+
+    def topological_order(self) -> List[str]:
+        """依照拓撲排序的所有任務名稱 (與目前的執行狀態無關)"""
+
+        return [self._names[i] for i in self._topo_order]
+
+    def successors(self, task_name: str) -> List[str]:
+        """直接依賴這個任務的下游任務名稱 (依照任務順序中出現的順序)"""
+
+        idx = self._ids[task_name]
+
+        return [self._names[self._edges[k]] for k in range(self._offsets[idx], self._offsets[idx + 1])]
+
+    def predecessors(self, task_name: str) -> List[str]:
+        """這個任務直接依賴的上游任務名稱"""
+
+        idx = self._ids[task_name]
+        reverse_offsets, reverse_edges = self._reverse_graph()
+
+        return [self._names[reverse_edges[k]] for k in range(reverse_offsets[idx], reverse_offsets[idx + 1])]
+
+    def impact(self, task_name: str) -> set:
+        """如果這個任務現在失敗，會被取消的任務名稱 (還在等待執行的下游任務)
+
+        Args:
+            task_name (str): 任務名稱
+
+        Returns:
+            set: 會被取消的任務名稱
+        """
+
+        return {
+            self._names[i] for i in self._iter_descendants(self._ids[task_name]) if self._status[i] == self.WAITING
+        }
+
+    def impact_count(self, task_name: str) -> int:
+        """任務所有下游任務的數量，也就是在執行前這個任務失敗時會被取消的任務數量
+
+        有預先計算 bitset (`impact_index`) 時只需要計算位元數量，否則會走訪有向圖
+
+        Args:
+            task_name (str): 任務名稱
+
+        Returns:
+            int: 下游任務數量
+        """
+
+        idx = self._ids[task_name]
+
+        if self._descendants is not None:
+            return bin(self._descendants[idx]).count("1")
+
+        return sum(1 for _ in self._iter_descendants(idx))
+
+    def impact_report(self, top: Optional[int] = 10) -> List[Tuple[str, int]]:
+        """依照失敗時會被取消的任務數量排序，列出影響範圍最大的任務
+
+        Args:
+            top (Optional[int], optional): 只回傳前幾名，設定為 `None` 時回傳所有任務
+
+        Returns:
+            List[Tuple[str, int]]: [(任務名稱, 下游任務數量), ...]
+        """
+
+        report = sorted(((i, self.impact_count(i)) for i in self._names), key=lambda i: -i[1])
+
+        return report if top is None else report[:top]
+
+    def report(self, task_name: str, status: bool):
+        """在任務執行完後回報是否成功執行完成
+
+            會將 `task_name` 添加到 `success_tasks` 或 `faile_tasks` 中，
+            並只更新這個任務的下游任務狀態。
+
+        Args:
+            task_name (str): 任務名稱
+            status (bool): 使否成功執行完成，如果是就填入 `True` ，反之就 `False`
+        """
+
+        if status:
+            self.remove_success_task(task_name)
+
+        else:
+            self.remove_faile_task(task_name)
+
+    @property
+    def next(self) -> str:
+        """取得在目前狀態下，可以開始執行的任務名稱 (也就是這個任務依賴的任務已經完成，或是這個任務是獨立的任務)
+
+        Returns:
+            str: 回傳一個任務名稱，如果目前沒有可以執行的任務，回傳 `None`
+        """
+
+        while self._ready_queue:
+            idx = self._pop_ready()
+
+            # 在被取出前就已經回報結果的任務
+            if self._status[idx] != self.READY:
+                continue
+
+            self._status[idx] = self.RUNNING
+            self._ready_count -= 1
+
+            return self._names[idx]
+
+        return None
+
+    @property
+    def ready_count(self) -> int:
+        """可以執行但還沒有被 `next` 取出的任務數量"""
+
+        return self._ready_count
 
     @property
     def is_empty(self) -> bool:
-        """檢查任務佇列或是獨立任務佇列是否為空的，可以用來檢查排程是否要繼續執行
+        """檢查是否還有可執行或是等待依賴任務完成的任務，可以用來檢查排程是否要繼續執行
 
         Returns:
-            bool: 如果佇列中還有東西則會傳 `True`，反之回傳 `False`
+            bool: 如果沒有任何等待執行的任務則回傳 `True`，反之回傳 `False`
         """
 
-        return len(self.tasks_order_queue) == 0 and len(self._independent_tasks_queue) == 0
+        return self._ready_count == 0 and self._waiting_count == 0
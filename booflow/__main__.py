@@ -0,0 +1,87 @@
+"""
+從命令列執行工作流程
+
+工作流程檔案為 JSON 格式，包含任務清單 (`tasks`)、任務順序 (`order`) 與參數設定 (`config`，可以省略):
+
+    {
+        "tasks": [{"task_name": "task_a", "command": "echo a"}, {"task_name": "task_b", "command": "echo b"}],
+        "order": [["task_a", "task_b"]],
+        "config": {"max_workers": 4}
+    }
+
+Usage:
+    $ python -m booflow workflow.json
+
+    $ python -m booflow workflow.json --targets task_d                   # 只執行 task_d 與它依賴的上游任務
+    $ python -m booflow workflow.json --start-from task_b --exclude task_c
+    $ python -m booflow workflow.json --start-from task_b --list          # 只列出會執行的任務
+"""
+
+import sys
+import json
+import argparse
+from typing import List
+
+from booflow import BooFlow
+from booflow.workflow import WorkflowError
+
+
+def load_workflow(path: str) -> tuple:
+    """讀取工作流程檔案
+
+    Returns:
+        tuple: (任務清單, 任務順序清單, 參數設定)
+    """
+
+    with open(path, "r", encoding="utf8") as f:
+        workflow = json.load(f)
+
+    return workflow["tasks"], [tuple(i) for i in workflow["order"]], workflow.get("config", {})
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m booflow", description="booflow 工作流程執行")
+    parser.add_argument("workflow", help="工作流程檔案 (JSON)")
+    parser.add_argument("--targets", nargs="+", default=None, help="只執行這些任務與它們依賴的上游任務")
+    parser.add_argument("--start-from", nargs="+", default=None, help="只執行這些任務與它們的下游任務")
+    parser.add_argument("--exclude", nargs="+", default=None, help="不執行的任務 (當作已經執行完成)")
+    parser.add_argument("--max-workers", type=int, default=None, help="同時執行的任務數量 (覆蓋工作流程檔案中的設定)")
+    parser.add_argument("--resume", action="store_true", help="接續上一次被中斷的執行")
+    parser.add_argument("--trace-file", default=None, help="時間軸檔案 (Trace Event Format)")
+    parser.add_argument("--list", action="store_true", help="只依照執行順序列出會執行的任務，不執行")
+
+    args = parser.parse_args(argv)
+
+    tasks, order, config = load_workflow(args.workflow)
+    config = dict(config)
+
+    for key in ("targets", "start_from", "exclude", "max_workers"):
+        value = getattr(args, key)
+
+        if value is not None:
+            config[key] = value
+
+    try:
+        bf = BooFlow(tasks, order, config)
+
+    except WorkflowError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if args.list:
+        for name in bf.task_obj.tasks_order_queue:
+            print(name)
+
+        return 0
+
+    result = bf.run(resume=args.resume, trace_file=args.trace_file)
+
+    print(f"執行成功的任務: {sorted(result['success_tasks'])}")
+    print(f"執行失敗的任務: {sorted(result['faile_tasks'])}")
+    print(f"沒有執行的任務: {sorted(result['not_execute_tasks'])}")
+
+    return 1 if result["faile_tasks"] or result["cancelled"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
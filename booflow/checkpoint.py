@@ -0,0 +1,137 @@
+"""
+執行狀態檢查點
+
+每個任務回報結果後，都會在檢查點檔案中附加一行 JSON ，如果排程在執行途中被中斷，
+下一次執行時可以讀取檢查點，略過已經成功的任務，從中斷的地方繼續執行。
+
+檔案格式 (JSON lines):
+
+    {"fingerprint": "...", "started_at": 1700000000.0}
+    {"task": "task1", "status": true}
+    {"task": "task2", "status": false}
+    {"finished": true}
+
+第一行記錄流程定義 (任務清單與任務順序) 的指紋，如果流程定義改變，就不會使用這個檢查點。
+只有所有任務都成功時才會寫入 `finished` ，有任務失敗、超過執行期限或是被取消的執行都可以接續執行。
+每一筆紀錄都是以單次 `write` 附加到檔案最後，程序被中斷時最多只會遺失最後一行 (讀取時會忽略不完整的行)。
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import List, Dict, Optional
+
+__all__ = ["Checkpoint"]
+
+
+class Checkpoint:
+    """執行狀態檢查點
+
+    Args:
+        path (str): 檢查點檔案位置
+
+        fingerprint (str): 流程定義的指紋，可以使用 :meth:`Checkpoint.workflow_fingerprint` 計算
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+
+        self._fd = None
+
+    @staticmethod
+    def workflow_fingerprint(tasks: List[dict], order: List[tuple]) -> str:
+        """計算流程定義的指紋 (任務名稱、指令與任務順序)"""
+
+        definition = {
+            "tasks": [[i.get("task_name"), i.get("command")] for i in tasks],
+            "order": [list(i) for i in order],
+        }
+
+        return hashlib.sha256(json.dumps(definition, ensure_ascii=False).encode("utf8")).hexdigest()
+
+    def load(self) -> Optional[Dict[str, bool]]:
+        """讀取檢查點
+
+        Returns:
+            Optional[Dict[str, bool]]: {"task_name" : 是否成功}，依照回報的順序排列。
+                如果檢查點不存在、流程定義已經改變，或是上一次的執行已經完成，回傳 `None`
+        """
+
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                lines = f.readlines()
+
+        except OSError:
+            return None
+
+        records = []
+
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+
+            # 程序被中斷時寫入一半的行
+            except ValueError:
+                continue
+
+        if not records or records[0].get("fingerprint") != self.fingerprint:
+            return None
+
+        statuses = {}
+
+        for record in records[1:]:
+            if record.get("finished"):
+                return None
+
+            if "task" in record:
+                statuses[record["task"]] = record["status"]
+
+        return statuses
+
+    def is_changed(self) -> bool:
+        """檢查點存在，但是流程定義 (任務清單或任務順序) 已經改變"""
+
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                header = json.loads(f.readline())
+
+        except (OSError, ValueError):
+            return False
+
+        return header.get("fingerprint") != self.fingerprint
+
+    def open(self, resume: bool = False):
+        """開啟檢查點檔案，如果不是接續執行，會清空原本的內容並寫入新的檔頭"""
+
+        if resume:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        else:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_TRUNC, 0o644)
+            self._write({"fingerprint": self.fingerprint, "started_at": time.time()})
+
+    def _write(self, record: dict):
+        os.write(self._fd, (json.dumps(record, ensure_ascii=False) + "\n").encode("utf8"))
+
+    def record(self, task_name: str, status: bool):
+        """紀錄任務的執行結果"""
+
+        self._write({"task": task_name, "status": status})
+
+    def close(self, finished: bool = True):
+        """關閉檢查點檔案
+
+        Args:
+            finished (bool, optional): 這次執行是否已經完成，完成的檢查點不會再被接續執行
+        """
+
+        if self._fd is None:
+            return
+
+        if finished:
+            self._write({"finished": True})
+
+        os.close(self._fd)
+        self._fd = None
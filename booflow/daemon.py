@@ -0,0 +1,565 @@
+"""
+常駐排程
+
+`Daemon` 常駐在背景，依照 cron 表示式定期執行工作流程 (或是單一任務)，不需要每次都由系統的 cron 啟動新的程序。
+
+- 每個排程的 `BooFlow` (任務依賴圖與設定) 只會建立一次，每次執行前只需要還原任務狀態
+- 所有排程放在同一個依照 `time.monotonic` 排序的 timer heap 中，只會在最近的排程時間醒來，不需要輪詢
+- 上一次執行還沒結束時，依照 `overlap` 處理這次的排程:
+
+    - `"skip"`: 略過這次排程 (默認)
+    - `"queue"`: 等上一次執行結束後再執行，最多累積 `max_queued` 次
+    - `"cancel"`: 取消上一次執行 (詳見 :meth:`BooFlow.cancel`)，結束後立刻執行
+
+- 主機休眠 (或是系統時間被調整) 而錯過的排程，依照 `catchup` 處理:
+
+    - `"skip"`: 不補執行，等待下一次排程 (默認)
+    - `"once"`: 不論錯過幾次，只補執行一次
+    - `"all"`: 每一次錯過的排程都補執行 (最多 `max_catchup` 次)
+
+  超過排程時間 `misfire_grace` 秒以上才醒來，就當作錯過這次排程。
+
+cron 表示式與系統的 cron 相同 (分 時 日 月 星期)，也可以在最前面加上秒 (秒 分 時 日 月 星期)，
+支援 `*` 、 `1,2,3` 、 `1-5` 、 `*/15` 、 `1-30/5` 、月份與星期的英文縮寫 (`jan` 、 `mon`)，
+以及 `@yearly` 、 `@monthly` 、 `@weekly` 、 `@daily` 、 `@hourly` 。日與星期都有限制時，符合其中一個就會執行。
+時間使用這台機器的時區。
+
+Usage:
+    >>> from booflow.daemon import Daemon
+
+    >>> daemon = Daemon()
+    >>> daemon.add("etl", tasks, order, config, schedule="0 2 * * *", overlap="queue", catchup="once")
+    >>> daemon.serve()
+
+    任務也可以設定自己的排程 (`schedule`)，會依照這個排程單獨執行這個任務
+
+    >>> tasks = [{"task_name": "sync", "command": "python3 sync.py", "schedule": "*/5 * * * *"}, ...]
+"""
+
+import os
+import re
+import time
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple, Callable, Optional
+
+from booflow import BooFlow, Logger
+
+__all__ = ["Daemon", "CronExpression"]
+
+# 巨集與對應的 cron 表示式
+_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+_MONTHS = {name: idx + 1 for idx, name in enumerate("jan feb mar apr may jun jul aug sep oct nov dec".split())}
+_WEEKDAYS = {name: idx for idx, name in enumerate("sun mon tue wed thu fri sat".split())}
+
+
+class CronExpression:
+    """cron 表示式
+
+    Args:
+        expr (str): cron 表示式，詳見 :mod:`booflow.daemon`
+
+    Raises:
+        ValueError: 無法解析的表示式
+    """
+
+    # (欄位名稱, 最小值, 最大值, 英文縮寫)
+    FIELDS = (
+        ("second", 0, 59, None),
+        ("minute", 0, 59, None),
+        ("hour", 0, 23, None),
+        ("day", 1, 31, None),
+        ("month", 1, 12, _MONTHS),
+        ("weekday", 0, 7, _WEEKDAYS),
+    )
+
+    def __init__(self, expr: str):
+        self.expr = expr
+
+        fields = _MACROS.get(expr.strip().lower(), expr).split()
+
+        if len(fields) == 5:
+            fields = ["0"] + fields
+
+        if len(fields) != 6:
+            raise ValueError(f"cron 表示式需要 5 或 6 個欄位，目前為: {expr!r}")
+
+        self.seconds, self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(text, *spec) for text, spec in zip(fields, self.FIELDS)
+        )
+
+        # 0 與 7 都代表星期日
+        self.weekdays = frozenset(i % 7 for i in weekdays)
+
+        # 日與星期都有限制時，符合其中一個就可以 (與 cron 相同)
+        self._day_or = not fields[3].startswith("*") and not fields[5].startswith("*")
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expr!r})"
+
+    def _parse_field(self, text: str, name: str, low: int, high: int, names: Optional[Dict[str, int]]) -> frozenset:
+        values = set()
+
+        for part in text.lower().split(","):
+            match = re.fullmatch(r"(\*|[a-z0-9]+)(?:-([a-z0-9]+))?(?:/(\d+))?", part)
+
+            if match is None:
+                raise ValueError(f"cron 表示式 {self.expr!r} 的 {name} 欄位無法解析: {part!r}")
+
+            start, end, step = match.groups()
+
+            if start == "*":
+                if end is not None:
+                    raise ValueError(f"cron 表示式 {self.expr!r} 的 {name} 欄位無法解析: {part!r}")
+
+                first, last = low, high
+
+            else:
+                first = self._parse_value(start, name, names)
+                last = self._parse_value(end, name, names) if end is not None else (high if step else first)
+
+            step = int(step) if step else 1
+
+            if not low <= first <= last <= high or step < 1:
+                raise ValueError(f"cron 表示式 {self.expr!r} 的 {name} 欄位超出範圍 {low}-{high}: {part!r}")
+
+            values.update(range(first, last + 1, step))
+
+        return frozenset(values)
+
+    def _parse_value(self, text: str, name: str, names: Optional[Dict[str, int]]) -> int:
+        if text.isdigit():
+            return int(text)
+
+        if names is not None and text in names:
+            return names[text]
+
+        raise ValueError(f"cron 表示式 {self.expr!r} 的 {name} 欄位無法解析: {text!r}")
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        weekday = dt.isoweekday() % 7 in self.weekdays
+
+        return (day or weekday) if self._day_or else (day and weekday)
+
+    def next_after(self, dt: datetime) -> datetime:
+        """下一個符合的時間 (不包含 `dt`)
+
+        從月份開始逐層檢查，不符合時直接跳到下一個月 / 日 / 時 / 分，
+        所以最多只需要檢查幾百次就能找到下一個時間
+
+        Raises:
+            ValueError: 5 年內都沒有符合的時間 (例如 2 月 30 日)
+        """
+
+        t = dt.replace(microsecond=0) + timedelta(seconds=1)
+        limit = t.year + 5
+
+        while t.year <= limit:
+            if t.month not in self.months:
+                t = datetime(t.year + t.month // 12, t.month % 12 + 1, 1)
+
+            elif not self._day_matches(t):
+                t = datetime(t.year, t.month, t.day) + timedelta(days=1)
+
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0, second=0) + timedelta(hours=1)
+
+            elif t.minute not in self.minutes:
+                t = t.replace(second=0) + timedelta(minutes=1)
+
+            elif t.second not in self.seconds:
+                t += timedelta(seconds=1)
+
+            else:
+                return t
+
+        raise ValueError(f"cron 表示式 {self.expr!r} 沒有符合的時間")
+
+
+class _Entry:
+    """一個排程 (工作流程或單一任務) 與它目前的執行狀態"""
+
+    def __init__(self, name: str, booflow: BooFlow, schedule: CronExpression, overlap: str, catchup: str, max_queued: int):
+        self.name = name
+        self.booflow = booflow
+        self.schedule = schedule
+        self.overlap = overlap
+        self.catchup = catchup
+        self.max_queued = max_queued
+
+        # 下一次排程時間 (`time.time`)
+        self.next_run = None
+
+        # 正在執行的執行緒，以及執行結束後還要再執行的次數
+        self.thread = None
+        self.queued = 0
+
+        self.runs = 0
+        self.last_result = None
+
+
+class Daemon:
+    """常駐排程，詳見 :mod:`booflow.daemon`
+
+    Args:
+        misfire_grace (float, optional): 超過排程時間多少秒以上才醒來，就當作錯過這次排程 (默認為 60)
+
+        max_sleep (float, optional): 每次最多等待多久就檢查一次系統時間 (秒)，
+            `time.monotonic` 在主機休眠期間不會前進，所以休眠後最晚在這段時間內發現錯過的排程 (默認為 60)
+
+        max_catchup (int, optional): `catchup="all"` 時最多補執行的次數 (默認為 10)
+
+        log_file_path (Optional[str], optional): 常駐排程本身的 log 檔案，每次執行的 log 仍然依照各自的 `log_file_path`
+            (默認為 `./log/daemon.log`)
+
+        on_finish (Optional[Callable[[str, dict], None]], optional): 每次執行結束後呼叫 (排程名稱, 執行結果)，
+            執行結果詳見 :meth:`BooFlow._finish`
+    """
+
+    OVERLAP_POLICIES = ("skip", "queue", "cancel")
+    CATCHUP_POLICIES = ("skip", "once", "all")
+
+    # 系統時間與 `time.monotonic` 相差超過這個值 (秒)，就重新計算所有排程的喚醒時間
+    CLOCK_TOLERANCE = 1.0
+
+    def __init__(
+        self,
+        misfire_grace: float = 60.0,
+        max_sleep: float = 60.0,
+        max_catchup: int = 10,
+        log_file_path: Optional[str] = None,
+        on_finish: Optional[Callable[[str, dict], None]] = None,
+    ):
+        self.misfire_grace = misfire_grace
+        self.max_sleep = max_sleep
+        self.max_catchup = max_catchup
+        self.on_finish = on_finish
+
+        self.log_file_path = log_file_path or os.path.join(BooFlow._get_root_path(), "log", "daemon.log")
+
+        self._entries: Dict[str, _Entry] = {}
+
+        # (喚醒時間 (`time.monotonic`), 序號, 排程名稱)，排程時間改變時舊的項目會留在 heap 中，取出時再忽略
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        self._logger = None
+
+    def add(
+        self,
+        name: str,
+        tasks: List[Dict],
+        order: List[tuple],
+        config: Optional[dict] = None,
+        schedule: Optional[str] = None,
+        overlap: str = "skip",
+        catchup: str = "skip",
+        max_queued: int = 1,
+    ) -> List[str]:
+        """加入一個工作流程，任務清單中有設定 `schedule` 的任務會另外單獨排程
+
+        每個排程默認使用自己的檢查點與增量執行快取 (`./log/checkpoint.<name>.jsonl` 、 `./log/uptodate.<name>.json`)，
+        同時執行的排程不會寫入同一個檔案
+
+        Args:
+            name (str): 排程名稱，任務的排程名稱為 `<name>:<task_name>`
+
+            tasks (List[Dict]): 任務清單
+
+            order (List[tuple]): 任務順序清單
+
+            config (Optional[dict], optional): 參數設定，詳見 :class:`BooFlow`
+
+            schedule (Optional[str], optional): 整個工作流程的 cron 表示式，沒有設定時只會執行有設定 `schedule` 的任務
+
+            overlap (str, optional): 上一次執行還沒結束時的處理方式
+
+            catchup (str, optional): 錯過的排程的處理方式
+
+            max_queued (int, optional): `overlap="queue"` 時最多累積的執行次數
+
+        Raises:
+            ValueError: 排程名稱重複、無法解析的 cron 表示式，或是未知的 `overlap` / `catchup`
+
+        Returns:
+            List[str]: 加入的排程名稱
+        """
+
+        if overlap not in self.OVERLAP_POLICIES:
+            raise ValueError(f"未知的 overlap: {overlap}，可以使用: {self.OVERLAP_POLICIES}")
+
+        if catchup not in self.CATCHUP_POLICIES:
+            raise ValueError(f"未知的 catchup: {catchup}，可以使用: {self.CATCHUP_POLICIES}")
+
+        config = config or {}
+
+        # (排程名稱, cron 表示式, 任務清單, 任務順序)
+        definitions = []
+
+        if schedule is not None:
+            definitions.append((name, schedule, tasks, order))
+
+        for task in tasks:
+            if task.get("schedule") is not None:
+                single = {k: v for k, v in task.items() if k != "schedule"}
+                definitions.append((f"{name}:{task['task_name']}", task["schedule"], [single], [(task["task_name"],)]))
+
+        added = []
+
+        for entry_name, expr, entry_tasks, entry_order in definitions:
+            if entry_name in self._entries:
+                raise ValueError(f"排程名稱重複: {entry_name}")
+
+            cron = CronExpression(expr)
+
+            entry_config = dict(config)
+
+            for key, file_name in (("checkpoint_file", "checkpoint.{}.jsonl"), ("uptodate_cache", "uptodate.{}.json")):
+                entry_config.setdefault(
+                    key, os.path.join(BooFlow._get_root_path(), "log", file_name.format(entry_name.replace(os.sep, "_")))
+                )
+
+            entry = _Entry(entry_name, BooFlow(entry_tasks, entry_order, entry_config), cron, overlap, catchup, max_queued)
+
+            with self._cond:
+                self._entries[entry_name] = entry
+
+                if self._logger is not None:
+                    self._schedule(entry, time.time())
+                    self._cond.notify()
+
+            added.append(entry_name)
+
+        return added
+
+    def status(self) -> Dict[str, dict]:
+        """每個排程目前的狀態
+
+        Returns:
+            Dict[str, dict]: {"排程名稱" : {"schedule" : cron 表示式, "next_run" : 下一次排程時間 (`time.time`),
+                "running" : 是否正在執行, "queued" : 等待執行的次數, "runs" : 已經執行的次數, "last_result" : 最後一次執行結果}}
+        """
+
+        with self._cond:
+            return {
+                name: {
+                    "schedule": entry.schedule.expr,
+                    "next_run": entry.next_run,
+                    "running": entry.thread is not None,
+                    "queued": entry.queued,
+                    "runs": entry.runs,
+                    "last_result": entry.last_result,
+                }
+                for name, entry in self._entries.items()
+            }
+
+    def serve(self):
+        """開始排程，直到呼叫 :meth:`Daemon.stop` 為止"""
+
+        with self._cond:
+            self._stopped = False
+            self._logger = Logger("booflow.daemon", self.log_file_path)
+
+            now = time.time()
+
+            for entry in self._entries.values():
+                self._schedule(entry, now)
+
+        log = self._logger.logger
+        log.info(f"常駐排程開始，排程: {sorted(self._entries)}")
+
+        anchor = (time.time(), time.monotonic())
+
+        try:
+            with self._cond:
+                while not self._stopped:
+                    wall, mono = time.time(), time.monotonic()
+
+                    # 主機休眠時 `time.monotonic` 不會前進，系統時間也可能被調整，需要重新計算喚醒時間
+                    drift = (wall - anchor[0]) - (mono - anchor[1])
+
+                    if abs(drift) > self.CLOCK_TOLERANCE:
+                        log.warning(f"系統時間與 monotonic 時間相差 {drift:.1f} 秒 (主機休眠或時間被調整)，重新計算排程")
+                        self._rebuild_heap(wall, mono)
+
+                    anchor = (wall, mono)
+
+                    while self._heap and self._heap[0][0] <= mono:
+                        _, _, name = heapq.heappop(self._heap)
+                        self._fire(self._entries[name], wall, mono)
+
+                    timeout = self.max_sleep
+
+                    if self._heap:
+                        timeout = min(max(self._heap[0][0] - mono, 0), timeout)
+
+                    self._cond.wait(timeout)
+
+        finally:
+            # 等待執行中的工作流程結束後才關閉 log
+            with self._cond:
+                threads = [i.thread for i in self._entries.values() if i.thread is not None]
+
+            for thread in threads:
+                thread.join()
+
+            log.info("常駐排程結束")
+
+            self._logger.close()
+            self._logger = None
+
+    def stop(self, cancel: bool = False, timeout: Optional[float] = None):
+        """停止排程，等待執行中的工作流程結束 (可以在其他執行緒或 signal handler 中呼叫)
+
+        Args:
+            cancel (bool, optional): 是否取消執行中的工作流程
+
+            timeout (Optional[float], optional): 最多等待多久 (秒)
+        """
+
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+            threads = [i.thread for i in self._entries.values() if i.thread is not None]
+
+            for entry in self._entries.values():
+                entry.queued = 0
+
+                if cancel and entry.thread is not None:
+                    entry.booflow.cancel()
+
+        for thread in threads:
+            thread.join(timeout)
+
+    def _schedule(self, entry: _Entry, now: float):
+        """計算排程在 `now` 之後的下一次執行時間並放入 timer heap ，呼叫前需要取得 `_cond`"""
+
+        entry.next_run = entry.schedule.next_after(datetime.fromtimestamp(now)).timestamp()
+
+        self._push(entry, now, time.monotonic())
+
+    def _push(self, entry: _Entry, wall: float, mono: float):
+        heapq.heappush(self._heap, (mono + max(entry.next_run - wall, 0), self._seq, entry.name))
+        self._seq += 1
+
+    def _rebuild_heap(self, wall: float, mono: float):
+        self._heap = []
+
+        for entry in self._entries.values():
+            self._push(entry, wall, mono)
+
+    def _fire(self, entry: _Entry, wall: float, mono: float):
+        """排程時間到了，依照 `catchup` 決定要執行幾次，並計算下一次的排程時間"""
+
+        log = self._logger.logger
+
+        # 因為 heap 以 monotonic 時間排序，系統時間被往回調整時可能還沒到排程時間
+        if wall < entry.next_run:
+            self._push(entry, wall, mono)
+            return
+
+        # 到現在為止所有應該執行的排程時間
+        due = [entry.next_run]
+        next_run = entry.schedule.next_after(datetime.fromtimestamp(entry.next_run)).timestamp()
+
+        while next_run <= wall and len(due) <= self.max_catchup:
+            due.append(next_run)
+            next_run = entry.schedule.next_after(datetime.fromtimestamp(next_run)).timestamp()
+
+        on_time = wall - due[-1] <= self.misfire_grace
+        missed = len(due) - 1 if on_time else len(due)
+
+        if entry.catchup == "all":
+            times = min(len(due), self.max_catchup)
+
+        elif entry.catchup == "once":
+            times = 1
+
+        else:
+            times = 1 if on_time else 0
+
+        if missed:
+            log.warning(f"排程 {entry.name} 錯過 {missed} 次排程 (catchup={entry.catchup})，執行 {times} 次")
+
+        for _ in range(times):
+            self._trigger(entry)
+
+        self._schedule(entry, wall)
+
+    def _trigger(self, entry: _Entry):
+        """執行一次排程，上一次執行還沒結束時依照 `overlap` 處理，呼叫前需要取得 `_cond`"""
+
+        log = self._logger.logger
+
+        if entry.thread is None:
+            entry.thread = threading.Thread(target=self._run_entry, args=(entry,), name=f"booflow-{entry.name}", daemon=True)
+            entry.thread.start()
+
+        elif entry.overlap == "skip":
+            log.warning(f"排程 {entry.name} 的上一次執行還沒結束，略過這次排程")
+
+        elif entry.overlap == "queue":
+            if entry.queued < entry.max_queued:
+                entry.queued += 1
+                log.info(f"排程 {entry.name} 的上一次執行還沒結束，結束後再執行 (等待 {entry.queued} 次)")
+
+            else:
+                log.warning(f"排程 {entry.name} 已經累積 {entry.queued} 次等待執行，略過這次排程")
+
+        elif entry.queued == 0:
+            log.warning(f"排程 {entry.name} 的上一次執行還沒結束，取消上一次執行")
+
+            entry.queued = 1
+            entry.booflow.cancel()
+
+    def _run_entry(self, entry: _Entry):
+        """在背景執行緒中執行排程，結束後如果還有等待的執行就繼續執行"""
+
+        log = self._logger.logger
+
+        while True:
+            log.info(f"排程 {entry.name} 開始執行")
+
+            start = time.monotonic()
+
+            try:
+                result = entry.booflow.run()
+
+            except Exception as e:
+                log.exception(f"排程 {entry.name} 執行時發生錯誤: {e}")
+                result = None
+
+            else:
+                log.info(
+                    f"排程 {entry.name} 執行結束 ({time.monotonic() - start:.3f}s) ，"
+                    f"成功 {len(result['success_tasks'])} 個任務，失敗 {len(result['faile_tasks'])} 個任務"
+                    + ("，執行被取消" if result["cancelled"] else "")
+                )
+
+            if self.on_finish is not None and result is not None:
+                self.on_finish(entry.name, result)
+
+            with self._cond:
+                entry.runs += 1
+                entry.last_result = result
+
+                if entry.queued == 0 or self._stopped:
+                    entry.thread = None
+                    return
+
+                entry.queued -= 1
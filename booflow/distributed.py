@@ -0,0 +1,775 @@
+"""
+分散式執行
+
+`Coordinator` 在這台機器上維護任務的依賴狀態 (`Task`)，並將可以執行的任務 (指令、逾時等設定)
+透過 TCP 交給其他機器上的 `Worker` 執行，worker 執行完後回傳結果。
+
+- 協定為每行一個 JSON (newline-delimited JSON)
+- worker 連線後會告知自己的 id 、 label 與可以同時執行的任務數量 (slots)，並每隔一段時間送出 heartbeat
+- 設定 `coordinator_token` 時， worker 需要在 hello 中帶上相同的 token 才能連線，
+  監聽其他位址 (例如 `0.0.0.0`) 時一定要設定，否則任何連得到的主機都可以取得任務指令並回報假的結果
+- 任務可以設定 `labels` ，只會交給擁有所有 label 的 worker 執行
+- worker 斷線，或是超過 `heartbeat_timeout` 秒沒有送出任何訊息時，交給它的任務會重新排程到其他 worker ，
+  所以任務可能會被執行不只一次
+- 連線後超過 `handshake_timeout` 秒沒有送出 hello 的連線會被關閉
+- 沒有任何連線中的 worker 擁有任務需要的所有 label 時會紀錄警告，超過 `worker_wait_timeout` 秒仍然沒有時，
+  這次執行會以錯誤種類 `no worker` 失敗
+- 重新執行、執行期限、執行紀錄、檢查點與監控指標都與 `BooFlow.run` 相同，由 coordinator 處理，
+  任務的 stdout / stderr 輸出檔案存放在 worker 上
+
+訊息格式:
+
+    worker -> coordinator
+        {"type": "hello", "worker_id": "...", "labels": [...], "slots": 2, "token": "..."}
+        {"type": "heartbeat"}
+        {"type": "result", "job_id": 1, "result": [true, null, "..."], "attempt": {...}}
+
+    coordinator -> worker
+        {"type": "run", "job_id": 1, "task": {...}, "attempt": 1, "tail_size": 4096}
+        {"type": "cancel", "job_id": 1}
+        {"type": "shutdown"}
+
+Usage:
+    在 coordinator 上 ( `max_workers` 為同時交給 worker 執行的任務數量)
+
+    >>> from booflow.distributed import Coordinator
+
+    >>> config = {"coordinator_host": "0.0.0.0", "coordinator_port": 9000, "coordinator_token": "...", "max_workers": 16}
+    >>> Coordinator(tasks, order, config).run()
+
+    在每一台 worker 上 (token 也可以用環境變數 `BOOFLOW_TOKEN` 設定)
+
+    $ python -m booflow.distributed --coordinator 10.0.0.1:9000 --token ... --labels gpu --slots 4
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import socket
+import logging
+import asyncio
+import argparse
+import functools
+import threading
+from collections import deque
+from typing import List, Dict, Tuple, Optional, Iterable
+
+from booflow import BooFlow, Cron, _RunAdapter
+from booflow.resources import Resources
+
+__all__ = ["Coordinator", "Worker"]
+
+# worker 送出 heartbeat 的間隔 (秒)
+HEARTBEAT_INTERVAL = 2.0
+
+# coordinator 超過多久沒有收到 worker 的訊息，就當作 worker 已經停止 (秒)
+HEARTBEAT_TIMEOUT = 10.0
+
+# coordinator 等待 worker 送出 hello 的時間 (秒)
+HANDSHAKE_TIMEOUT = 5.0
+
+# 任務等待擁有所有 label 的 worker 連線的時間 (秒)
+WORKER_WAIT_TIMEOUT = 300.0
+
+# worker 沒有指定 token 時使用的環境變數
+TOKEN_ENV = "BOOFLOW_TOKEN"
+
+
+class _Connection:
+    """一條 newline-delimited JSON 連線，送出訊息時會取得鎖，可以在多個執行緒中使用"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+
+        self._reader = sock.makefile("rb")
+        self._lock = threading.Lock()
+
+    def send(self, message: dict) -> bool:
+        """送出一則訊息，連線已經中斷時回傳 `False`"""
+
+        data = (json.dumps(message) + "\n").encode("utf8")
+
+        try:
+            with self._lock:
+                self.sock.sendall(data)
+
+        except OSError:
+            return False
+
+        return True
+
+    def recv(self) -> Optional[dict]:
+        """讀取一則訊息，連線已經關閉或是收到無法解析的訊息時回傳 `None`"""
+
+        try:
+            line = self._reader.readline()
+
+            return json.loads(line) if line else None
+
+        except (OSError, ValueError):
+            return None
+
+    def close(self):
+        """關閉連線，正在 `recv` 的執行緒會收到 `None`"""
+
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+
+        except OSError:
+            pass
+
+        self._reader.close()
+        self.sock.close()
+
+
+class _Job:
+    """交給 worker 執行的一次任務執行"""
+
+    def __init__(self, job_id: int, cron: Cron):
+        self.job_id = job_id
+        self.cron = cron
+
+        # 第幾次執行 (包含重新執行)
+        self.attempt = cron.attempt + 1
+
+        # 正在執行這個任務的 worker ，還在等待 worker 時為 `None`
+        self.worker = None
+
+        # 是否已經要求中斷 (超過執行期限)
+        self.cancelled = False
+
+        # 開始沒有任何連線中的 worker 擁有所有 label 的時間 (monotonic)，有這樣的 worker 時為 `None`
+        self.unmatched_since = None
+
+        # 執行結果與這次執行的資訊 (`Cron.attempts` 中的格式)，完成時會設定 `done`
+        self.result = None
+        self.info = None
+        self.done = threading.Event()
+
+    def finish(self, result: Tuple[bool, str, str], info: Optional[dict] = None):
+        self.result = result
+        self.info = info
+        self.done.set()
+
+
+class _RemoteWorker:
+    """coordinator 端的 worker 狀態"""
+
+    def __init__(self, conn: _Connection, worker_id: str, labels: Iterable[str], slots: int):
+        self.conn = conn
+        self.worker_id = worker_id
+        self.labels = set(labels)
+        self.slots = max(int(slots), 1)
+
+        # job_id -> _Job ，正在這個 worker 上執行的任務
+        self.jobs: Dict[int, _Job] = {}
+
+        self.last_seen = time.monotonic()
+
+    def has_labels(self, cron: Cron) -> bool:
+        return cron.labels <= self.labels
+
+    def can_run(self, cron: Cron) -> bool:
+        return len(self.jobs) < self.slots and self.has_labels(cron)
+
+
+class Coordinator(BooFlow):
+    """分散式執行的 coordinator ，使用方式與 :class:`BooFlow` 相同
+
+    額外的參數設定:
+
+        - `coordinator_host` (str): 監聽的位址 (默認為 `127.0.0.1`)
+        - `coordinator_port` (int): 監聽的連接埠，設定為 0 時會自動選擇 (默認為 0)
+        - `heartbeat_timeout` (float): 超過多久沒有收到 worker 的訊息，就將它的任務重新排程 (秒，默認為 10)
+        - `coordinator_token` (str): worker 連線時需要提供的 token ，設定為 None 時不檢查 (默認為 None)
+        - `handshake_timeout` (float): worker 連線後需要在多久內送出 hello ，否則關閉連線 (秒，默認為 5)
+        - `worker_wait_timeout` (float): 沒有任何連線中的 worker 擁有任務需要的所有 label 時，
+          最多等待多久就讓這次執行以 `no worker` 失敗 (秒，默認為 300 ，設定為 None 時只紀錄警告並一直等待)
+
+    `max_workers` 為同時交給 worker 執行的任務數量，建議設定為所有 worker 的 slots 總和。
+    `run` 與 `arun` 都可以使用，`arun` 會在執行緒中執行 `run` 。
+    CPU 與記憶體由 worker 的 slots 限制，coordinator 只會檢查 `pools` 。
+    """
+
+    def __init__(self, tasks: List[Dict], order: List[tuple], config: Optional[dict] = {}):
+        super().__init__(tasks, order, config)
+
+        self.host = self.config.get("coordinator_host", "127.0.0.1")
+        self.port = self.config.get("coordinator_port", 0)
+        self.heartbeat_timeout = self.config.get("heartbeat_timeout", HEARTBEAT_TIMEOUT)
+        self.token = self.config.get("coordinator_token")
+        self.handshake_timeout = self.config.get("handshake_timeout", HANDSHAKE_TIMEOUT)
+        self.worker_wait_timeout = self.config.get("worker_wait_timeout", WORKER_WAIT_TIMEOUT)
+
+        # 任務不會在 coordinator 上執行，不限制這台機器的 CPU 與記憶體
+        if "resources" not in self.config:
+            self.resources = Resources(float("inf"), float("inf"), self.config.get("pools"))
+
+        # 實際監聽的 (位址, 連接埠)，呼叫 `start` 後才會設定
+        self.address = None
+
+        self._lock = threading.Lock()
+
+        # worker_id -> _RemoteWorker
+        self._workers: Dict[str, _RemoteWorker] = {}
+
+        # 等待 worker 的任務，以及 task_name -> 目前的 _Job
+        self._queue = deque()
+        self._jobs: Dict[str, _Job] = {}
+        self._job_seq = 0
+
+        self._server = None
+        self._stopped = None
+
+    @property
+    def workers(self) -> Dict[str, List[str]]:
+        """目前連線中的 worker: {worker_id : labels}"""
+
+        with self._lock:
+            return {i.worker_id: sorted(i.labels) for i in self._workers.values()}
+
+    @property
+    def _log(self) -> logging.LoggerAdapter:
+        """寫入這次執行 log 的紀錄器，可以在任何執行緒中使用"""
+
+        return _RunAdapter(logging.getLogger("booflow"), {"run_id": self.run_id})
+
+    def start(self) -> Tuple[str, int]:
+        """開始接受 worker 連線，`run` 會自動呼叫，也可以先呼叫來取得自動選擇的連接埠
+
+        Returns:
+            Tuple[str, int]: 實際監聽的 (位址, 連接埠)
+        """
+
+        if self._server is not None:
+            return self.address
+
+        self._server = socket.create_server((self.host, self.port))
+        self._server.settimeout(0.2)
+        self.address = self._server.getsockname()[:2]
+
+        if not self.token and self.host not in ("127.0.0.1", "localhost", "::1"):
+            logging.getLogger("booflow").warning(
+                f"coordinator 監聽 {self.host} 但沒有設定 coordinator_token ，任何連得到的主機都可以註冊成 worker"
+            )
+
+        self._stopped = threading.Event()
+
+        threading.Thread(target=self._accept_loop, args=(self._server, self._stopped), daemon=True).start()
+        threading.Thread(target=self._monitor_loop, args=(self._stopped,), daemon=True).start()
+
+        return self.address
+
+    def stop(self):
+        """停止接受連線，並通知所有 worker 結束"""
+
+        if self._server is None:
+            return
+
+        self._stopped.set()
+        self._server.close()
+        self._server = None
+
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+
+        for worker in workers:
+            worker.conn.send({"type": "shutdown"})
+            worker.conn.close()
+
+    def run(self, resume: bool = False, trace_file: Optional[str] = None) -> dict:
+        """啟動排程，任務會交給連線中的 worker 執行，詳見 :meth:`BooFlow.run`"""
+
+        self.start()
+
+        try:
+            return super().run(resume=resume, trace_file=trace_file)
+
+        finally:
+            self.stop()
+
+    async def arun(self, resume: bool = False, trace_file: Optional[str] = None) -> dict:
+        """:meth:`Coordinator.run` 的 asyncio 版本
+
+        任務本來就是在 worker 上執行， coordinator 只需要等待結果，所以會在執行緒中執行 `run` ，不會阻塞 event loop ；
+        等待中的 `arun` 被取消時會取消這次執行 (詳見 :meth:`BooFlow.cancel`)
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, functools.partial(self.run, resume=resume, trace_file=trace_file))
+
+        try:
+            return await asyncio.shield(future)
+
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def _resources_log(self, logger, task_map: Dict[str, Cron]):
+        super()._resources_log(logger, task_map)
+
+        logger.logger.info(f"coordinator 位址: {self.address[0]}:{self.address[1]} ， 已連線的 worker: {self.workers}")
+
+    def _accept_loop(self, server: socket.socket, stopped: threading.Event):
+        while not stopped.is_set():
+            try:
+                sock, addr = server.accept()
+
+            except socket.timeout:
+                continue
+
+            except OSError:
+                break
+
+            # 不送出 hello 的連線不會一直佔用執行緒，完成 hello 後才取消逾時
+            sock.settimeout(self.handshake_timeout)
+
+            threading.Thread(target=self._serve_worker, args=(sock, addr), daemon=True).start()
+
+    def _monitor_loop(self, stopped: threading.Event):
+        """定期檢查 worker 的 heartbeat ，關閉沒有回應的 worker 的連線 (由 `_serve_worker` 重新排程它的任務)，
+        並檢查沒有 worker 可以執行的任務"""
+
+        while not stopped.wait(min(self.heartbeat_timeout / 4, 1.0)):
+            now = time.monotonic()
+
+            with self._lock:
+                dead = [i for i in self._workers.values() if now - i.last_seen > self.heartbeat_timeout]
+                unmatched, expired = self._check_unmatched(now)
+
+            for worker in dead:
+                self._log.warning(f"worker {worker.worker_id} 超過 {self.heartbeat_timeout} 秒沒有回應")
+                worker.conn.close()
+
+            for job in unmatched:
+                self._log.warning(
+                    f"沒有連線中的 worker 擁有任務 {job.cron.name} 需要的所有 label: {sorted(job.cron.labels)}"
+                )
+
+            for job in expired:
+                self._log.error(f"超過 {self.worker_wait_timeout} 秒沒有 worker 可以執行任務 {job.cron.name}")
+
+    def _check_unmatched(self, now: float) -> Tuple[List[_Job], List[_Job]]:
+        """檢查等待中的任務是否有連線中的 worker 擁有它需要的所有 label ，呼叫前需要取得 `_lock`
+
+        Returns:
+            Tuple[List[_Job], List[_Job]]: (剛開始沒有 worker 可以執行的任務,
+                超過 `worker_wait_timeout` 的任務，已經從等待中的任務移除並以 `no worker` 結束)
+        """
+
+        unmatched = []
+        expired = []
+        waiting = deque()
+
+        # 相同 label 的任務只需要檢查一次
+        matched = {}
+
+        for job in self._queue:
+            labels = frozenset(job.cron.labels)
+
+            if labels not in matched:
+                matched[labels] = any(i.has_labels(job.cron) for i in self._workers.values())
+
+            if matched[labels]:
+                job.unmatched_since = None
+
+            elif job.unmatched_since is None:
+                job.unmatched_since = now
+                unmatched.append(job)
+
+            elif self.worker_wait_timeout is not None and now - job.unmatched_since > self.worker_wait_timeout:
+                job.finish((False, "no worker", f"沒有擁有所有 label 的 worker: {sorted(job.cron.labels)}"))
+                expired.append(job)
+                continue
+
+            waiting.append(job)
+
+        self._queue = waiting
+
+        return unmatched, expired
+
+    def _serve_worker(self, sock: socket.socket, addr: tuple):
+        """處理一個 worker 連線，直到連線中斷"""
+
+        conn = _Connection(sock)
+        hello = conn.recv()
+
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            self._log.warning(f"連線 {addr[0]}:{addr[1]} 沒有在 {self.handshake_timeout} 秒內送出正確的 hello ，關閉連線")
+
+            conn.close()
+            return
+
+        sock.settimeout(None)
+
+        if not self._check_token(hello.get("token")):
+            self._log.warning(f"worker token 錯誤，拒絕連線: {hello.get('worker_id')} ({addr[0]}:{addr[1]})")
+            conn.close()
+            return
+
+        worker = _RemoteWorker(
+            conn, hello.get("worker_id") or f"{addr[0]}:{addr[1]}", hello.get("labels", []), hello.get("slots", 1)
+        )
+
+        messages = []
+
+        with self._lock:
+            if worker.worker_id in self._workers:
+                worker = None
+
+            else:
+                self._workers[worker.worker_id] = worker
+                messages = self._assign()
+
+        self._send(messages)
+
+        if worker is None:
+            self._log.warning(f"worker id 重複，拒絕連線: {hello.get('worker_id')} ({addr[0]}:{addr[1]})")
+            conn.close()
+            return
+
+        self._log.info(f"worker {worker.worker_id} 已連線 (labels={sorted(worker.labels)} slots={worker.slots})")
+
+        while True:
+            message = conn.recv()
+
+            if message is None:
+                break
+
+            worker.last_seen = time.monotonic()
+
+            if message.get("type") == "result":
+                self._job_finished(worker, message)
+
+        self._worker_lost(worker)
+
+    def _check_token(self, token) -> bool:
+        """檢查 worker 提供的 token (固定時間比較)，沒有設定 `coordinator_token` 時不檢查"""
+
+        if not self.token:
+            return True
+
+        if not isinstance(token, str):
+            return False
+
+        return hmac.compare_digest(token.encode("utf8"), str(self.token).encode("utf8"))
+
+    def _assign(self) -> List[Tuple[_RemoteWorker, dict]]:
+        """將等待中的任務交給有空閒 slot 且擁有所有 label 的 worker (執行中任務最少的優先)，呼叫前需要取得 `_lock`
+
+        不會在持有 `_lock` 時送出訊息 (停止回應的 worker 會阻塞送出)，需要在釋放 `_lock` 後以 :meth:`Coordinator._send` 送出
+
+        Returns:
+            List[Tuple[_RemoteWorker, dict]]: 要送給 worker 的訊息
+        """
+
+        waiting = deque()
+        messages = []
+
+        while self._queue:
+            job = self._queue.popleft()
+
+            if job.cancelled or job.cron.cut_off:
+                job.finish((False, "cut off", None))
+                continue
+
+            candidates = [i for i in self._workers.values() if i.can_run(job.cron)]
+
+            if not candidates:
+                waiting.append(job)
+                continue
+
+            worker = min(candidates, key=lambda i: len(i.jobs))
+
+            job.worker = worker
+            worker.jobs[job.job_id] = job
+
+            messages.append(
+                (
+                    worker,
+                    {
+                        "type": "run",
+                        "job_id": job.job_id,
+                        "task": self._task_config(job.cron.name),
+                        "attempt": job.attempt,
+                        "tail_size": self.config.get("output_tail_size", Cron.TAIL_SIZE),
+                    },
+                )
+            )
+
+        self._queue = waiting
+
+        return messages
+
+    def _send(self, messages: List[Tuple[_RemoteWorker, dict]]):
+        """送出訊息 (不能持有 `_lock`)，送出失敗時當作 worker 已經斷線，
+        關閉連線後由 `_serve_worker` 將它的任務重新排程"""
+
+        for worker, message in messages:
+            if not worker.conn.send(message):
+                self._log.warning(f"無法送出訊息給 worker {worker.worker_id}，關閉連線")
+                worker.conn.close()
+
+    def _job_finished(self, worker: _RemoteWorker, message: dict):
+        messages = []
+
+        with self._lock:
+            job = worker.jobs.pop(message.get("job_id"), None)
+
+            if job is not None:
+                messages = self._assign()
+
+        self._send(messages)
+
+        # 已經被重新排程的任務
+        if job is None:
+            return
+
+        info = message.get("attempt")
+
+        if info is not None:
+            info["worker"] = worker.worker_id
+
+        job.finish(tuple(message["result"]), info)
+
+    def _worker_lost(self, worker: _RemoteWorker):
+        """worker 斷線，將它正在執行的任務重新排程"""
+
+        with self._lock:
+            if self._workers.get(worker.worker_id) is worker:
+                del self._workers[worker.worker_id]
+
+            jobs = sorted(worker.jobs.values(), key=lambda i: i.job_id)
+            worker.jobs.clear()
+
+            for job in reversed(jobs):
+                job.worker = None
+                self._queue.appendleft(job)
+
+            messages = self._assign()
+
+        worker.conn.close()
+
+        self._send(messages)
+
+        if not self._stopped.is_set():
+            names = [i.cron.name for i in jobs]
+            self._log.warning(f"worker {worker.worker_id} 已斷線，重新排程任務: {names}")
+
+    def _execute_task(self, cron: Cron) -> Tuple[bool, str, str]:
+        """在執行緒池中將一次任務執行交給 worker ，並等待結果，詳見 :meth:`BooFlow._execute_task`"""
+
+        if cron.attempt == 0 and self._is_up_to_date(cron):
+            return (True, None, None)
+
+        if cron.attempt > 0:
+            cron.retry_time -= 1
+
+        with self._lock:
+            if cron.cut_off:
+                return (False, "cut off", None)
+
+            self._job_seq += 1
+
+            job = _Job(self._job_seq, cron)
+
+            self._jobs[cron.name] = job
+            self._queue.append(job)
+
+            messages = self._assign()
+
+        self._send(messages)
+
+        job.done.wait()
+
+        with self._lock:
+            self._jobs.pop(cron.name, None)
+
+        if job.info is not None:
+            cron.attempt = job.info["attempt"]
+            cron.duration = job.info["duration"]
+            cron.attempts.append(job.info)
+
+        return job.result
+
+    def _cut_off(self, logger, task_map: Dict[str, Cron], task_names: List[str], running):
+        """超過執行期限，通知 worker 中斷執行中的任務，詳見 :meth:`BooFlow._cut_off`"""
+
+        running = list(running)
+        messages = []
+
+        with self._lock:
+            for cron in running:
+                job = self._jobs.get(cron.name)
+
+                if job is None or job.cancelled:
+                    continue
+
+                job.cancelled = True
+
+                if job.worker is None:
+                    self._queue.remove(job)
+                    job.finish((False, "cut off", None))
+
+                else:
+                    messages.append((job.worker, {"type": "cancel", "job_id": job.job_id}))
+
+        self._send(messages)
+
+        super()._cut_off(logger, task_map, task_names, running)
+
+
+class Worker:
+    """分散式執行的 worker ，連線到 coordinator 後執行交給它的任務
+
+    Args:
+        host (str): coordinator 位址
+
+        port (int): coordinator 連接埠
+
+        labels (Iterable[str], optional): 這個 worker 的 label
+
+        slots (int, optional): 同時執行的任務數量
+
+        worker_id (Optional[str], optional): worker id ，默認為 `<hostname>:<pid>`
+
+        output_dir (Optional[str], optional): 任務 stdout / stderr 輸出檔案存放位置，默認使用暫存檔
+
+        heartbeat_interval (float, optional): 送出 heartbeat 的間隔 (秒)
+
+        token (Optional[str], optional): coordinator 的 `coordinator_token` ，默認為環境變數 `BOOFLOW_TOKEN`
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        labels: Iterable[str] = (),
+        slots: int = 1,
+        worker_id: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        token: Optional[str] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.labels = sorted(set(labels))
+        self.slots = slots
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.output_dir = output_dir
+        self.heartbeat_interval = heartbeat_interval
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV)
+
+        self._conn = None
+        self._lock = threading.Lock()
+
+        # job_id -> Cron ，正在執行的任務
+        self._running: Dict[int, Cron] = {}
+        self._threads: List[threading.Thread] = []
+
+    def serve(self):
+        """連線到 coordinator 並執行任務，直到 coordinator 結束或斷線，結束前會中斷所有執行中的任務"""
+
+        self._conn = _Connection(socket.create_connection((self.host, self.port)))
+        self._conn.send(
+            {"type": "hello", "worker_id": self.worker_id, "labels": self.labels, "slots": self.slots, "token": self.token}
+        )
+
+        stopped = threading.Event()
+
+        threading.Thread(target=self._heartbeat_loop, args=(stopped,), daemon=True).start()
+
+        try:
+            while True:
+                message = self._conn.recv()
+
+                if message is None or message.get("type") == "shutdown":
+                    break
+
+                if message.get("type") == "run":
+                    self._start_job(message)
+
+                elif message.get("type") == "cancel":
+                    with self._lock:
+                        cron = self._running.get(message.get("job_id"))
+
+                    if cron is not None:
+                        cron.terminate()
+
+        finally:
+            stopped.set()
+
+            with self._lock:
+                crons = list(self._running.values())
+
+            for cron in crons:
+                cron.terminate()
+
+            for thread in self._threads:
+                thread.join()
+
+            self._conn.close()
+
+    def _heartbeat_loop(self, stopped: threading.Event):
+        while not stopped.wait(self.heartbeat_interval):
+            if not self._conn.send({"type": "heartbeat"}):
+                break
+
+    def _start_job(self, message: dict):
+        cron = Cron(message["task"], output_dir=self.output_dir, tail_size=message.get("tail_size", Cron.TAIL_SIZE))
+
+        # `Cron.run` 會將 attempt 加 1
+        cron.attempt = message.get("attempt", 1) - 1
+
+        with self._lock:
+            self._running[message["job_id"]] = cron
+
+        thread = threading.Thread(target=self._run_job, args=(message["job_id"], cron), daemon=True)
+        thread.start()
+
+        self._threads = [i for i in self._threads if i.is_alive()] + [thread]
+
+    def _run_job(self, job_id: int, cron: Cron):
+        result = cron.run()
+
+        with self._lock:
+            self._running.pop(job_id, None)
+
+        self._conn.send(
+            {"type": "result", "job_id": job_id, "result": list(result), "attempt": cron.attempts[-1]}
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="booflow 分散式執行 worker")
+    parser.add_argument("--coordinator", required=True, help="coordinator 的位址，例如 10.0.0.1:9000")
+    parser.add_argument("--labels", nargs="*", default=[], help="這個 worker 的 label")
+    parser.add_argument("--slots", type=int, default=1, help="同時執行的任務數量")
+    parser.add_argument("--worker-id", default=None, help="worker id (默認為 <hostname>:<pid>)")
+    parser.add_argument("--output-dir", default=None, help="任務 stdout / stderr 輸出檔案存放位置")
+    parser.add_argument("--heartbeat-interval", type=float, default=HEARTBEAT_INTERVAL, help="送出 heartbeat 的間隔 (秒)")
+    parser.add_argument("--token", default=None, help=f"coordinator 的 coordinator_token (默認為環境變數 {TOKEN_ENV})")
+
+    args = parser.parse_args(argv)
+
+    host, _, port = args.coordinator.rpartition(":")
+
+    Worker(
+        host or "127.0.0.1",
+        int(port),
+        labels=args.labels,
+        slots=args.slots,
+        worker_id=args.worker_id,
+        output_dir=args.output_dir,
+        heartbeat_interval=args.heartbeat_interval,
+        token=args.token,
+    ).serve()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+延遲展開的 map 任務
+
+一個 map 任務由一個指令樣板與一個參數來源組成，在任務依賴圖 (`Task`) 中只佔一個節點，
+輪到它執行時才會依照參數來源逐一產生實例 (instance) ，每個實例都是一般的任務 (可以重新執行、有逾時等設定)。
+
+- 參數只會在有空閒的 worker 時才讀取，同時存在的實例數量不超過 `max_in_flight`
+- 所有實例都完成後， map 任務才算完成，有任何實例失敗時 map 任務就算失敗 (下游任務不會執行)
+- 參數來源無法讀取 (例如檔案不存在) 時不會再產生實例，已經產生的實例結束後 map 任務就算失敗
+- 記憶體用量只與同時執行的實例數量 (以及失敗的實例數量) 有關，與參數數量無關
+
+參數來源 (只能設定一種):
+
+    >>> {"list": ["a", "b", "c"]}
+    >>> {"range": [0, 5000]}                  # 與 range(0, 5000) 相同，也可以加上 step
+    >>> {"glob": "./data/*.csv"}              # 符合的檔案路徑 (依照檔案系統的順序)
+    >>> {"lines": "./partitions.txt"}         # 檔案中每一行 (忽略空白行)
+
+指令、 `inputs` 與 `outputs` 中的 `{item}` 會被替換成參數， `{index}` 會被替換成第幾個參數 (從 0 開始)，
+實例的名稱為 `<task_name>[<index>]` 。
+
+Usage:
+    >>> {"task_name": "process", "command": "python3 process.py {item}", "map": {"range": [0, 5000]}, "max_in_flight": 8}
+"""
+
+import glob
+from typing import List, Tuple, Iterator, Optional
+
+__all__ = ["MapState", "validate_map", "iter_params", "SOURCES"]
+
+# 參數來源種類
+SOURCES = ("list", "range", "glob", "lines")
+
+# 實例設定中不需要保留的 map 任務設定
+_MAP_KEYS = ("map", "max_in_flight")
+
+# 讀取參數來源時可能發生的錯誤 (檔案不存在、 range 參數錯誤等)
+_SOURCE_ERRORS = (OSError, ValueError, TypeError, UnicodeDecodeError)
+
+
+def validate_map(config: dict):
+    """檢查 map 任務的設定
+
+    Raises:
+        ValueError: 參數來源不是剛好一種，或是 `max_in_flight` 不是大於 0 的整數
+    """
+
+    source = config["map"]
+    kinds = [i for i in SOURCES if i in source] if isinstance(source, dict) else []
+
+    if len(kinds) != 1 or len(source) != 1:
+        raise ValueError(f"map 任務 {config['task_name']} 需要剛好一種參數來源 {SOURCES}，目前為: {source}")
+
+    max_in_flight = config.get("max_in_flight")
+
+    if max_in_flight is not None and (not isinstance(max_in_flight, int) or max_in_flight < 1):
+        raise ValueError(f"map 任務 {config['task_name']} 的 max_in_flight 必須是大於 0 的整數，目前為: {max_in_flight}")
+
+
+def _iter_lines(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf8") as f:
+        for line in f:
+            line = line.strip()
+
+            if line:
+                yield line
+
+
+def iter_params(source: dict) -> Iterator[str]:
+    """依照參數來源逐一產生參數 (不會一次讀取所有參數)"""
+
+    if "list" in source:
+        return (str(i) for i in source["list"])
+
+    if "range" in source:
+        return (str(i) for i in range(*source["range"]))
+
+    if "glob" in source:
+        return glob.iglob(source["glob"], recursive=True)
+
+    return _iter_lines(source["lines"])
+
+
+def _substitute(value, item: str, index: int):
+    if isinstance(value, str):
+        return value.replace("{item}", item).replace("{index}", str(index))
+
+    if isinstance(value, (list, tuple)):
+        return [_substitute(i, item, index) for i in value]
+
+    return value
+
+
+class MapState:
+    """一個 map 任務執行中的狀態
+
+    Args:
+        config (dict): map 任務的設定
+
+        max_in_flight (int): 沒有設定 `max_in_flight` 時，同時存在的實例數量上限
+    """
+
+    def __init__(self, config: dict, max_in_flight: int):
+        self.name = config["task_name"]
+        self.max_in_flight = config.get("max_in_flight") or max_in_flight
+
+        self._template = {k: v for k, v in config.items() if k not in _MAP_KEYS}
+        self._index = 0
+
+        # 參數是否已經全部讀取完，以及是否因為超過執行期限而停止產生實例
+        self.exhausted = False
+        self.stopped = False
+
+        # 讀取參數來源時發生的錯誤，發生錯誤後不會再產生實例
+        self.error: Optional[str] = None
+
+        try:
+            self._params = iter_params(config["map"])
+
+        except _SOURCE_ERRORS as e:
+            self._source_error(e)
+
+        # 還沒有回報最後結果的實例數量 (包含等待資源與等待重新執行的實例)
+        self.in_flight = 0
+
+        self.succeeded = 0
+
+        # 失敗的實例 (名稱, 參數)
+        self.failed: List[Tuple[str, str]] = []
+
+        # instance name -> Cron ，還沒有回報最後結果的實例
+        self.running = {}
+
+        # 已經回報最後結果，等待 `BooFlow` 清除的實例名稱
+        self.finished_names = []
+
+    @property
+    def can_expand(self) -> bool:
+        return not self.exhausted and not self.stopped and self.in_flight < self.max_in_flight
+
+    @property
+    def finished(self) -> bool:
+        return (self.exhausted or self.stopped) and self.in_flight == 0
+
+    def expand(self) -> Optional[Tuple[dict, str]]:
+        """讀取下一個參數並產生實例設定
+
+        Returns:
+            Optional[Tuple[dict, str]]: (實例設定, 參數)，參數已經全部讀取完時回傳 `None`
+        """
+
+        try:
+            item = str(next(self._params))
+
+        except StopIteration:
+            self.exhausted = True
+            return None
+
+        except _SOURCE_ERRORS as e:
+            self._source_error(e)
+            return None
+
+        index = self._index
+        self._index += 1
+
+        config = {k: _substitute(v, item, index) for k, v in self._template.items()}
+        config["task_name"] = f"{self.name}[{index}]"
+
+        self.in_flight += 1
+
+        return config, item
+
+    def _source_error(self, error: Exception):
+        self.error = f"{type(error).__name__}: {error}"
+        self.exhausted = True
+        self._params = iter(())
+
+    def instance_done(self, instance_name: str, item: str, status: bool):
+        """回報實例的最後結果"""
+
+        self.in_flight -= 1
+        self.running.pop(instance_name, None)
+        self.finished_names.append(instance_name)
+
+        if status:
+            self.succeeded += 1
+
+        else:
+            self.failed.append((instance_name, item))
+
+    def result(self) -> Tuple[bool, str, str]:
+        """map 任務的執行結果，格式與 `Cron.run` 相同"""
+
+        if self.stopped and not self.exhausted:
+            return (False, "cut off", None)
+
+        if self.error is not None:
+            return (False, "map error", f"無法讀取參數來源 ({self.error})，{self.succeeded} 個實例成功， {len(self.failed)} 個實例失敗")
+
+        if self.failed:
+            failed = ", ".join(f"{name}={item}" for name, item in self.failed[:10])
+            more = f" 等 {len(self.failed)} 個" if len(self.failed) > 10 else ""
+
+            return (False, "map error", f"{len(self.failed)} 個實例失敗: {failed}{more}")
+
+        return (True, None, f"{self.succeeded} 個實例執行完成")
+
+    def close(self):
+        """關閉參數來源 (例如還沒有讀取完的檔案)"""
+
+        close = getattr(self._params, "close", None)
+
+        if close is not None:
+            close()
@@ -0,0 +1,314 @@
+"""
+執行紀錄資料庫
+
+將每一次 `BooFlow.run` 的任務執行資訊寫入本地的 SQLite 資料庫，
+可以用來查詢任務執行時間的分布，或是找出最近變慢的任務。
+
+Usage:
+    >>> from booflow.history import History
+
+    >>> history = History("./log/history.db")
+
+    >>> history.duration_percentiles()
+    {"task1": {"count": 10, "p50": 1.2, "p95": 3.4}, ...}
+
+    >>> history.regressions(threshold=3)
+    [{"task_name": "task2", "run_id": "...", "duration": 9.1, "baseline": 3.0, "ratio": 3.03}]
+"""
+
+import sqlite3
+import statistics
+from typing import List, Dict, Optional, Iterable
+
+__all__ = ["History"]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    success_count INTEGER,
+    faile_count INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS task_attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    duration REAL NOT NULL,
+    exit_status INTEGER,
+    failure_kind TEXT,
+    output_size INTEGER,
+    user_time REAL,
+    system_time REAL,
+    max_rss_kb INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_attempts_task ON task_attempts (task_name, start_time);
+CREATE INDEX IF NOT EXISTS idx_task_attempts_run ON task_attempts (run_id);
+CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs (started_at);
+"""
+
+# 舊版本的資料庫沒有的欄位
+_MIGRATIONS = {
+    "task_attempts": [("user_time", "REAL"), ("system_time", "REAL"), ("max_rss_kb", "INTEGER")],
+}
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """計算百分位數 (線性內插)，`values` 必須已經排序"""
+
+    if len(values) == 1:
+        return values[0]
+
+    k = (len(values) - 1) * percent / 100
+    f = int(k)
+    c = min(f + 1, len(values) - 1)
+
+    return values[f] + (values[c] - values[f]) * (k - f)
+
+
+class History:
+    """執行紀錄資料庫
+
+    寫入的任務紀錄會先暫存在記憶體中，累積 `batch_size` 筆或是呼叫 :meth:`History.flush` 時才會一次寫入，
+    避免每個任務完成時都要等待資料庫寫入。
+
+    Args:
+        db_path (str): SQLite 資料庫檔案位置
+
+        batch_size (int, optional): 累積多少筆紀錄後寫入資料庫
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 100):
+        self.db_path = db_path
+        self.batch_size = batch_size
+
+        # 排程可能在不同的執行緒中執行 (例如 daemon)，但同一時間只會有一個執行緒使用
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+        self._pending = []
+
+    def _migrate(self):
+        """幫舊版本的資料庫加上新的欄位"""
+
+        with self._conn:
+            for table, columns in _MIGRATIONS.items():
+                exists = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+
+                for column, column_type in columns:
+                    if column not in exists:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def start_run(self, run_id: str, started_at: float):
+        """紀錄一次執行的開始"""
+
+        with self._conn:
+            self._conn.execute("INSERT INTO runs (run_id, started_at) VALUES (?, ?)", (run_id, started_at))
+
+    def record(self, run_id: str, task_name: str, attempts: Iterable[dict]):
+        """紀錄任務每一次執行的資訊
+
+        Args:
+            run_id (str): 執行 id
+
+            task_name (str): 任務名稱
+
+            attempts (Iterable[dict]): `Cron.attempts` 中的執行資訊
+        """
+
+        for i in attempts:
+            rusage = i.get("rusage") or {}
+
+            self._pending.append(
+                (
+                    run_id,
+                    task_name,
+                    i["attempt"],
+                    i["start_time"],
+                    i["end_time"],
+                    i["duration"],
+                    i["returncode"],
+                    i["failure_kind"],
+                    i["output_size"],
+                    rusage.get("user_time"),
+                    rusage.get("system_time"),
+                    rusage.get("max_rss_kb"),
+                )
+            )
+
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """將暫存的紀錄寫入資料庫"""
+
+        if not self._pending:
+            return
+
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO task_attempts (
+                    run_id, task_name, attempt, start_time, end_time, duration, exit_status, failure_kind, output_size,
+                    user_time, system_time, max_rss_kb
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                self._pending,
+            )
+
+        self._pending = []
+
+    def finish_run(self, run_id: str, ended_at: float, success_count: int, faile_count: int):
+        """紀錄一次執行的結束，會先寫入所有暫存的紀錄"""
+
+        self.flush()
+
+        with self._conn:
+            self._conn.execute(
+                "UPDATE runs SET ended_at = ?, success_count = ?, faile_count = ? WHERE run_id = ?",
+                (ended_at, success_count, faile_count, run_id),
+            )
+
+    def close(self):
+        """寫入暫存的紀錄並關閉資料庫"""
+
+        self.flush()
+        self._conn.close()
+
+    def _success_durations(self, task_name: Optional[str] = None, since: Optional[float] = None) -> Dict[str, List[float]]:
+        """取得每個任務成功執行的時間 (依照開始時間排序)，會先寫入暫存的紀錄"""
+
+        self.flush()
+
+        sql = "SELECT task_name, duration FROM task_attempts WHERE failure_kind IS NULL"
+        params = []
+
+        if task_name is not None:
+            sql += " AND task_name = ?"
+            params.append(task_name)
+
+        if since is not None:
+            sql += " AND start_time >= ?"
+            params.append(since)
+
+        sql += " ORDER BY task_name, start_time"
+
+        durations = {}
+
+        for name, duration in self._conn.execute(sql, params):
+            durations.setdefault(name, []).append(duration)
+
+        return durations
+
+    def duration_percentiles(
+        self, task_name: Optional[str] = None, since: Optional[float] = None
+    ) -> Dict[str, Dict[str, float]]:
+        """計算每個任務成功執行時間的 p50 與 p95
+
+        Args:
+            task_name (Optional[str], optional): 只計算這個任務，默認為全部任務
+
+            since (Optional[float], optional): 只計算這個時間 (timestamp) 之後的紀錄
+
+        Returns:
+            Dict[str, Dict[str, float]]: {"task_name" : {"count" : 筆數, "p50" : 秒數, "p95" : 秒數}}
+        """
+
+        result = {}
+
+        for name, durations in self._success_durations(task_name, since).items():
+            durations.sort()
+
+            result[name] = {
+                "count": len(durations),
+                "p50": _percentile(durations, 50),
+                "p95": _percentile(durations, 95),
+            }
+
+        return result
+
+    def task_durations(self, window: int = 20) -> Dict[str, float]:
+        """取得每個任務最近 `window` 次成功執行時間的中位數，可以給 `Task` 的 `critical_path` 排程使用"""
+
+        return {
+            name: statistics.median(durations[-window:])
+            for name, durations in self._success_durations().items()
+        }
+
+    def regressions(self, window: int = 10, threshold: float = 1.5, limit: int = 20) -> List[dict]:
+        """找出最近一次執行比過去慢很多的任務
+
+        會將每個任務最近一次成功的執行時間，與之前 `window` 次成功執行時間的中位數比較
+
+        Args:
+            window (int, optional): 用來計算基準的執行次數
+
+            threshold (float, optional): 最近一次的執行時間超過基準的幾倍才列出
+
+            limit (int, optional): 最多列出幾個任務
+
+        Returns:
+            List[dict]: 依照倍數由大到小排序，[{"task_name", "run_id", "duration", "baseline", "ratio"}, ...]
+        """
+
+        self.flush()
+
+        rows = self._conn.execute(
+            """
+            SELECT task_name, run_id, duration FROM (
+                SELECT
+                    task_name,
+                    run_id,
+                    duration,
+                    ROW_NUMBER() OVER (PARTITION BY task_name ORDER BY start_time DESC) AS rn
+                FROM task_attempts
+                WHERE failure_kind IS NULL
+            )
+            WHERE rn <= ?
+            ORDER BY task_name, rn
+            """,
+            (window + 1,),
+        )
+
+        latest = {}
+        baseline = {}
+
+        for task_name, run_id, duration in rows:
+            if task_name not in latest:
+                latest[task_name] = (run_id, duration)
+
+            else:
+                baseline.setdefault(task_name, []).append(duration)
+
+        result = []
+
+        for task_name, durations in baseline.items():
+            run_id, duration = latest[task_name]
+            median = statistics.median(durations)
+
+            if median <= 0:
+                continue
+
+            ratio = duration / median
+
+            if ratio >= threshold:
+                result.append(
+                    {
+                        "task_name": task_name,
+                        "run_id": run_id,
+                        "duration": duration,
+                        "baseline": median,
+                        "ratio": ratio,
+                    }
+                )
+
+        result.sort(key=lambda i: i["ratio"], reverse=True)
+
+        return result[:limit]
@@ -0,0 +1,288 @@
+"""
+排程監控指標
+
+維護排程的 counter 、 gauge 與 histogram ，並輸出成 OpenMetrics 文字格式，
+可以寫入檔案給 node-exporter 的 textfile collector 讀取，或是啟動本機的 HTTP 服務讓 Prometheus 抓取。
+
+更新指標只會做一次屬性加法 (histogram 會多一次二分搜尋)，不會取得鎖，
+所有的更新都在排程的主執行緒 (或 event loop) 中進行，HTTP 服務的執行緒只會讀取。
+只有建立新的子指標 (第一次使用某個 label 值) 與輸出時讀取子指標清單會取得指標的鎖。
+
+Usage:
+    >>> from booflow.metrics import Registry, Counter
+
+    >>> registry = Registry()
+    >>> started = registry.register(Counter("booflow_tasks_started", "開始執行的任務數量"))
+    >>> started.inc()
+
+    >>> registry.write_textfile("/var/lib/node_exporter/booflow.prom")
+"""
+
+import os
+import math
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple, Optional, Sequence
+
+__all__ = ["Registry", "Counter", "Gauge", "Histogram", "SchedulerMetrics"]
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# 任務執行時間 (秒) 的默認 bucket
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600, 7200)
+
+# 排程內部操作花費時間 (秒) 的默認 bucket
+OVERHEAD_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 0.1)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    items = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+
+    if extra:
+        items.append(extra)
+
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指標的共用部分: 名稱、說明與 label ，有 label 的指標透過 :meth:`_Metric.labels` 取得子指標"""
+
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        # label 值 -> 子指標，新增時需要取得 `_lock` (輸出的執行緒會同時讀取)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """取得指定 label 值的子指標 (第一次使用時建立)"""
+
+        child = self._children.get(values)
+
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要 {len(self.labelnames)} 個 label: {self.labelnames}")
+
+            with self._lock:
+                child = self._children.get(values)
+
+                if child is None:
+                    child = self._children[values] = self._new_child()
+
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        """回傳 [(名稱後綴, label 字串, 值), ...]"""
+
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# TYPE {self.name} {self.TYPE}", f"# HELP {self.name} {_escape(self.documentation)}"]
+
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+
+        return "\n".join(lines)
+
+    def _items(self):
+        """依照 label 值排序的 (label 值, 子指標)，沒有 label 的指標只有自己"""
+
+        if not self.labelnames:
+            return [((), self)]
+
+        with self._lock:
+            items = list(self._children.items())
+
+        return sorted(items)
+
+
+class Counter(_Metric):
+    """只會增加的計數器，輸出時名稱會加上 `_total`"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def _samples(self):
+        return [("_total", _format_labels(self.labelnames, values), child.value) for values, child in self._items()]
+
+
+class Gauge(_Metric):
+    """可以任意設定的數值"""
+
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float):
+        self.value = value
+
+    def _samples(self):
+        return [("", _format_labels(self.labelnames, values), child.value) for values, child in self._items()]
+
+
+class Histogram(_Metric):
+    """將觀察值依照 bucket 上限分類計數
+
+    Args:
+        buckets (Sequence[float]): bucket 上限 (由小到大)，會自動加上 `+Inf`
+    """
+
+    TYPE = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+
+        self.upper_bounds = [float(i) for i in buckets if not math.isinf(i)] + [math.inf]
+
+        # 每個 bucket 的觀察次數 (不是累計值，輸出時才累加)
+        self.counts = [0] * len(self.upper_bounds)
+        self.sum = 0.0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.upper_bounds)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def _samples(self):
+        samples = []
+
+        for values, child in self._items():
+            cumulative = 0
+
+            for upper, count in zip(child.upper_bounds, child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(upper) + '"'
+                samples.append(("_bucket", _format_labels(self.labelnames, values, le), cumulative))
+
+            labels = _format_labels(self.labelnames, values)
+            samples.append(("_sum", labels, child.sum))
+            samples.append(("_count", labels, cumulative))
+
+        return samples
+
+
+class Registry:
+    """管理所有指標，並輸出成 OpenMetrics 文字格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指標 {metric.name} 已經存在")
+
+        self._metrics[metric.name] = metric
+
+        return metric
+
+    def expose(self) -> str:
+        """輸出成 OpenMetrics 文字格式"""
+
+        return "\n".join([i.expose() for i in self._metrics.values()] + ["# EOF", ""])
+
+    def write_textfile(self, path: str):
+        """寫入檔案給 node-exporter 的 textfile collector 讀取 (先寫入暫存檔再取代，避免讀到寫入一半的檔案)"""
+
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+
+        with open(tmp_file, "w", encoding="utf8") as f:
+            f.write(self.expose())
+
+        os.replace(tmp_file, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """在背景執行緒啟動 HTTP 服務，任何路徑都會回傳目前的指標
+
+        Args:
+            port (int): 連接埠，設定為 0 時會自動選擇
+
+            host (str, optional): 監聽的位址，默認只接受本機連線
+
+        Returns:
+            ThreadingHTTPServer: HTTP 服務，使用 `shutdown()` 停止
+        """
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.expose().encode("utf8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        return server
+
+
+class SchedulerMetrics:
+    """`BooFlow` 使用的排程指標"""
+
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry or Registry()
+
+        register = self.registry.register
+
+        self.tasks_started = register(Counter("booflow_tasks_started", "開始執行的任務數量 (不包含重新執行)"))
+        self.tasks_succeeded = register(Counter("booflow_tasks_succeeded", "執行成功的任務數量"))
+        self.tasks_failed = register(Counter("booflow_tasks_failed", "重新執行後仍然失敗的任務數量"))
+        self.tasks_timed_out = register(Counter("booflow_task_timeouts", "執行逾時的次數 (包含重新執行)"))
+        self.tasks_retried = register(Counter("booflow_tasks_retried", "重新執行的次數"))
+
+        self.task_duration = register(
+            Histogram("booflow_task_duration_seconds", "任務每一次執行的時間 (秒)", labelnames=("task",))
+        )
+
+        self.ready_tasks = register(Gauge("booflow_ready_tasks", "可以執行但還沒開始執行的任務數量"))
+        self.running_tasks = register(Gauge("booflow_running_tasks", "執行中的任務數量"))
+
+        self.report_seconds = register(
+            Histogram("booflow_task_report_seconds", "每次 Task.report 花費的時間 (秒)", buckets=OVERHEAD_BUCKETS)
+        )
@@ -0,0 +1,138 @@
+"""
+執行計畫模擬
+
+不實際執行任何任務，依照每個任務預估的執行時間，模擬 `BooFlow.run` 的排程 (discrete-event simulation)，
+估計整個流程的執行時間 (makespan) 、關鍵路徑、最大有效平行度與 worker 使用率，可以用來決定 `max_workers` 。
+
+模擬時假設所有任務都會成功、不會重新執行，也不考慮 CPU / 記憶體 / pool 等資源限制與排程本身的開銷。
+
+Usage:
+    >>> bf = BooFlow(tasks, order, config)
+
+    >>> bf.plan(max_workers=4)
+    {"max_workers": 4, "makespan": 120.0, "critical_path": ["A", "C", "D"], ...}
+"""
+
+import heapq
+from typing import List, Dict, Tuple
+
+__all__ = ["simulate", "critical_path", "fill_durations"]
+
+
+def fill_durations(names: List[str], durations: Dict[str, float]) -> Tuple[Dict[str, float], List[str]]:
+    """補齊沒有預估執行時間的任務，使用已知任務的平均執行時間 (與 `Task` 的 `critical_path` 排程相同)
+
+    Args:
+        names (List[str]): 所有任務名稱
+
+        durations (Dict[str, float]): 每個任務預估的執行時間 (秒)
+
+    Returns:
+        Tuple[Dict[str, float], List[str]]: (每個任務的執行時間, 沒有預估執行時間的任務)
+    """
+
+    known = [durations[i] for i in names if durations.get(i) is not None]
+    default_duration = sum(known) / len(known) if known else 1.0
+
+    estimated = [i for i in names if durations.get(i) is None]
+
+    filled = {i: default_duration if durations.get(i) is None else float(durations[i]) for i in names}
+
+    return filled, estimated
+
+
+def critical_path(task, durations: Dict[str, float]) -> Tuple[List[str], float]:
+    """找出整個流程的關鍵路徑 (執行時間總和最長的路徑)
+
+    Args:
+        task (Task): 任務佇列管理物件，只會透過 `topological_order` / `successors` / `predecessors` 讀取有向圖，不會改變狀態
+
+        durations (Dict[str, float]): 每個任務的執行時間 (秒)，需要包含所有任務
+
+    Returns:
+        Tuple[List[str], float]: (關鍵路徑上的任務名稱, 關鍵路徑長度)
+    """
+
+    order = task.topological_order()
+
+    if not order:
+        return [], 0.0
+
+    # 每個任務到結束為止最長路徑的長度 (包含自己)，依照拓撲排序反向計算
+    rank = {}
+
+    for name in reversed(order):
+        rank[name] = durations[name] + max((rank[i] for i in task.successors(name)), default=0)
+
+    # 從 rank 最大的起始任務開始，每次走向 rank 最大的下游任務
+    name = max((i for i in task.task_names if not task.predecessors(i)), key=lambda i: rank[i])
+    path = [name]
+
+    successors = task.successors(name)
+
+    while successors:
+        name = max(successors, key=lambda i: rank[i])
+        path.append(name)
+        successors = task.successors(name)
+
+    return path, max(rank.values())
+
+
+def simulate(task, durations: Dict[str, float], max_workers: int) -> dict:
+    """模擬排程執行整個流程
+
+    與 `BooFlow.run` 相同，每當有空閒的 worker 時就從 `task` 取出可以執行的任務 (依照 `task` 的排程策略)，
+    任務結束時回報給 `task` 。
+
+    注意，這個方法會改變 `task` 的狀態，請使用新建立的 `Task` 物件
+
+    Args:
+        task (Task): 任務佇列管理物件
+
+        durations (Dict[str, float]): 每個任務的執行時間 (秒)，需要包含所有任務
+
+        max_workers (int): 同時執行的任務數量
+
+    Returns:
+        dict: {"makespan": 執行時間, "busy_time": 所有任務執行時間總和, "peak_running": 同時執行的最大任務數量,
+            "schedule": [(task_name, 開始時間, 結束時間), ...]}
+    """
+
+    now = 0.0
+    busy_time = 0.0
+    peak_running = 0
+
+    # (結束時間, 序號, task_name, 開始時間)，序號讓同時結束的任務依照開始的順序回報
+    running = []
+    seq = 0
+
+    schedule = []
+
+    while True:
+        while len(running) < max_workers:
+            task_name = task.next
+
+            if task_name is None:
+                break
+
+            duration = durations[task_name]
+            busy_time += duration
+
+            heapq.heappush(running, (now + duration, seq, task_name, now))
+            seq += 1
+
+        peak_running = max(peak_running, len(running))
+
+        if not running:
+            break
+
+        # 同時結束的任務一起回報，釋放的 worker 才不會被重複計算
+        now = running[0][0]
+
+        while running and running[0][0] <= now:
+            _, _, task_name, start = heapq.heappop(running)
+
+            schedule.append((task_name, start, now))
+            task.report(task_name, True)
+
+    return {"makespan": now, "busy_time": busy_time, "peak_running": peak_running, "schedule": schedule}
@@ -0,0 +1,130 @@
+"""
+節點資源管理
+
+管理這台機器的 CPU 與記憶體容量，以及具名的並行數量限制 (pool)，
+讓排程只在資源足夠時才開始執行任務。
+
+任務可以在設定中宣告需要的資源:
+
+    >>> {"task_name" : "train", "command" : "python3 train.py", "cpus" : 16, "memory" : 32768}
+    >>> {"task_name" : "load", "command" : "python3 load.py", "pool" : "db"}
+
+沒有宣告 `cpus` 或 `memory` 的任務不會佔用該項資源，只受 `max_workers` 限制。
+"""
+
+import os
+from typing import Dict, Optional
+
+__all__ = ["Resources"]
+
+
+def detect_cpus() -> int:
+    """取得這台機器的 CPU 數量"""
+
+    return os.cpu_count() or 1
+
+
+def detect_memory() -> Optional[int]:
+    """從 `/proc/meminfo` 取得這台機器的記憶體容量 (MB)，無法取得時回傳 `None` (不限制)"""
+
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return None
+
+
+class Resources:
+    """節點資源
+
+    Args:
+        cpus (Optional[float], optional): CPU 容量，默認為 `os.cpu_count()`
+
+        memory (Optional[int], optional): 記憶體容量 (MB)，默認為 `/proc/meminfo` 中的 `MemTotal`
+
+        pools (Optional[Dict[str, int]], optional): 每個 pool 同時執行的任務數量上限，例如 {"db" : 2}
+    """
+
+    def __init__(self, cpus: Optional[float] = None, memory: Optional[int] = None, pools: Optional[Dict[str, int]] = None):
+        self.cpus = cpus if cpus is not None else detect_cpus()
+        self.memory = memory if memory is not None else detect_memory()
+        self.pools = dict(pools or {})
+
+        for name, limit in self.pools.items():
+            if not isinstance(limit, int) or limit < 1:
+                raise ValueError(f"pool {name} 的上限必須是大於 0 的整數，目前為: {limit}")
+
+        self.used_cpus = 0
+        self.used_memory = 0
+        self.pool_used = {name: 0 for name in self.pools}
+
+    def demand(self, cron) -> tuple:
+        """取得任務需要的資源，超過節點容量的部分會以節點容量計算，否則任務永遠不會被執行
+
+        Returns:
+            tuple: (cpus, memory)
+        """
+
+        cpus = min(cron.cpus, self.cpus)
+        memory = cron.memory if self.memory is None else min(cron.memory, self.memory)
+
+        return cpus, memory
+
+    def is_oversized(self, cron) -> bool:
+        """任務宣告的資源是否超過節點容量"""
+
+        return cron.cpus > self.cpus or (self.memory is not None and cron.memory > self.memory)
+
+    def pool_available(self, cron) -> bool:
+        """檢查任務所屬的 pool 是否還有空位 (沒有設定 pool 的任務永遠回傳 `True`)"""
+
+        if cron.pool in self.pools:
+            return self.pool_used[cron.pool] < self.pools[cron.pool]
+
+        return True
+
+    def fits(self, cron, reserved: tuple = (0, 0)) -> bool:
+        """檢查目前剩下的 CPU 與記憶體 (扣掉 `reserved`) 是否足夠執行任務，沒有宣告的資源不會檢查
+
+        Args:
+            cron (Cron): 要執行的任務
+
+            reserved (tuple, optional): 保留給其他任務的資源 (cpus, memory)
+        """
+
+        cpus, memory = self.demand(cron)
+
+        if cpus and self.used_cpus + reserved[0] + cpus > self.cpus:
+            return False
+
+        if memory and self.memory is not None and self.used_memory + reserved[1] + memory > self.memory:
+            return False
+
+        return True
+
+    def acquire(self, cron):
+        """佔用任務需要的資源"""
+
+        cpus, memory = self.demand(cron)
+
+        self.used_cpus += cpus
+        self.used_memory += memory
+
+        if cron.pool in self.pool_used:
+            self.pool_used[cron.pool] += 1
+
+    def release(self, cron):
+        """釋放任務佔用的資源"""
+
+        cpus, memory = self.demand(cron)
+
+        self.used_cpus -= cpus
+        self.used_memory -= memory
+
+        if cron.pool in self.pool_used:
+            self.pool_used[cron.pool] -= 1
@@ -0,0 +1,221 @@
+"""
+執行時間軸紀錄
+
+將一次執行中每個任務每一次執行的時間，輸出成 Trace Event Format 的 JSON 檔案，
+可以用 Perfetto (https://ui.perfetto.dev) 或是 `chrome://tracing` 開啟，找出真正的關鍵路徑與閒置的 worker 。
+
+- 每一次執行是一個區間 (span)，依照執行時使用的 worker 分成不同的軌道 (lane)
+- 重新執行、逾時、被中斷與略過執行的任務會標示成瞬間事件 (instant event)
+- 任務順序會畫成箭頭 (flow event)，從上游任務最後一次執行的結束指向下游任務第一次執行的開始
+
+Usage:
+    >>> bf.run(trace_file="./log/trace.json")
+"""
+
+import json
+import time
+import heapq
+from typing import Dict, List, Tuple, Iterable, Optional
+
+__all__ = ["Trace"]
+
+
+class Trace:
+    """執行時間軸
+
+    Args:
+        run_id (Optional[str], optional): 執行 id ，會記錄在輸出檔案中
+    """
+
+    # 所有事件都放在同一個 process 中
+    PID = 1
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id
+        self.events = []
+
+        # 時間軸的起點 (timestamp)
+        self._t0 = time.time()
+
+        # 空閒的軌道編號 (heap)，以及目前建立的軌道數量
+        self._free_lanes = []
+        self._lane_count = 0
+
+        # task_name -> 目前這次執行使用的軌道
+        self._lanes: Dict[str, int] = {}
+
+        # task_name -> 第一次與最後一次執行的 (軌道, 開始時間, 結束時間)，用來畫任務順序的箭頭
+        self._first_span: Dict[str, Tuple[int, float, float]] = {}
+        self._last_span: Dict[str, Tuple[int, float, float]] = {}
+
+        self.events.append(
+            {"name": "process_name", "ph": "M", "pid": self.PID, "args": {"name": f"booflow run {run_id or ''}".strip()}}
+        )
+
+    def _ts(self, timestamp: float) -> float:
+        """timestamp 轉換成時間軸上的時間 (微秒)"""
+
+        return (timestamp - self._t0) * 1e6
+
+    def start(self, task_name: str) -> int:
+        """任務開始執行 (或是開始檢查是否需要執行)，分配一個空閒的軌道
+
+        Returns:
+            int: 軌道編號
+        """
+
+        if self._free_lanes:
+            lane = heapq.heappop(self._free_lanes)
+
+        else:
+            lane = self._lane_count
+            self._lane_count += 1
+
+            self.events.append(
+                {"name": "thread_name", "ph": "M", "pid": self.PID, "tid": lane, "args": {"name": f"worker {lane}"}}
+            )
+
+        self._lanes[task_name] = lane
+
+        return lane
+
+    def finish(self, task_name: str, attempt: Optional[dict], result: Tuple[bool, str, str], skipped: bool = False):
+        """任務這一次執行結束，釋放軌道
+
+        Args:
+            task_name (str): 任務名稱
+
+            attempt (Optional[dict]): 這一次執行的資訊 (`Cron.attempts` 的最後一筆)，沒有實際執行時為 `None`
+
+            result (Tuple[bool, str, str]): 執行結果，詳見 :meth:`Cron.run`
+
+            skipped (bool, optional): 是否因為輸入沒有改變而略過執行
+        """
+
+        lane = self._lanes.pop(task_name)
+        heapq.heappush(self._free_lanes, lane)
+
+        if attempt is None:
+            self.instant("skip" if skipped else result[1] or "done", lane=lane, args={"task": task_name})
+            return
+
+        start = self._ts(attempt["start_time"])
+        end = self._ts(attempt["end_time"])
+
+        self.events.append(
+            {
+                "name": task_name,
+                "cat": "task",
+                "ph": "X",
+                "pid": self.PID,
+                "tid": lane,
+                "ts": start,
+                "dur": end - start,
+                "args": {
+                    "attempt": attempt["attempt"],
+                    "returncode": attempt["returncode"],
+                    "failure_kind": attempt["failure_kind"],
+                },
+            }
+        )
+
+        self._first_span.setdefault(task_name, (lane, start, end))
+        self._last_span[task_name] = (lane, start, end)
+
+        if result[1] in ("time out", "cut off"):
+            self.instant(result[1], ts=end, lane=lane, args={"task": task_name, "attempt": attempt["attempt"]})
+
+    def retry(self, task_name: str, delay: float):
+        """任務執行失敗，將在 `delay` 秒後重新執行"""
+
+        lane, _, end = self._last_span.get(task_name, (None, None, None))
+
+        self.instant("retry", ts=end, lane=lane, args={"task": task_name, "delay": delay})
+
+    def instant(self, name: str, ts: Optional[float] = None, lane: Optional[int] = None, args: Optional[dict] = None):
+        """瞬間事件，沒有指定軌道時會標示在整個時間軸上
+
+        Args:
+            name (str): 事件名稱
+
+            ts (Optional[float], optional): 時間軸上的時間 (微秒)，默認為現在
+
+            lane (Optional[int], optional): 軌道編號
+
+            args (Optional[dict], optional): 事件的額外資訊
+        """
+
+        event = {
+            "name": name,
+            "cat": "event",
+            "ph": "i",
+            "pid": self.PID,
+            "ts": self._ts(time.time()) if ts is None else ts,
+            "args": args or {},
+        }
+
+        if lane is None:
+            event["s"] = "g"
+
+        else:
+            event["tid"] = lane
+            event["s"] = "t"
+
+        self.events.append(event)
+
+    def _flows(self, edges: Iterable[Tuple[str, str]]) -> List[dict]:
+        """任務順序的箭頭，只有上下游任務都有執行時才會畫出"""
+
+        flows = []
+
+        for flow_id, (start, end) in enumerate(edges):
+            if start not in self._last_span or end not in self._first_span:
+                continue
+
+            start_lane, start_ts, end_ts = self._last_span[start]
+            end_lane, next_ts, _ = self._first_span[end]
+
+            # 箭頭的起點必須落在上游任務的區間內
+            flows.append(
+                {
+                    "name": "dependency",
+                    "cat": "dag",
+                    "ph": "s",
+                    "id": flow_id,
+                    "pid": self.PID,
+                    "tid": start_lane,
+                    "ts": max(end_ts - 1, start_ts),
+                }
+            )
+            flows.append(
+                {
+                    "name": "dependency",
+                    "cat": "dag",
+                    "ph": "f",
+                    "bp": "e",
+                    "id": flow_id,
+                    "pid": self.PID,
+                    "tid": end_lane,
+                    "ts": next_ts,
+                }
+            )
+
+        return flows
+
+    def save(self, path: str, edges: Iterable[Tuple[str, str]] = ()):
+        """輸出成 Trace Event Format 的 JSON 檔案
+
+        Args:
+            path (str): 輸出檔案位置
+
+            edges (Iterable[Tuple[str, str]], optional): 任務順序 (上游任務名稱, 下游任務名稱)，詳見 :meth:`Task.edges`
+        """
+
+        data = {
+            "traceEvents": self.events + self._flows(edges),
+            "displayTimeUnit": "ms",
+            "otherData": {"run_id": self.run_id, "start_time": self._t0},
+        }
+
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(data, f, ensure_ascii=False)
@@ -0,0 +1,193 @@
+"""
+任務增量執行檢查
+
+根據任務的指令與輸入檔案內容計算指紋 (fingerprint)，如果與上一次成功執行時相同，
+而且輸出檔案都存在，就表示這個任務不需要重新執行。
+
+為了避免每次都重新讀取很大的輸入檔案，每個檔案的 hash 會與 `mtime` 、檔案大小一起快取，
+只有 `mtime` 或檔案大小改變時才會重新計算 hash。
+
+Usage:
+    >>> from booflow.uptodate import UpToDateCache
+
+    >>> cache = UpToDateCache("./log/uptodate.json")
+
+    >>> up_to_date, fingerprint = cache.check("task1", "python3 task1.py", ["data/*.csv"], ["out/result.csv"])
+
+    >>> # 任務執行成功後
+    >>> cache.update("task1", fingerprint)
+    >>> cache.save()
+"""
+
+import os
+import glob
+import json
+import hashlib
+import threading
+from typing import List, Tuple, Optional
+
+__all__ = ["UpToDateCache"]
+
+
+class UpToDateCache:
+    """任務指紋快取
+
+    Args:
+        cache_file (str): 快取檔案位置
+    """
+
+    # 計算檔案 hash 時每次讀取的大小
+    CHUNK_SIZE = 1024 * 1024
+
+    # 檔案存在但無法讀取時 `file_hash` 的回傳值
+    UNREADABLE = "unreadable"
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+
+        data = self._load()
+
+        # 檔案路徑 -> [mtime_ns, size, sha256]
+        self._files = data.get("files", {})
+
+        # 任務名稱 -> 上一次成功執行時的指紋
+        self._tasks = data.get("tasks", {})
+
+        # 任務可能在不同的 worker 執行緒中檢查
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.cache_file, "r", encoding="utf8") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """將快取寫入檔案 (先寫入暫存檔再取代，避免寫入一半的檔案)"""
+
+        with self._lock:
+            data = {"files": dict(self._files), "tasks": dict(self._tasks)}
+
+        tmp_file = self.cache_file + ".tmp"
+
+        with open(tmp_file, "w", encoding="utf8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+        os.replace(tmp_file, self.cache_file)
+
+    @staticmethod
+    def expand(patterns: List[str]) -> List[str]:
+        """展開檔案路徑或是 glob，回傳排序後的檔案路徑清單 (不存在的路徑會保留，讓指紋能反映檔案缺少)
+
+        glob 只會保留一般檔案，例如 `src/**` 符合的資料夾不會包含在內
+        """
+
+        paths = set()
+
+        for pattern in patterns:
+            if glob.has_magic(pattern):
+                paths.update(i for i in glob.glob(pattern, recursive=True) if os.path.isfile(i))
+
+            else:
+                paths.add(pattern)
+
+        return sorted(paths)
+
+    def file_hash(self, path: str) -> Optional[str]:
+        """取得檔案內容的 sha256 ，如果 `mtime` 與檔案大小都沒有改變，會直接使用快取的結果
+
+        Returns:
+            Optional[str]: 檔案內容的 sha256 ，如果檔案不存在則回傳 `None` ，
+                無法讀取 (例如是資料夾或沒有權限) 時回傳 `UpToDateCache.UNREADABLE`
+        """
+
+        try:
+            stat = os.stat(path)
+
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._files.get(path)
+
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        sha256 = hashlib.sha256()
+
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                    sha256.update(chunk)
+
+        except OSError:
+            return self.UNREADABLE
+
+        digest = sha256.hexdigest()
+
+        with self._lock:
+            self._files[path] = [stat.st_mtime_ns, stat.st_size, digest]
+
+        return digest
+
+    def fingerprint(self, command: str, inputs: List[str]) -> Optional[str]:
+        """計算任務的指紋 (指令字串 + 每個輸入檔案的路徑與內容 hash)，有輸入檔案無法讀取時回傳 `None`"""
+
+        sha256 = hashlib.sha256()
+        sha256.update(command.encode("utf8"))
+
+        for path in self.expand(inputs):
+            digest = self.file_hash(path)
+
+            if digest == self.UNREADABLE:
+                return None
+
+            sha256.update(b"\0" + path.encode("utf8") + b"\0")
+            sha256.update((digest or "missing").encode("utf8"))
+
+        return sha256.hexdigest()
+
+    def check(self, task_name: str, command: str, inputs: List[str], outputs: List[str]) -> Tuple[bool, str]:
+        """檢查任務是否需要重新執行
+
+        Args:
+            task_name (str): 任務名稱
+
+            command (str): 任務指令
+
+            inputs (List[str]): 輸入檔案路徑或 glob
+
+            outputs (List[str]): 輸出檔案路徑或 glob
+
+        Returns:
+            Tuple[bool, str]: (是否不需要重新執行, 這次的指紋)，有輸入檔案無法讀取時一定會重新執行，指紋為 `None` (不會紀錄)
+        """
+
+        fingerprint = self.fingerprint(command, inputs)
+
+        if fingerprint is None:
+            return False, None
+
+        with self._lock:
+            previous = self._tasks.get(task_name)
+
+        if previous != fingerprint:
+            return False, fingerprint
+
+        for pattern in outputs:
+            if glob.has_magic(pattern):
+                if not glob.glob(pattern, recursive=True):
+                    return False, fingerprint
+
+            elif not os.path.exists(pattern):
+                return False, fingerprint
+
+        return True, fingerprint
+
+    def update(self, task_name: str, fingerprint: str):
+        """紀錄任務成功執行時的指紋"""
+
+        with self._lock:
+            self._tasks[task_name] = fingerprint
@@ -0,0 +1,480 @@
+"""
+預先啟動的 Python 直譯器 (warm pool)
+
+大部分的任務都是很短的 Python script ，每次都啟動新的直譯器並 import 大型套件 (例如 pandas / numpy)
+可能比任務本身還要花時間。`WarmPool` 會預先啟動幾個已經 import 好指定模組的直譯器 (zygote)，
+每次執行任務時由 zygote fork 出新的子程序，用 `runpy` 執行 script ，所以每個任務仍然是獨立的程序:
+
+- 子程序有自己的 `sys.argv` 、工作目錄與 stdout / stderr (直接寫入 `Cron` 的輸出檔案)
+- 子程序在新的 session (process group) 中執行，逾時與中斷的處理與一般指令相同
+- exit status 與資源使用量 (rusage) 由 zygote 回收子程序後回傳
+
+與啟動新的直譯器不同的地方:
+
+- 預先 import 的模組在 script 執行前就已經存在 (包含模組的全域狀態)
+- 環境變數是 zygote 啟動時的環境變數
+- 子程序結束時會執行 `atexit` ，但不會等待還在執行的非 daemon 執行緒
+
+只支援有 `fork` 的系統 (Linux / macOS)。
+
+Usage:
+    >>> from booflow.warmpool import WarmPool
+
+    >>> with WarmPool(size=4, preload=["pandas", "numpy"]) as pool:
+    >>>     proc = pool.spawn(["python3", "task.py", "--date", "2024-01-01"], stdout_file, stderr_file)
+    >>>     proc.wait()
+"""
+
+import os
+import re
+import sys
+import json
+import array
+import queue
+import runpy
+import signal
+import socket
+import threading
+import traceback
+import subprocess
+from typing import List, Tuple, Optional, Sequence
+
+__all__ = ["WarmPool", "WarmProcess", "is_python_script"]
+
+# 指令開頭是 Python 直譯器 (python / python3 / python3.11 ...)
+_PYTHON_RE = re.compile(r"^python(\d+(\.\d+)?)?$")
+
+# 啟動 zygote 的程式碼，用 runpy 執行這個檔案，不會把 booflow 的資料夾加到 `sys.path` (避免蓋掉同名的模組)
+_BOOTSTRAP = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='__booflow_zygote__')"
+
+# 每則訊息最多傳遞的 file descriptor 數量 (stdout, stderr)
+_MAX_FDS = 2
+
+
+def is_python_script(cmd: List[str]) -> bool:
+    """檢查指令是否是用 Python 直譯器執行一個 script ，例如 `python3 task.py --date 2024-01-01`
+
+    使用 `-m` 或其他直譯器參數的指令不算
+    """
+
+    return len(cmd) >= 2 and bool(_PYTHON_RE.match(os.path.basename(cmd[0]))) and not cmd[1].startswith("-")
+
+
+def _send(sock: socket.socket, message: dict, fds: Sequence[int] = ()):
+    """送出一則 JSON 訊息，可以附帶 file descriptor (SCM_RIGHTS)"""
+
+    ancdata = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))] if fds else []
+
+    sock.sendmsg([json.dumps(message).encode("utf8")], ancdata)
+
+
+def _recv(sock: socket.socket) -> Tuple[Optional[dict], List[int]]:
+    """讀取一則 JSON 訊息與附帶的 file descriptor ，連線關閉時訊息為 `None`"""
+
+    fds = array.array("i")
+
+    data, ancdata, _, _ = sock.recvmsg(65536, socket.CMSG_SPACE(_MAX_FDS * fds.itemsize))
+
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[: len(payload) - len(payload) % fds.itemsize])
+
+    return (json.loads(data) if data else None), list(fds)
+
+
+def _rusage_to_dict(rusage) -> dict:
+    """與 `Cron._rusage_to_dict` 相同 (zygote 中不會 import booflow)"""
+
+    return {
+        "user_time": rusage.ru_utime,
+        "system_time": rusage.ru_stime,
+        "max_rss_kb": rusage.ru_maxrss,
+        "block_in": rusage.ru_inblock,
+        "block_out": rusage.ru_oublock,
+        "voluntary_ctx_switches": rusage.ru_nvcsw,
+        "involuntary_ctx_switches": rusage.ru_nivcsw,
+    }
+
+
+def _exit_code(code) -> int:
+    """與直譯器處理 `SystemExit` 的方式相同，轉換成 exit status"""
+
+    if code is None:
+        return 0
+
+    if isinstance(code, int):
+        return code & 0xFF
+
+    print(code, file=sys.stderr)
+
+    return 1
+
+
+def _print_exception(exc: BaseException):
+    """與直譯器相同的方式輸出 script 的例外，不包含 runpy 與這個檔案的 frame"""
+
+    internal = (os.path.abspath(__file__), runpy.__file__)
+
+    tb = exc.__traceback__
+
+    while tb is not None and (
+        tb.tb_frame.f_code.co_filename in internal or tb.tb_frame.f_code.co_filename.startswith("<frozen runpy")
+    ):
+        tb = tb.tb_next
+
+    traceback.print_exception(type(exc), exc, tb)
+
+
+def _child(message: dict, fds: List[int], ready_fd: int):
+    """在 fork 出來的子程序中執行 script ，不會回傳"""
+
+    code = 1
+
+    try:
+        os.setsid()
+
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+
+        for fd in fds:
+            os.close(fd)
+
+        os.chdir(message["cwd"])
+
+        argv = message["argv"]
+
+        # 與 `python script.py` 相同， sys.path[0] 為 script 所在的資料夾
+        sys.argv = list(argv)
+        sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+
+        code = 0
+
+        try:
+            runpy.run_path(argv[0], run_name="__main__")
+
+        except SystemExit as e:
+            code = _exit_code(e.code)
+
+        except BaseException as e:
+            _print_exception(e)
+            code = 1
+
+        import atexit
+
+        atexit._run_exitfuncs()
+
+    except BaseException:
+        traceback.print_exc()
+
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+
+            except Exception:
+                pass
+
+        os._exit(code)
+
+
+def _serve_one(sock: socket.socket, message: dict, fds: List[int]) -> bool:
+    """fork 一個子程序執行 script ，並等待它結束
+
+    子程序結束後先通知 `WarmPool` (不回收，pid 不會被重複使用)，等到 `WarmPool` 確定不會再送出訊號後才回收
+
+    Returns:
+        bool: `WarmPool` 是否還在連線中
+    """
+
+    read_fd, ready_fd = os.pipe()
+
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+        sock.close()
+        _child(message, fds, ready_fd)
+
+    os.close(ready_fd)
+
+    for fd in fds:
+        os.close(fd)
+
+    # 等待子程序建立新的 session ，之後對 process group 送出的訊號才不會送到 zygote
+    os.read(read_fd, 1)
+    os.close(read_fd)
+
+    try:
+        _send(sock, {"pid": pid})
+
+        os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+
+        _send(sock, {"exited": True})
+        connected = _recv(sock)[0] is not None
+
+    except OSError:
+        connected = False
+
+    _, status, rusage = os.wait4(pid, 0)
+
+    if connected:
+        returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+        _send(sock, {"returncode": returncode, "rusage": _rusage_to_dict(rusage)})
+
+    return connected
+
+
+def _zygote(sock_fd: int, preload: List[str]):
+    """zygote 的主程式: import 指定的模組後，依照 `WarmPool` 的要求 fork 子程序執行 script"""
+
+    import importlib
+
+    # 不接收終端機的 Ctrl-C ，由 `WarmPool` 關閉連線時結束
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for name in preload:
+        importlib.import_module(name)
+
+    sock = socket.socket(fileno=sock_fd)
+
+    _send(sock, {"ready": True})
+
+    while True:
+        try:
+            message, fds = _recv(sock)
+
+        except OSError:
+            break
+
+        if message is None or not _serve_one(sock, message, fds):
+            break
+
+
+class _Zygote:
+    """`WarmPool` 端的 zygote 程序與連線"""
+
+    def __init__(self, python: str, preload: Sequence[str]):
+        self.sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+
+        self.proc = subprocess.Popen(
+            [python, "-c", _BOOTSTRAP, os.path.abspath(__file__), str(child_sock.fileno()), *preload],
+            pass_fds=[child_sock.fileno()],
+            stdin=subprocess.DEVNULL,
+        )
+
+        child_sock.close()
+
+    def wait_ready(self):
+        if _recv(self.sock)[0] is None:
+            self.close()
+            raise RuntimeError(f"warm pool 的直譯器啟動失敗 (exit status: {self.proc.returncode})")
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        self.sock.close()
+        self.proc.wait()
+
+
+class WarmProcess:
+    """由 zygote fork 出來的子程序，提供 `Cron` 需要的 `pid` 與 `returncode`
+
+    子程序不是這個程序的子程序，所以不能用 `os.wait` 等待，需要透過 zygote 回傳結果:
+
+    1. :meth:`WarmProcess.wait_exited` 等待子程序結束 (還沒有被回收)
+    2. :meth:`WarmProcess.reap` 通知 zygote 回收子程序，並取得 exit status 與資源使用量
+    """
+
+    def __init__(self, pool: "WarmPool", zygote: _Zygote, pid: int):
+        self.pid = pid
+        self.returncode = None
+        self.rusage = None
+
+        self._pool = pool
+        self._zygote = zygote
+        self._exited = False
+
+    def wait_exited(self):
+        """等待子程序結束，結束後 pid 還不會被回收"""
+
+        if self._exited:
+            return
+
+        try:
+            message = _recv(self._zygote.sock)[0]
+
+        except OSError:
+            message = None
+
+        if message is None:
+            self._release()
+            raise RuntimeError("warm pool 的直譯器意外結束")
+
+        self._exited = True
+
+    def reap(self) -> Optional[dict]:
+        """回收子程序，設定 `returncode`
+
+        Returns:
+            Optional[dict]: 資源使用量，詳見 `Cron._rusage_to_dict`
+        """
+
+        self.wait_exited()
+
+        try:
+            _send(self._zygote.sock, {"reap": True})
+            message = _recv(self._zygote.sock)[0]
+
+        except OSError:
+            message = None
+
+        self._release()
+
+        if message is None:
+            raise RuntimeError("warm pool 的直譯器意外結束")
+
+        self.returncode = message["returncode"]
+        self.rusage = message["rusage"]
+
+        return self.rusage
+
+    def wait(self) -> int:
+        """等待子程序結束並回收，回傳 exit status"""
+
+        if self.returncode is None:
+            self.reap()
+
+        return self.returncode
+
+    def _release(self):
+        if self._zygote is not None:
+            self._pool._release(self._zygote)
+            self._zygote = None
+
+
+class WarmPool:
+    """預先啟動的 Python 直譯器
+
+    Args:
+        size (int, optional): zygote 數量，也就是同時可以執行的 script 數量，超過時 :meth:`WarmPool.spawn` 會等待
+
+        preload (Sequence[str], optional): zygote 啟動時預先 import 的模組
+
+        python (Optional[str], optional): 直譯器路徑，默認為 `sys.executable`
+    """
+
+    def __init__(self, size: int = 1, preload: Sequence[str] = (), python: Optional[str] = None):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("warm pool 只支援有 fork 的系統")
+
+        if not isinstance(size, int) or size < 1:
+            raise ValueError(f"warm pool 的 size 必須是大於 0 的整數，目前為: {size}")
+
+        self.size = size
+        self.preload = list(preload)
+        self.python = python or sys.executable
+
+        self._lock = threading.Lock()
+        self._closed = False
+        self._idle = queue.Queue()
+
+        # 所有的 zygote (包含正在執行 script 的)
+        self._zygotes: List[_Zygote] = []
+
+        try:
+            zygotes = [_Zygote(self.python, self.preload) for _ in range(size)]
+            self._zygotes.extend(zygotes)
+
+            for zygote in zygotes:
+                zygote.wait_ready()
+                self._idle.put(zygote)
+
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> "WarmPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def spawn(self, cmd: List[str], stdout_file, stderr_file, cwd: Optional[str] = None) -> WarmProcess:
+        """用空閒的 zygote 執行 `python script.py args...`
+
+        Args:
+            cmd (List[str]): 指令，第一個元素 (直譯器) 會被忽略，詳見 :func:`is_python_script`
+
+            stdout_file: stdout 輸出檔案
+
+            stderr_file: stderr 輸出檔案
+
+            cwd (Optional[str], optional): 工作目錄，默認為目前的工作目錄
+
+        Returns:
+            WarmProcess: 執行中的子程序
+        """
+
+        zygote = self._idle.get()
+
+        if self._closed:
+            self._idle.put(zygote)
+            raise RuntimeError("warm pool 已經關閉")
+
+        try:
+            _send(zygote.sock, {"argv": cmd[1:], "cwd": cwd or os.getcwd()}, [stdout_file.fileno(), stderr_file.fileno()])
+            message = _recv(zygote.sock)[0]
+
+        except OSError:
+            message = None
+
+        if message is None:
+            self._release(zygote)
+            raise RuntimeError("warm pool 的直譯器意外結束")
+
+        return WarmProcess(self, zygote, message["pid"])
+
+    def _release(self, zygote: _Zygote):
+        """歸還 zygote ，已經結束的 zygote 會重新啟動"""
+
+        with self._lock:
+            if not self._closed and not zygote.alive:
+                self._zygotes.remove(zygote)
+                zygote.close()
+
+                try:
+                    zygote = _Zygote(self.python, self.preload)
+                    zygote.wait_ready()
+
+                except (OSError, RuntimeError):
+                    # 無法重新啟動時保留已經結束的 zygote ，下一次使用時會再嘗試
+                    pass
+
+                self._zygotes.append(zygote)
+
+        self._idle.put(zygote)
+
+    def close(self):
+        """關閉所有 zygote ，正在執行的 script 不會被中斷"""
+
+        with self._lock:
+            self._closed = True
+            zygotes = list(self._zygotes)
+
+        for zygote in zygotes:
+            zygote.sock.close()
+
+        for zygote in zygotes:
+            zygote.proc.wait()
+
+
+if __name__ == "__booflow_zygote__":
+    _zygote(int(sys.argv[2]), sys.argv[3:])
@@ -0,0 +1,412 @@
+"""
+編譯工作流程
+
+`BooFlow` 建立時會先將任務清單與任務順序編譯成 `CompiledWorkflow` ：檢查流程定義，
+並建立排程需要的有向圖 (CSR) 與拓撲排序，之後每次建立 `Task` 都直接使用這些結構，不需要重新建立。
+
+會檢查的項目 (有錯誤時拋出 `WorkflowError` ，一次列出所有錯誤):
+
+- 任務清單中重複的 `task_name` ，或是沒有 `task_name` / `command` 的任務
+- 任務順序中不在任務清單中的任務，或是格式錯誤的任務順序
+- 任務順序中的循環 (會列出循環的路徑，例如 `A -> B -> C -> A`)
+
+只出現在任務清單、沒有出現在任務順序中的任務 (orphan task) 會當作沒有依賴關係的獨立任務執行，並在 `warnings` 中列出。
+
+設定 `cache_file` 時，編譯結果會以 pickle 存放在這個檔案，並以流程定義的 hash 當作 key ，
+流程定義沒有改變時，下一次啟動會直接讀取編譯結果，不需要重新檢查與建立有向圖。
+快取檔案只應該由這台機器上的 BooFlow 產生 (pickle 不能讀取不信任的檔案)。
+
+`select_workflow` 可以從編譯後的流程中選出一部分任務 (`targets` / `start_from` / `exclude`) ，
+產生只包含這些任務的任務清單與任務順序，沒有被選到的任務不會進入排程。
+
+Usage:
+    >>> compiled = compile_workflow(tasks, order, cache_file="./log/plan.pickle")
+
+    >>> compiled.names, compiled.topo_order, compiled.warnings
+
+    >>> tasks, order = select_workflow(compiled, tasks, order, targets=["task_d"], exclude=["task_b"])
+"""
+
+import os
+import pickle
+import hashlib
+from array import array
+from typing import List, Dict, Tuple, NamedTuple, Optional, Iterable
+
+import booflow
+from booflow.checkpoint import Checkpoint
+
+__all__ = ["CompiledWorkflow", "WorkflowError", "compile_workflow", "select_workflow"]
+
+# 編譯結果的格式版本，格式改變時舊的快取就不會被使用
+VERSION = 1
+
+
+class WorkflowError(ValueError):
+    """流程定義有錯誤
+
+    Args:
+        errors (List[str]): 所有錯誤訊息
+
+        cycle (Optional[List[str]], optional): 任務順序中其中一個循環的路徑 (第一個任務與最後一個任務相同)
+    """
+
+    def __init__(self, errors: List[str], cycle: Optional[List[str]] = None):
+        super().__init__("流程定義有錯誤:\n" + "\n".join(f"- {i}" for i in errors))
+
+        self.errors = errors
+        self.cycle = cycle
+
+
+class CompiledWorkflow(NamedTuple):
+    """編譯後的工作流程 (不可變更)，`Task` 只會讀取這些結構
+
+    - digest: 流程定義的 hash (快取的 key)
+    - fingerprint: 檢查點使用的流程指紋，詳見 :meth:`Checkpoint.workflow_fingerprint`
+    - names / ids: 任務 id 與任務名稱的對應
+    - offsets / edges / indegree: CSR 格式的有向圖與入度，詳見 :meth:`Task._tasks_order_to_graph`
+    - topo_order: 依照拓撲排序的任務 id
+    - warnings: 不影響執行的問題 (例如 orphan task)
+    """
+
+    digest: Optional[str]
+    fingerprint: str
+    names: Tuple[str, ...]
+    ids: Dict[str, int]
+    offsets: array
+    edges: array
+    indegree: array
+    topo_order: array
+    warnings: Tuple[str, ...]
+
+
+def definition_digest(tasks: List[dict], order: List[tuple]) -> Optional[str]:
+    """計算流程定義 (完整的任務設定與任務順序) 的 hash ，無法序列化時回傳 `None` (不使用快取)"""
+
+    try:
+        data = pickle.dumps((VERSION, tasks, [tuple(i) for i in order]), protocol=pickle.HIGHEST_PROTOCOL)
+
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def _find_cycle(names, offsets: array, edges: array, topo_order: array) -> List[str]:
+    """找出一個循環的路徑
+
+    不在拓撲排序中的任務，至少有一個上游任務也不在拓撲排序中，
+    所以從任何一個這樣的任務不斷往上游走，一定會回到走過的任務
+    """
+
+    remaining = bytearray([1]) * len(names)
+
+    for idx in topo_order:
+        remaining[idx] = 0
+
+    upstream = {}
+
+    for idx in range(len(names)):
+        if not remaining[idx]:
+            continue
+
+        for k in range(offsets[idx], offsets[idx + 1]):
+            if remaining[edges[k]]:
+                upstream.setdefault(edges[k], idx)
+
+    current = remaining.index(1)
+    visited = {}
+    path = []
+
+    while current not in visited:
+        visited[current] = len(path)
+        path.append(current)
+        current = upstream[current]
+
+    cycle = path[visited[current]:]
+    cycle.reverse()
+
+    # 從最早出現的任務開始列出
+    start = cycle.index(min(cycle))
+    cycle = cycle[start:] + cycle[:start]
+
+    return [names[i] for i in cycle + cycle[:1]]
+
+
+def _compile(tasks: List[dict], order: List[tuple], digest: Optional[str]) -> CompiledWorkflow:
+    errors = []
+
+    task_names = set()
+    duplicates = []
+
+    for idx, task in enumerate(tasks):
+        name = task.get("task_name")
+
+        if name is None or task.get("command") is None:
+            errors.append(f"第 {idx} 個任務沒有 task_name 或 command: {task}")
+            continue
+
+        if name in task_names:
+            duplicates.append(name)
+
+        task_names.add(name)
+
+    if duplicates:
+        errors.append(f"任務名稱重複: {sorted(set(duplicates))}")
+
+    invalid = [i for i in order if not isinstance(i, (tuple, list)) or len(i) not in (1, 2)]
+
+    if invalid:
+        errors.append(f"任務順序需要是 (上游任務, 下游任務) 或是 (任務,) ，錯誤的任務順序: {invalid[:10]}")
+        order = [i for i in order if isinstance(i, (tuple, list)) and len(i) in (1, 2)]
+
+    in_order = {name for item in order for name in item}
+    unknown = in_order - task_names
+
+    if unknown:
+        errors.append(f"任務順序中有不在任務清單中的任務: {sorted(unknown)}")
+
+    warnings = []
+
+    # 沒有出現在任務順序中的任務當作獨立任務，依照任務清單的順序加在最後
+    orphan_names = task_names - in_order
+    orphans = list(dict.fromkeys(i["task_name"] for i in tasks if i.get("task_name") in orphan_names))
+
+    if orphans:
+        warnings.append(f"任務 {orphans} 沒有出現在任務順序中，會當作沒有依賴關係的獨立任務執行")
+
+    Task = booflow.Task
+
+    names, ids, offsets, edges, indegree = Task._tasks_order_to_graph(list(order) + [(i,) for i in orphans])
+    topo_order = Task._gen_tasks_queue(offsets, edges, array("i", indegree))
+
+    cycle = None
+
+    if len(topo_order) < len(names):
+        cycle = _find_cycle(names, offsets, edges, topo_order)
+        errors.append(f"任務順序中有循環: {' -> '.join(cycle)}")
+
+    if errors:
+        raise WorkflowError(errors, cycle)
+
+    return CompiledWorkflow(
+        digest=digest,
+        fingerprint=Checkpoint.workflow_fingerprint(tasks, order),
+        names=tuple(names),
+        ids=ids,
+        offsets=offsets,
+        edges=edges,
+        indegree=indegree,
+        topo_order=topo_order,
+        warnings=tuple(warnings),
+    )
+
+
+def _load_cache(cache_file: str, digest: str) -> Optional[CompiledWorkflow]:
+    try:
+        with open(cache_file, "rb") as f:
+            cached_digest, compiled = pickle.load(f)
+
+    # 快取不存在、損壞，或是由不同版本產生
+    except Exception:
+        return None
+
+    if cached_digest != digest or not isinstance(compiled, CompiledWorkflow):
+        return None
+
+    return compiled
+
+
+def _save_cache(cache_file: str, compiled: CompiledWorkflow):
+    """寫入快取 (先寫入暫存檔再取代，避免寫入一半的檔案)，寫入失敗時不影響執行"""
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+
+    try:
+        with open(tmp_file, "wb") as f:
+            pickle.dump((compiled.digest, compiled), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_file, cache_file)
+
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def compile_workflow(tasks: List[dict], order: List[tuple], cache_file: Optional[str] = None) -> CompiledWorkflow:
+    """檢查流程定義並編譯成 `CompiledWorkflow`
+
+    Args:
+        tasks (List[dict]): 任務清單
+
+        order (List[tuple]): 任務順序清單
+
+        cache_file (Optional[str], optional): 編譯結果的快取檔案，流程定義沒有改變時直接讀取
+
+    Raises:
+        WorkflowError: 流程定義有錯誤
+
+    Returns:
+        CompiledWorkflow: 編譯後的工作流程
+    """
+
+    digest = definition_digest(tasks, order) if cache_file else None
+
+    if digest is not None:
+        compiled = _load_cache(cache_file, digest)
+
+        if compiled is not None:
+            return compiled
+
+    compiled = _compile(tasks, order, digest)
+
+    if digest is not None:
+        _save_cache(cache_file, compiled)
+
+    return compiled
+
+
+def _reach(starts: List[int], offsets, edges, blocked: bytearray) -> bytearray:
+    """從 `starts` 沿著有向圖可以走到的任務 (包含 `starts`)，不會經過 `blocked` 中的任務"""
+
+    reached = bytearray(len(blocked))
+    stack = []
+
+    for idx in starts:
+        if not reached[idx] and not blocked[idx]:
+            reached[idx] = 1
+            stack.append(idx)
+
+    while stack:
+        current = stack.pop()
+
+        for k in range(offsets[current], offsets[current + 1]):
+            item = edges[k]
+
+            if not reached[item] and not blocked[item]:
+                reached[item] = 1
+                stack.append(item)
+
+    return reached
+
+
+def _reverse(compiled: CompiledWorkflow) -> Tuple[array, array]:
+    """CSR 格式的反向有向圖 (任務 i 的上游任務為 `edges[offsets[i]:offsets[i + 1]]`)"""
+
+    count = len(compiled.names)
+
+    offsets = array("q", bytes(8 * (count + 1)))
+
+    for e in compiled.edges:
+        offsets[e + 1] += 1
+
+    for idx in range(count):
+        offsets[idx + 1] += offsets[idx]
+
+    position = offsets[:-1]
+    edges = array("i", bytes(4 * len(compiled.edges)))
+
+    for idx in range(count):
+        for k in range(compiled.offsets[idx], compiled.offsets[idx + 1]):
+            e = compiled.edges[k]
+            edges[position[e]] = idx
+            position[e] += 1
+
+    return offsets, edges
+
+
+def select_workflow(
+    compiled: CompiledWorkflow,
+    tasks: List[dict],
+    order: List[tuple],
+    targets: Optional[Iterable[str]] = None,
+    start_from: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+) -> Tuple[List[dict], List[tuple]]:
+    """選出流程中的一部分任務
+
+    - `targets`: 只執行這些任務，以及它們直接或間接依賴的所有上游任務
+    - `start_from`: 只執行這些任務，以及它們所有的下游任務
+    - `exclude`: 不執行這些任務，當作已經執行完成 (下游任務不需要等待它們)，
+      因此只經由被排除的任務才會被 `targets` / `start_from` 選到的任務也不會執行
+
+    同時設定 `targets` 與 `start_from` 時，只執行同時被兩者選到的任務 (介於兩者之間的任務)
+
+    Args:
+        compiled (CompiledWorkflow): 完整流程編譯後的結果，詳見 :func:`compile_workflow`
+
+        tasks (List[dict]): 完整的任務清單
+
+        order (List[tuple]): 完整的任務順序清單
+
+        targets (Optional[Iterable[str]], optional): 目標任務
+
+        start_from (Optional[Iterable[str]], optional): 開始執行的任務
+
+        exclude (Optional[Iterable[str]], optional): 排除的任務
+
+    Raises:
+        WorkflowError: 有不在流程中的任務名稱
+
+    Returns:
+        Tuple[List[dict], List[tuple]]: 選到的任務清單與任務順序清單 (維持原本的順序)
+    """
+
+    ids = compiled.ids
+    count = len(compiled.names)
+
+    targets = list(targets or [])
+    start_from = list(start_from or [])
+    exclude = list(exclude or [])
+
+    errors = []
+
+    for label, names in (("targets", targets), ("start_from", start_from), ("exclude", exclude)):
+        unknown = sorted(set(i for i in names if i not in ids))
+
+        if unknown:
+            errors.append(f"{label} 中有不在流程中的任務: {unknown}")
+
+    if errors:
+        raise WorkflowError(errors)
+
+    blocked = bytearray(count)
+
+    for name in exclude:
+        blocked[ids[name]] = 1
+
+    selected = bytearray([1]) * count
+
+    for idx in range(count):
+        if blocked[idx]:
+            selected[idx] = 0
+
+    if targets:
+        reverse_offsets, reverse_edges = _reverse(compiled)
+        ancestors = _reach([ids[i] for i in targets], reverse_offsets, reverse_edges, blocked)
+        selected = bytearray(a & b for a, b in zip(selected, ancestors))
+
+    if start_from:
+        descendants = _reach([ids[i] for i in start_from], compiled.offsets, compiled.edges, blocked)
+        selected = bytearray(a & b for a, b in zip(selected, descendants))
+
+    selected_order = []
+    listed = bytearray(count)
+
+    for item in order:
+        item_ids = [ids[i] for i in item]
+
+        if all(selected[i] for i in item_ids):
+            selected_order.append(tuple(item))
+
+            for i in item_ids:
+                listed[i] = 1
+
+    # 上下游任務都沒有被選到的任務，改為獨立任務
+    for idx in range(count):
+        if selected[idx] and not listed[idx]:
+            selected_order.append((compiled.names[idx],))
+
+    selected_tasks = [i for i in tasks if selected[ids[i["task_name"]]]]
+
+    return selected_tasks, selected_order
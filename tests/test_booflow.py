@@ -0,0 +1,892 @@
+"""
+Author: weijay
+Date: 2026-10-18 10:02:11
+LastEditors: weijay
+LastEditTime: 2026-10-18 10:02:11
+Description: BooFlow 模組 單元測試
+"""
+
+import os
+import json
+import asyncio
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from booflow import BooFlow, WorkflowError
+from booflow.checkpoint import Checkpoint
+
+TEST_CASE_PREFIX = "./tests/test_case"
+
+
+class TestBooFlow(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = {
+            "log_file_path": os.path.join(self.tmp_dir, "test.log"),
+            "history_db": os.path.join(self.tmp_dir, "history.db"),
+            "uptodate_cache": os.path.join(self.tmp_dir, "uptodate.json"),
+            "checkpoint_file": os.path.join(self.tmp_dir, "checkpoint.jsonl"),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def count_attempts(bf: BooFlow, task_name: str) -> int:
+        return bf.history._conn.execute(
+            "SELECT COUNT(*) FROM task_attempts WHERE run_id = ? AND task_name = ?", (bf.run_id, task_name)
+        ).fetchone()[0]
+
+    def test_max_workers_invalid(self):
+        with self.assertRaises(ValueError):
+            BooFlow([], [], {"max_workers": 0})
+
+    def test_run(self):
+        tasks = [
+            {"task_name": "A", "command": f"python3 {TEST_CASE_PREFIX}/case1.py"},
+            {"task_name": "B", "command": f"python3 {TEST_CASE_PREFIX}/case1.py"},
+            {"task_name": "C", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 0},
+            {"task_name": "D", "command": f"python3 {TEST_CASE_PREFIX}/case1.py"},
+        ]
+
+        order = [("A", "B"), ("A", "C"), ("C", "D")]
+
+        bf = BooFlow(tasks, order, self.config)
+        result = bf.run()
+
+        self.assertEqual(bf.task_obj.success_tasks, {"A", "B"})
+        self.assertEqual(bf.task_obj.faile_tasks["C"], {"D"})
+
+        self.assertEqual(result["success_tasks"], {"A", "B"})
+        self.assertEqual(result["faile_tasks"], {"C"})
+        self.assertEqual(result["not_execute_tasks"], {"D"})
+
+        self.assertEqual(set(result["task_attempts"]), {"A", "B", "C"})
+        self.assertIsNotNone(result["task_attempts"]["A"][0]["rusage"])
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertIn("資源使用: task=A attempt=1 wall=", f.read())
+
+    def test_run_parallel(self):
+        tasks = [{"task_name": "root", "command": "true"}]
+        order = []
+
+        for i in range(4):
+            tasks.append({"task_name": f"sleep{i}", "command": "sleep 1"})
+            order.append(("root", f"sleep{i}"))
+
+        self.config["max_workers"] = 4
+
+        bf = BooFlow(tasks, order, self.config)
+
+        start = time.monotonic()
+        bf.run()
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(bf.task_obj.success_tasks, {"root", "sleep0", "sleep1", "sleep2", "sleep3"})
+        self.assertLess(elapsed, 3)
+
+    def test_arun(self):
+        tasks = [{"task_name": "root", "command": "true"}]
+        order = []
+
+        for i in range(20):
+            tasks.append({"task_name": f"sleep{i}", "command": "sleep 1"})
+            order.append(("root", f"sleep{i}"))
+
+        tasks.append({"task_name": "faile", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 0})
+        tasks.append({"task_name": "after_faile", "command": "true"})
+        order.append(("root", "faile"))
+        order.append(("faile", "after_faile"))
+
+        self.config["max_concurrency"] = 30
+
+        bf = BooFlow(tasks, order, self.config)
+
+        start = time.monotonic()
+        result = asyncio.run(bf.arun())
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(result["success_tasks"], {"root"} | {f"sleep{i}" for i in range(20)})
+        self.assertEqual(result["faile_tasks"], {"faile"})
+        self.assertEqual(result["not_execute_tasks"], {"after_faile"})
+        self.assertLess(elapsed, 3)
+
+    def test_run_with_resources(self):
+        tasks = [
+            {"task_name": "root", "command": "true"},
+            {"task_name": "big1", "command": "sleep 0.3", "cpus": 2},
+            {"task_name": "big2", "command": "sleep 0.3", "cpus": 2},
+            {"task_name": "db1", "command": "sleep 0.3", "pool": "db"},
+            {"task_name": "db2", "command": "sleep 0.3", "pool": "db"},
+            {"task_name": "huge", "command": "true", "cpus": 64},
+        ]
+
+        self.config["max_workers"] = 4
+        self.config["resources"] = {"cpus": 2, "memory": 1024}
+        self.config["pools"] = {"db": 1}
+
+        order = [("root", i["task_name"]) for i in tasks[1:]]
+
+        # arun 與 run 使用相同的資源限制
+        for run in (lambda bf: bf.run(), lambda bf: asyncio.run(bf.arun())):
+            with self.subTest(run=run):
+                bf = BooFlow(tasks, order, self.config)
+                result = run(bf)
+
+                self.assertEqual(result["success_tasks"], {"root", "big1", "big2", "db1", "db2", "huge"})
+
+                def attempt(task_name):
+                    return result["task_attempts"][task_name][0]
+
+                # 同時只能執行一個需要 2 個 CPU 的任務，pool db 同時只能執行一個任務
+                for a, b in [("big1", "big2"), ("db1", "db2")]:
+                    first, second = sorted([attempt(a), attempt(b)], key=lambda i: i["start_time"])
+                    self.assertGreaterEqual(second["start_time"], first["end_time"])
+
+                # 所有資源都已經釋放
+                self.assertEqual((bf.resources.used_cpus, bf.resources.used_memory), (0, 0))
+                self.assertEqual(bf.resources.pool_used, {"db": 0})
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertEqual(f.read().count("任務 huge 宣告的資源"), 2)
+
+    def test_arun_deadline_waiting_for_resources(self):
+        tasks = [
+            {"task_name": "db1", "command": "sleep 30", "pool": "db"},
+            {"task_name": "db2", "command": "sleep 30", "pool": "db"},
+        ]
+
+        self.config["pools"] = {"db": 1}
+        self.config["deadline"] = 0.5
+
+        start = time.monotonic()
+        result = asyncio.run(BooFlow(tasks, [("db1",), ("db2",)], self.config).arun())
+
+        # 等待 pool 空位的任務也會被中斷
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(result["cut_off_tasks"], {"db1", "db2"})
+
+    def test_arun_admission(self):
+        tasks = [{"task_name": f"task{i}", "command": "true", "cpus": 1} for i in range(200)]
+
+        self.config["max_concurrency"] = 4
+        self.config["resources"] = {"cpus": 2}
+
+        bf = BooFlow(tasks, [], self.config)
+
+        execute = bf._aexecute_task
+        alive = []
+        peak = []
+
+        async def counting(cron):
+            alive.append(cron.name)
+            peak.append(len(alive))
+
+            try:
+                return await execute(cron)
+
+            finally:
+                alive.remove(cron.name)
+
+        with mock.patch.object(bf, "_aexecute_task", counting):
+            result = asyncio.run(bf.arun())
+
+        self.assertEqual(len(result["success_tasks"]), 200)
+
+        # 只有取得資源的任務才會建立 coroutine ，不會為每個可以執行的任務都預先建立
+        self.assertEqual(len(peak), 200)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_run_retry_with_backoff(self):
+        counter_file = os.path.join(self.tmp_dir, "counter")
+
+        tasks = [
+            {"task_name": "root", "command": "true"},
+            {
+                "task_name": "flaky",
+                "command": f"python3 {TEST_CASE_PREFIX}/case5.py {counter_file} 1",
+                "retry": 3,
+                "retry_delay": 0.5,
+                "retry_jitter": 0,
+            },
+            {"task_name": "other", "command": "sleep 0.1"},
+        ]
+
+        order = [("root", "flaky"), ("root", "other")]
+
+        self.config["max_workers"] = 1
+
+        bf = BooFlow(tasks, order, self.config)
+        result = bf.run()
+
+        self.assertEqual(result["success_tasks"], {"root", "flaky", "other"})
+
+        # 第一次重新執行就成功，不會再繼續重新執行
+        flaky = result["task_attempts"]["flaky"]
+        self.assertEqual(len(flaky), 2)
+        self.assertGreaterEqual(flaky[1]["start_time"] - flaky[0]["end_time"], 0.5)
+
+        # 等待重新執行的期間，唯一的 worker 會先執行其他任務
+        other = result["task_attempts"]["other"][0]
+        self.assertGreaterEqual(other["start_time"], flaky[0]["end_time"])
+        self.assertLessEqual(other["end_time"], flaky[1]["start_time"])
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertIn("任務 flaky 將在 0.50 秒後重新嘗試執行 (剩餘 3 次)", f.read())
+
+    def test_arun_retry_with_backoff(self):
+        counter_file = os.path.join(self.tmp_dir, "counter")
+
+        tasks = [
+            {
+                "task_name": "flaky",
+                "command": f"python3 {TEST_CASE_PREFIX}/case5.py {counter_file} 2",
+                "retry": 3,
+                "retry_delay": 0.1,
+                "retry_jitter": 0,
+            },
+            {"task_name": "after", "command": "true"},
+        ]
+
+        bf = BooFlow(tasks, [("flaky", "after")], self.config)
+        result = asyncio.run(bf.arun())
+
+        self.assertEqual(result["success_tasks"], {"flaky", "after"})
+        self.assertEqual(len(result["task_attempts"]["flaky"]), 3)
+
+    def test_run_deadline(self):
+        tasks = [
+            {"task_name": "root", "command": "true"},
+            {"task_name": "a", "command": "sleep 30"},
+            {"task_name": "b", "command": "sleep 30"},
+            {"task_name": "c", "command": "true"},
+        ]
+
+        order = [("root", "a"), ("root", "b"), ("a", "c")]
+
+        self.config["deadline"] = 1
+
+        for run in (lambda bf: bf.run(), lambda bf: asyncio.run(bf.arun())):
+            self.config["max_workers"] = 1
+
+            bf = BooFlow(tasks, order, self.config)
+
+            start = time.monotonic()
+            result = run(bf)
+
+            self.assertLess(time.monotonic() - start, 5)
+
+            # a 或 b 其中一個正在執行，另一個還在等待執行
+            self.assertEqual(result["cut_off_tasks"], {"a", "b"})
+            self.assertEqual(result["success_tasks"], {"root"})
+            self.assertEqual(result["faile_tasks"], {"a", "b"})
+            self.assertEqual(result["not_execute_tasks"], {"c"})
+
+    def test_run_deadline_kill_grace(self):
+        pid_file = os.path.join(self.tmp_dir, "pid")
+
+        # 任務忽略 SIGTERM ，等待 kill_grace 秒後才會被 SIGKILL 結束
+        tasks = [
+            {"task_name": "A", "command": f"python3 {TEST_CASE_PREFIX}/case6.py {pid_file} ignore_term", "kill_grace": 2},
+            {"task_name": "B", "command": "true"},
+        ]
+
+        self.config["deadline"] = 0.5
+
+        for run in (lambda bf: bf.run(), lambda bf: asyncio.run(bf.arun())):
+            with self.subTest(run=run):
+                bf = BooFlow(tasks, [("A", "B")], self.config)
+
+                start, cpu_start = time.monotonic(), time.process_time()
+                result = run(bf)
+
+                # 等待期間不會一直重新檢查執行期限 (busy wait)
+                self.assertGreater(time.monotonic() - start, 2)
+                self.assertLess(time.process_time() - cpu_start, 0.5)
+
+                self.assertEqual(result["cut_off_tasks"], {"A"})
+                self.assertEqual(result["not_execute_tasks"], {"B"})
+
+    def test_arun_retry_wait_cut_off(self):
+        tasks = [
+            {
+                "task_name": "A",
+                "command": f"python3 {TEST_CASE_PREFIX}/case2.py",
+                "retry": 3,
+                "retry_delay": 30,
+                "retry_jitter": 0,
+            }
+        ]
+
+        self.config["deadline"] = 1
+
+        bf = BooFlow(tasks, [("A",)], self.config)
+
+        start = time.monotonic()
+
+        with mock.patch("asyncio.sleep", wraps=asyncio.sleep) as sleep:
+            result = asyncio.run(bf.arun())
+
+        # 等待重新執行時不會定期醒來檢查，超過執行期限時會立刻結束等待
+        self.assertLess(time.monotonic() - start, 5)
+        sleep.assert_not_called()
+
+        self.assertEqual(result["faile_tasks"], {"A"})
+        self.assertEqual(len(result["task_attempts"]["A"]), 1)
+
+    def test_run_repeated_log_once(self):
+        tasks = [{"task_name": "A", "command": "true"}, {"task_name": "B", "command": "true"}]
+
+        for _ in range(3):
+            BooFlow(tasks, [("A", "B")], self.config).run()
+
+        with open(self.config["log_file_path"]) as f:
+            content = f.read()
+
+        self.assertEqual(content.count("任務 A 執行完成"), 3)
+        self.assertEqual(content.count("開始執行 (run id:"), 3)
+
+    def test_run_json_log(self):
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 0},
+        ]
+
+        self.config["log_format"] = "json"
+
+        bf = BooFlow(tasks, [("A", "B")], self.config)
+        bf.run()
+
+        with open(self.config["log_file_path"]) as f:
+            records = [json.loads(line) for line in f]
+
+        for record in records:
+            self.assertEqual(record["run_id"], bf.run_id)
+            self.assertEqual(
+                set(record), {"time", "level", "run_id", "task", "attempt", "event", "duration", "message"}
+            )
+
+        events = [(i["task"], i["event"]) for i in records if i["event"] is not None]
+
+        self.assertEqual(events[0], (None, "run_start"))
+        self.assertEqual(events[-1][1], "run_end")
+        self.assertIn(("A", "start"), events)
+        self.assertIn(("A", "success"), events)
+        self.assertIn(("B", "faile"), events)
+
+        attempt = next(i for i in records if i["event"] == "attempt" and i["task"] == "A")
+        self.assertEqual(attempt["attempt"], 1)
+        self.assertIsNotNone(attempt["duration"])
+
+    def test_run_metrics_file(self):
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 1, "retry_delay": 0},
+        ]
+
+        self.config["metrics_file"] = os.path.join(self.tmp_dir, "booflow.prom")
+
+        BooFlow(tasks, [("A", "B")], self.config).run()
+
+        with open(self.config["metrics_file"]) as f:
+            text = f.read()
+
+        self.assertIn("booflow_tasks_started_total 2", text)
+        self.assertIn("booflow_tasks_succeeded_total 1", text)
+        self.assertIn("booflow_tasks_failed_total 1", text)
+        self.assertIn("booflow_tasks_retried_total 1", text)
+        self.assertIn('booflow_task_duration_seconds_count{task="B"} 2', text)
+        self.assertIn("booflow_task_report_seconds_count 2", text)
+        self.assertIn("booflow_running_tasks 0", text)
+
+    def test_run_trace_file(self):
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 1, "retry_delay": 0},
+            {"task_name": "C", "command": "true"},
+        ]
+
+        trace_file = os.path.join(self.tmp_dir, "trace.json")
+
+        for run in (lambda bf: bf.run(trace_file=trace_file), lambda bf: asyncio.run(bf.arun(trace_file=trace_file))):
+            run(BooFlow(tasks, [("A", "B"), ("A", "C")], self.config))
+
+            with open(trace_file) as f:
+                events = json.load(f)["traceEvents"]
+
+            spans = [(i["name"], i["args"]["attempt"]) for i in events if i["ph"] == "X"]
+
+            self.assertEqual(sorted(spans), [("A", 1), ("B", 1), ("B", 2), ("C", 1)])
+            self.assertEqual([i["name"] for i in events if i["ph"] == "i"], ["retry"])
+
+            # A -> B 、 A -> C 兩個箭頭
+            self.assertEqual(len([i for i in events if i["ph"] == "s"]), 2)
+
+            os.remove(trace_file)
+
+    def test_plan(self):
+        tasks = [{"task_name": i, "command": "true"} for i in "ABCD"]
+        order = [("A", "B"), ("A", "C"), ("B", "D"), ("C", "D")]
+
+        bf = BooFlow(tasks, order, self.config)
+
+        # D 沒有執行時間資料，使用平均執行時間 (1 + 4 + 2) / 3
+        durations = {"A": 1, "B": 4, "C": 2}
+        d = 7 / 3
+
+        result = bf.plan(max_workers=1, durations=durations)
+
+        self.assertAlmostEqual(result["makespan"], 7 + d)
+        self.assertEqual(result["critical_path"], ["A", "B", "D"])
+        self.assertAlmostEqual(result["critical_path_length"], 5 + d)
+        self.assertEqual(result["max_parallelism"], 2)
+        self.assertAlmostEqual(result["utilization"], 1)
+        self.assertEqual(result["estimated_tasks"], ["D"])
+
+        result = bf.plan(max_workers=2, durations=durations)
+
+        self.assertAlmostEqual(result["makespan"], 5 + d)
+        self.assertAlmostEqual(result["utilization"], (7 + d) / (2 * (5 + d)))
+
+        # 沒有執行任何任務
+        self.assertFalse(os.path.exists(self.config["log_file_path"]))
+
+    def test_plan_invalid(self):
+        tasks = [{"task_name": i, "command": "true"} for i in "AB"]
+
+        with self.assertRaises(ValueError):
+            BooFlow(tasks, [("A", "B")], self.config).plan(max_workers=0)
+
+    def test_invalid_workflow(self):
+        tasks = [{"task_name": i, "command": "true"} for i in "AB"]
+
+        # 流程定義的錯誤在建立時就會拋出
+        with self.assertRaises(WorkflowError) as cm:
+            BooFlow(tasks, [("A", "B"), ("B", "A")], self.config)
+
+        self.assertEqual(cm.exception.cycle, ["A", "B", "A"])
+
+        with self.assertRaises(WorkflowError):
+            BooFlow(tasks, [("A", "C")], self.config)
+
+    def test_run_orphan_task(self):
+        tasks = [{"task_name": i, "command": "true"} for i in "ABC"]
+
+        bf = BooFlow(tasks, [("A", "B")], self.config)
+        result = bf.run()
+
+        self.assertEqual(result["success_tasks"], {"A", "B", "C"})
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertIn("任務 ['C'] 沒有出現在任務順序中，會當作沒有依賴關係的獨立任務執行", f.read())
+
+    def test_run_select(self):
+        tasks = [{"task_name": i, "command": "true"} for i in "ABCDE"]
+        order = [("A", "B"), ("B", "D"), ("C", "D"), ("D", "E")]
+
+        self.config["start_from"] = ["B"]
+        self.config["exclude"] = ["E"]
+
+        bf = BooFlow(tasks, order, self.config)
+
+        # 沒有被選到的任務不會進入任務依賴圖
+        self.assertEqual(list(bf.task_obj._names), ["B", "D"])
+
+        result = bf.run()
+
+        self.assertEqual(result["success_tasks"], {"B", "D"})
+        self.assertEqual(set(result["task_attempts"]), {"B", "D"})
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertIn("只執行選到的 2 / 5 個任務", f.read())
+
+    def test_select_invalid(self):
+        tasks = [{"task_name": i, "command": "true"} for i in "AB"]
+        self.config["targets"] = ["X"]
+
+        with self.assertRaises(WorkflowError):
+            BooFlow(tasks, [("A", "B")], self.config)
+
+    def test_run_warm_pool(self):
+        tasks = [
+            {"task_name": "A", "command": f"python3 {TEST_CASE_PREFIX}/case7.py 0"},
+            {"task_name": "B", "command": f"python3 {TEST_CASE_PREFIX}/case7.py 0", "warm": False},
+            {"task_name": "C", "command": "true"},
+        ]
+
+        self.config["warm_pool"] = {"size": 1, "preload": ["decimal"]}
+
+        bf = BooFlow(tasks, [("A", "B"), ("A", "C")], self.config)
+        result = bf.run()
+
+        self.assertEqual(result["success_tasks"], {"A", "B", "C"})
+        self.assertIsNone(bf._warm_pool)
+
+        with open(self.config["log_file_path"]) as f:
+            text = f.read()
+
+        self.assertIn("已啟動 1 個預先 import ['decimal'] 的直譯器", text)
+        self.assertIn("以下任務會使用: ['A']", text)
+
+        # A 在預先 import decimal 的直譯器中執行， B 是新的直譯器
+        output_dir = bf.output_dir
+
+        for task_name, preloaded in (("A", "True"), ("B", "False")):
+            with open(os.path.join(output_dir, f"{task_name}.1.stdout")) as f:
+                self.assertEqual(f.read(), f"['0'] {preloaded} __main__\n")
+
+    def test_output_dir(self):
+        tasks = [{"task_name": "A", "command": "echo hello"}]
+
+        output_dirs = []
+
+        for _ in range(2):
+            bf = BooFlow(tasks, [("A",)], self.config)
+            bf.run()
+
+            output_dirs.append(bf.output_dir)
+
+        # 同一個 log 檔案的每次執行都使用不同的輸出資料夾
+        self.assertNotEqual(output_dirs[0], output_dirs[1])
+
+        for output_dir in output_dirs:
+            self.assertEqual(os.path.dirname(output_dir), os.path.join(self.tmp_dir, "output"))
+
+            with open(os.path.join(output_dir, "A.1.stdout")) as f:
+                self.assertEqual(f.read(), "hello\n")
+
+    def test_run_map(self):
+        out_dir = os.path.join(self.tmp_dir, "out")
+        os.mkdir(out_dir)
+
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {
+                "task_name": "M",
+                "command": f"touch {out_dir}/{{item}}",
+                "map": {"range": [20]},
+                "max_in_flight": 3,
+            },
+            {"task_name": "B", "command": "true"},
+        ]
+
+        self.config["max_workers"] = 4
+
+        peak = []
+
+        class _BooFlow(BooFlow):
+            def _expand_instance(self, state, cron):
+                peak.append(len(state.running))
+                return super()._expand_instance(state, cron)
+
+        for run in ("run", "arun"):
+            with self.subTest(run=run):
+                for name in os.listdir(out_dir):
+                    os.remove(os.path.join(out_dir, name))
+
+                peak.clear()
+
+                bf = _BooFlow(tasks, [("A", "M"), ("M", "B")], self.config)
+                result = bf.run() if run == "run" else asyncio.run(bf.arun())
+
+                self.assertEqual(result["success_tasks"], {"A", "M", "B"})
+                self.assertEqual(sorted(os.listdir(out_dir), key=int), [str(i) for i in range(20)])
+
+                # 同時存在的實例不超過 max_in_flight ，結束後不會保留任何實例
+                self.assertLessEqual(max(peak), 3)
+                self.assertEqual(bf._map_instances, {})
+                self.assertEqual(bf._active_maps, {})
+                self.assertNotIn("M[0]", result["task_attempts"])
+
+                self.assertEqual(self.count_attempts(bf, "M[7]"), 1)
+
+    def test_run_map_failed(self):
+        # 路徑不存在時 ls 會輸出到 stderr
+        tasks = [
+            {
+                "task_name": "M",
+                "command": "ls {item}",
+                "retry": 0,
+                "map": {"list": [self.tmp_dir, "missing-1", self.tmp_dir, "missing-2"]},
+            },
+            {"task_name": "B", "command": "true"},
+        ]
+
+        self.config["max_workers"] = 2
+
+        bf = BooFlow(tasks, [("M", "B")], self.config)
+        result = bf.run()
+
+        self.assertEqual(result["faile_tasks"], {"M"})
+        self.assertEqual(result["not_execute_tasks"], {"B"})
+
+        with open(self.config["log_file_path"]) as f:
+            text = f.read()
+
+        self.assertIn("任務 M[1] (參數: missing-1) 執行失敗", text)
+        self.assertIn("map 任務 M 結束: 2 個實例成功， 2 個實例失敗", text)
+        self.assertIn("2 個實例失敗: M[1]=missing-1, M[3]=missing-2", text)
+
+    def test_run_map_source_error(self):
+        tasks = [
+            {"task_name": "M1", "command": "echo {item}", "map": {"lines": os.path.join(self.tmp_dir, "missing.txt")}},
+            {"task_name": "M2", "command": "echo {item}", "map": {"range": ["a"]}},
+            {"task_name": "B", "command": "true"},
+            {"task_name": "C", "command": "true"},
+        ]
+
+        order = [("M1", "B"), ("M2", "B"), ("C",)]
+
+        for run in (lambda bf: bf.run(), lambda bf: asyncio.run(bf.arun())):
+            with self.subTest(run=run):
+                result = run(BooFlow(tasks, order, self.config))
+
+                # 參數來源無法讀取時 map 任務失敗，下游任務不會執行
+                self.assertEqual(result["success_tasks"], {"C"})
+                self.assertEqual(result["faile_tasks"], {"M1", "M2"})
+                self.assertEqual(result["not_execute_tasks"], {"B"})
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertIn("map 任務 M1 無法讀取參數來源: FileNotFoundError", f.read())
+
+    def test_run_map_deadline(self):
+        tasks = [
+            {"task_name": "M", "command": "sleep 5", "retry": 0, "map": {"range": [10]}},
+            {"task_name": "B", "command": "true"},
+        ]
+
+        self.config["max_workers"] = 2
+        self.config["deadline"] = 0.5
+
+        start = time.monotonic()
+
+        bf = BooFlow(tasks, [("M", "B")], self.config)
+        result = bf.run()
+
+        self.assertLess(time.monotonic() - start, 4)
+        self.assertEqual(result["cut_off_tasks"], {"M"})
+        self.assertEqual(result["not_execute_tasks"], {"B"})
+        self.assertEqual(bf._active_maps, {})
+
+    def test_map_invalid(self):
+        with self.assertRaises(ValueError):
+            BooFlow([{"task_name": "M", "command": "true", "map": {"range": [2], "list": []}}], [], self.config)
+
+    def test_run_twice(self):
+        tasks = [{"task_name": "A", "command": "true"}, {"task_name": "B", "command": "true"}]
+
+        bf = BooFlow(tasks, [("A", "B")], self.config)
+        task_obj = bf.task_obj
+
+        first = bf.run()
+        second = bf.run()
+
+        self.assertIs(bf.task_obj, task_obj)
+        self.assertEqual(first["success_tasks"], {"A", "B"})
+        self.assertEqual(second["success_tasks"], {"A", "B"})
+        self.assertFalse(second["cancelled"])
+
+    def test_cancel(self):
+        tasks = [
+            {"task_name": "A", "command": "sleep 10", "retry": 0},
+            {"task_name": "B", "command": "true"},
+            {"task_name": "C", "command": "sleep 10", "retry": 0},
+        ]
+
+        self.config["max_workers"] = 2
+
+        for run in ("run", "arun"):
+            with self.subTest(run=run):
+                bf = BooFlow(tasks, [("A", "B"), ("C",)], self.config)
+
+                self.assertFalse(bf.cancel())
+
+                timer = threading.Timer(0.5, bf.cancel)
+                timer.start()
+
+                start = time.monotonic()
+                result = bf.run() if run == "run" else asyncio.run(bf.arun())
+
+                timer.join()
+
+                self.assertLess(time.monotonic() - start, 5)
+                self.assertTrue(result["cancelled"])
+                self.assertEqual(result["cut_off_tasks"], {"A", "C"})
+                self.assertEqual(result["not_execute_tasks"], {"B"})
+
+                with open(self.config["log_file_path"]) as f:
+                    self.assertIn("執行被取消，中斷執行中的任務: A", f.read())
+
+    def test_run_impact_report(self):
+        tasks = [{"task_name": i, "command": "true"} for i in "ABC"]
+
+        self.config["impact_report"] = True
+
+        bf = BooFlow(tasks, [("A", "B"), ("B", "C")], self.config)
+        bf.run()
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertIn("失敗影響範圍 (失敗時會被取消的任務數量): A=2, B=1, C=0", f.read())
+
+    def test_run_record_history(self):
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 1, "retry_delay": 0},
+        ]
+        order = [("A", "B")]
+
+        bf = BooFlow(tasks, order, self.config)
+        bf.run()
+
+        rows = bf.history._conn.execute(
+            "SELECT run_id, task_name, attempt, exit_status, failure_kind FROM task_attempts ORDER BY id"
+        ).fetchall()
+
+        self.assertEqual(
+            rows,
+            [
+                (bf.run_id, "A", 1, 0, None),
+                (bf.run_id, "B", 1, 1, "program error"),
+                (bf.run_id, "B", 2, 1, "program error"),
+            ],
+        )
+
+        self.assertEqual(set(bf.history.duration_percentiles()), {"A"})
+
+        self.config["scheduling"] = "critical_path"
+
+        bf = BooFlow(tasks, order, self.config)
+
+        self.assertEqual(set(bf.durations), {"A"})
+        self.assertGreater(bf.task_obj.rank["A"], bf.task_obj.rank["B"])
+
+
+    def test_run_skip_up_to_date(self):
+        input_file = os.path.join(self.tmp_dir, "input.txt")
+        output_file = os.path.join(self.tmp_dir, "output.txt")
+
+        with open(input_file, "w") as f:
+            f.write("v1")
+
+        tasks = [
+            {
+                "task_name": "A",
+                "command": f"cp {input_file} {output_file}",
+                "inputs": [input_file],
+                "outputs": [output_file],
+            },
+            {"task_name": "B", "command": "true"},
+        ]
+        order = [("A", "B")]
+
+        BooFlow(tasks, order, self.config).run()
+
+        bf = BooFlow(tasks, order, self.config)
+        result = bf.run()
+
+        # A 沒有改變，不會執行，但下游的 B 仍然會執行
+        self.assertEqual(result["success_tasks"], {"A", "B"})
+        self.assertEqual(self.count_attempts(bf, "A"), 0)
+        self.assertEqual(self.count_attempts(bf, "B"), 1)
+
+        with open(input_file, "w") as f:
+            f.write("v2")
+
+        bf = BooFlow(tasks, order, self.config)
+        bf.run()
+
+        with open(output_file) as f:
+            self.assertEqual(f.read(), "v2")
+
+    def test_run_directory_inputs(self):
+        src = os.path.join(self.tmp_dir, "src")
+        os.mkdir(src)
+
+        tasks = [
+            {"task_name": "A", "command": "true", "inputs": [os.path.join(src, "**")]},
+            {"task_name": "B", "command": "true", "inputs": [src]},
+        ]
+
+        for run in (lambda bf: bf.run(), lambda bf: asyncio.run(bf.arun())):
+            with self.subTest(run=run):
+                result = run(BooFlow(tasks, [("A", "B")], self.config))
+
+                self.assertEqual(result["success_tasks"], {"A", "B"})
+
+    def test_run_resume(self):
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": "true"},
+            {"task_name": "C", "command": "true"},
+        ]
+        order = [("A", "B"), ("B", "C")]
+
+        # 模擬上一次執行在 A 完成後被中斷
+        checkpoint = Checkpoint(self.config["checkpoint_file"], Checkpoint.workflow_fingerprint(tasks, order))
+        checkpoint.open()
+        checkpoint.record("A", True)
+
+        bf = BooFlow(tasks, order, self.config)
+        result = bf.run(resume=True)
+
+        self.assertEqual(result["success_tasks"], {"A", "B", "C"})
+        self.assertEqual(self.count_attempts(bf, "A"), 0)
+        self.assertEqual(self.count_attempts(bf, "B"), 1)
+
+        # 上一次的執行已經完成，會重新執行所有任務
+        bf = BooFlow(tasks, order, self.config)
+        bf.run(resume=True)
+
+        self.assertEqual(self.count_attempts(bf, "A"), 1)
+
+    def test_run_resume_after_interrupted(self):
+        script = os.path.join(self.tmp_dir, "b.sh")
+
+        with open(script, "w") as f:
+            f.write("sleep 30\n")
+
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": f"sh {script}"},
+            {"task_name": "C", "command": "true"},
+        ]
+        order = [("A", "B"), ("B", "C")]
+
+        # 超過執行期限而中斷的執行不算完成
+        self.config["deadline"] = 0.5
+
+        result = BooFlow(tasks, order, self.config).run()
+
+        self.assertEqual(result["cut_off_tasks"], {"B"})
+
+        with open(script, "w") as f:
+            f.write("true\n")
+
+        del self.config["deadline"]
+
+        bf = BooFlow(tasks, order, self.config)
+        result = bf.run(resume=True)
+
+        self.assertEqual(result["success_tasks"], {"A", "B", "C"})
+        self.assertEqual(self.count_attempts(bf, "A"), 0)
+        self.assertEqual(self.count_attempts(bf, "B"), 1)
+
+    def test_run_resume_with_changed_workflow(self):
+        tasks = [{"task_name": "A", "command": "true"}, {"task_name": "B", "command": "true"}]
+        order = [("A", "B")]
+
+        checkpoint = Checkpoint(self.config["checkpoint_file"], Checkpoint.workflow_fingerprint(tasks, order))
+        checkpoint.open()
+        checkpoint.record("A", True)
+
+        tasks[1]["command"] = "echo changed"
+
+        bf = BooFlow(tasks, order, self.config)
+        bf.run(resume=True)
+
+        self.assertEqual(self.count_attempts(bf, "A"), 1)
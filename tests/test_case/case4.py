@@ -0,0 +1,14 @@
+"""
+Author: weijay
+Date: 2026-10-18 11:52:31
+LastEditors: weijay
+LastEditTime: 2026-10-18 11:52:31
+Description: 測試 case 4 (使用約 64 MB 記憶體)
+"""
+
+data = bytearray(64 * 1024 * 1024)
+
+for i in range(0, len(data), 4096):
+    data[i] = 1
+
+print("Hello from case4")
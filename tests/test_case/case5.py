@@ -0,0 +1,29 @@
+"""
+Author: weijay
+Date: 2026-10-18 15:10:42
+LastEditors: weijay
+LastEditTime: 2026-10-18 15:10:42
+Description: 測試 case 5 (前幾次執行失敗，之後執行成功)
+
+Usage:
+    $ python3 case5.py <計數檔案> <失敗次數>
+"""
+
+import sys
+
+counter_file, faile_times = sys.argv[1], int(sys.argv[2])
+
+try:
+    with open(counter_file) as f:
+        count = int(f.read())
+
+except FileNotFoundError:
+    count = 0
+
+with open(counter_file, "w") as f:
+    f.write(str(count + 1))
+
+if count < faile_times:
+    raise RuntimeError(f"This is test error ({count + 1})")
+
+print("Hello from case5")
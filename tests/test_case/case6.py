@@ -0,0 +1,27 @@
+"""
+Author: weijay
+Date: 2026-10-18 15:48:20
+LastEditors: weijay
+LastEditTime: 2026-10-18 15:48:20
+Description: 測試 case 6 (啟動一個子程序後長時間執行)
+
+Usage:
+    $ python3 case6.py <pid 檔案> [ignore_term]
+
+    子程序的 pid 會寫入 pid 檔案，指定 ignore_term 時會忽略 SIGTERM
+"""
+
+import sys
+import time
+import signal
+import subprocess
+
+if len(sys.argv) > 2 and sys.argv[2] == "ignore_term":
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+child = subprocess.Popen(["sleep", "30"])
+
+with open(sys.argv[1], "w") as f:
+    f.write(str(child.pid))
+
+time.sleep(30)
@@ -0,0 +1,13 @@
+"""
+Author: weijay
+Date: 2026-10-18 19:02:44
+LastEditors: weijay
+LastEditTime: 2026-10-18 19:02:44
+Description: 測試 case 7 ，輸出參數與 decimal 是否已經被 import ，並以第一個參數當作 exit status 結束
+"""
+
+import sys
+
+print(sys.argv[1:], "decimal" in sys.modules, __name__)
+
+sys.exit(int(sys.argv[1]))
@@ -0,0 +1,66 @@
+"""
+Author: weijay
+Date: 2026-10-18 11:24:09
+LastEditors: weijay
+LastEditTime: 2026-10-18 11:24:09
+Description: Checkpoint 模組 單元測試
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from booflow.checkpoint import Checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "checkpoint.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_workflow_fingerprint(self):
+        tasks = [{"task_name": "A", "command": "true"}, {"task_name": "B", "command": "true"}]
+
+        fingerprint = Checkpoint.workflow_fingerprint(tasks, [("A", "B")])
+
+        self.assertEqual(fingerprint, Checkpoint.workflow_fingerprint(tasks, [["A", "B"]]))
+        self.assertNotEqual(fingerprint, Checkpoint.workflow_fingerprint(tasks, [("B", "A")]))
+
+    def test_load(self):
+        self.assertIsNone(Checkpoint(self.path, "fp").load())
+
+        checkpoint = Checkpoint(self.path, "fp")
+        checkpoint.open()
+        checkpoint.record("A", True)
+        checkpoint.record("B", False)
+
+        self.assertEqual(Checkpoint(self.path, "fp").load(), {"A": True, "B": False})
+        self.assertIsNone(Checkpoint(self.path, "other").load())
+        self.assertTrue(Checkpoint(self.path, "other").is_changed())
+        self.assertFalse(Checkpoint(self.path, "fp").is_changed())
+
+        # 接續執行會保留原本的紀錄
+        checkpoint.close(finished=False)
+        checkpoint.open(resume=True)
+        checkpoint.record("C", True)
+
+        self.assertEqual(Checkpoint(self.path, "fp").load(), {"A": True, "B": False, "C": True})
+
+        checkpoint.close()
+
+        self.assertIsNone(Checkpoint(self.path, "fp").load())
+
+    def test_load_with_truncated_line(self):
+        checkpoint = Checkpoint(self.path, "fp")
+        checkpoint.open()
+        checkpoint.record("A", True)
+        checkpoint.close(finished=False)
+
+        with open(self.path, "a") as f:
+            f.write('{"task": "B", "sta')
+
+        self.assertEqual(Checkpoint(self.path, "fp").load(), {"A": True})
@@ -6,7 +6,15 @@ LastEditTime: 2022-12-22 13:50:38
 Description: Cron 模組 單元測試
 """
 
+import os
+import asyncio
+import time
+import shutil
+import signal
+import tempfile
+import threading
 import unittest
+from unittest import mock
 
 from booflow import Cron
 
@@ -79,6 +87,32 @@ class TestCron(unittest.TestCase):
         for e in res_list:
             self.assertEqual(e[1], "program error")
 
+    def test_cron_next_retry_delay(self):
+        test_task = {
+            "task_name": "test1",
+            "command": "true",
+            "retry_delay": 1,
+            "retry_backoff": 2,
+            "retry_max_delay": 5,
+            "retry_jitter": 0,
+        }
+
+        cron = Cron(test_task)
+
+        delays = []
+
+        for attempt in range(1, 5):
+            cron.attempt = attempt
+            delays.append(cron.next_retry_delay())
+
+        self.assertEqual(delays, [1, 2, 4, 5])
+
+        cron.retry_jitter = 0.5
+        cron.attempt = 1
+
+        for _ in range(100):
+            self.assertTrue(0.5 <= cron.next_retry_delay() <= 1.5)
+
     def test_cron_retry_zero(self):
         test_task = {
             "task_name": "test1",
@@ -105,3 +139,203 @@ class TestCron(unittest.TestCase):
 
         for e in res_list:
             self.assertEqual(e[1], "program error")
+
+    def test_cron_arun(self):
+        test_task = {"task_name": "test1", "command": f"python3 {TEST_CASE_PREFIX}/case1.py"}
+
+        cron = Cron(test_task)
+
+        res = asyncio.run(cron.arun())
+
+        self.assertEqual(res, (True, None, "Hello from case1"))
+
+    def test_cron_arun_with_timeout(self):
+        test_task = {
+            "task_name": "test1",
+            "command": f"python3 {TEST_CASE_PREFIX}/case3.py",
+            "timeout": 1,
+        }
+
+        cron = Cron(test_task)
+
+        res = asyncio.run(cron.arun())
+
+        self.assertFalse(res[0])
+        self.assertEqual(res[1], "time out")
+
+    def test_cron_run_output_files(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir, True)
+
+        test_task = {"task_name": "test1", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 1}
+
+        cron = Cron(test_task, output_dir=output_dir)
+
+        cron.run()
+        cron.retry()
+
+        self.assertEqual(
+            sorted(os.listdir(output_dir)),
+            ["test1.1.stderr", "test1.1.stdout", "test1.2.stderr", "test1.2.stdout"],
+        )
+
+        with open(os.path.join(output_dir, "test1.2.stdout")) as f:
+            self.assertEqual(f.read(), "Hello from case2\n")
+
+        with open(os.path.join(output_dir, "test1.2.stderr")) as f:
+            self.assertIn("RuntimeError: This is test error", f.read())
+
+    def test_cron_run_output_tail(self):
+        test_task = {"task_name": "test1", "command": "seq 1 200000"}
+
+        cron = Cron(test_task, tail_size=64)
+
+        res = cron.run()
+
+        self.assertTrue(res[0])
+        self.assertLessEqual(len(res[2]), 64)
+        self.assertTrue(res[2].endswith("199999200000"))
+
+    def test_cron_run_rusage(self):
+        test_task = {"task_name": "test1", "command": f"python3 {TEST_CASE_PREFIX}/case4.py"}
+
+        cron = Cron(test_task)
+
+        res = cron.run()
+
+        self.assertEqual(res, (True, None, "Hello from case4"))
+
+        attempt = cron.attempts[-1]
+
+        self.assertEqual(attempt["returncode"], 0)
+        self.assertGreater(attempt["rusage"]["max_rss_kb"], 64 * 1024)
+        self.assertGreater(attempt["rusage"]["user_time"] + attempt["rusage"]["system_time"], 0)
+
+    def test_cron_run_rusage_with_timeout(self):
+        test_task = {
+            "task_name": "test1",
+            "command": f"python3 {TEST_CASE_PREFIX}/case3.py",
+            "timeout": 1,
+        }
+
+        cron = Cron(test_task)
+
+        res = cron.run()
+
+        self.assertEqual(res, (False, "time out", None))
+        self.assertEqual(cron.attempts[-1]["returncode"], -signal.SIGTERM)
+        self.assertIsNotNone(cron.attempts[-1]["rusage"])
+
+    def test_cron_arun_rusage(self):
+        test_task = {"task_name": "test1", "command": f"python3 {TEST_CASE_PREFIX}/case4.py"}
+
+        # 不支援 pidfd 時在執行緒中等待子程序結束
+        for pidfd in (True, False):
+            with self.subTest(pidfd=pidfd):
+                cron = Cron(test_task)
+
+                if pidfd:
+                    res = asyncio.run(cron.arun())
+
+                else:
+                    with mock.patch("os.pidfd_open", side_effect=OSError, create=True):
+                        res = asyncio.run(cron.arun())
+
+                self.assertEqual(res, (True, None, "Hello from case4"))
+
+                attempt = cron.attempts[-1]
+
+                self.assertEqual(attempt["returncode"], 0)
+                self.assertGreater(attempt["rusage"]["max_rss_kb"], 64 * 1024)
+
+    def test_cron_arun_rusage_with_timeout(self):
+        test_task = {
+            "task_name": "test1",
+            "command": f"python3 {TEST_CASE_PREFIX}/case3.py",
+            "timeout": 1,
+        }
+
+        cron = Cron(test_task)
+
+        res = asyncio.run(cron.arun())
+
+        self.assertEqual(res, (False, "time out", None))
+        self.assertEqual(cron.attempts[-1]["returncode"], -signal.SIGTERM)
+        self.assertIsNotNone(cron.attempts[-1]["rusage"])
+
+    @staticmethod
+    def is_alive(pid: int) -> bool:
+        """程序是否還在執行 (已經結束但還沒被回收的程序視為已經結束)"""
+
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+
+        except FileNotFoundError:
+            return False
+
+    def run_group_case(self, *args, **config) -> tuple:
+        tmp_dir = tempfile.mkdtemp()
+        pid_file = os.path.join(tmp_dir, "pid")
+
+        try:
+            test_task = {"task_name": "test1", "command": f"python3 {TEST_CASE_PREFIX}/case6.py {pid_file} {' '.join(args)}"}
+            test_task.update(config)
+
+            cron = Cron(test_task)
+
+            res = cron.run()
+
+            with open(pid_file) as f:
+                child_pid = int(f.read())
+
+            return cron, res, child_pid
+
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @unittest.skipUnless(os.path.isdir("/proc"), "需要 /proc 檢查子程序")
+    def test_cron_run_timeout_kill_process_group(self):
+        cron, res, child_pid = self.run_group_case(timeout=1)
+
+        self.assertEqual(res, (False, "time out", None))
+        self.assertEqual(cron.attempts[-1]["returncode"], -signal.SIGTERM)
+        self.assertFalse(self.is_alive(child_pid))
+
+    @unittest.skipUnless(os.path.isdir("/proc"), "需要 /proc 檢查子程序")
+    def test_cron_run_timeout_escalate_to_sigkill(self):
+        start = time.monotonic()
+
+        cron, res, child_pid = self.run_group_case("ignore_term", timeout=1, kill_grace=0.5)
+
+        self.assertEqual(res, (False, "time out", None))
+        self.assertEqual(cron.attempts[-1]["returncode"], -signal.SIGKILL)
+        self.assertFalse(self.is_alive(child_pid))
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_cron_terminate(self):
+        test_task = {"task_name": "test1", "command": "sleep 30"}
+
+        cron = Cron(test_task)
+
+        timer = threading.Timer(0.5, cron.terminate)
+        timer.start()
+
+        start = time.monotonic()
+        res = cron.run()
+
+        self.assertEqual(res, (False, "cut off", None))
+        self.assertTrue(cron.cut_off)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_cron_arun_terminate(self):
+        test_task = {"task_name": "test1", "command": "sleep 30"}
+
+        cron = Cron(test_task)
+
+        async def main():
+            asyncio.get_running_loop().call_later(0.5, cron.terminate)
+
+            return await cron.arun()
+
+        self.assertEqual(asyncio.run(main()), (False, "cut off", None))
@@ -0,0 +1,197 @@
+"""
+Author: weijay
+Date: 2026-10-18 18:05:41
+LastEditors: weijay
+LastEditTime: 2026-10-18 18:05:41
+Description: daemon 模組 單元測試
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from booflow import Logger
+from booflow.daemon import Daemon, CronExpression
+
+
+class TestCronExpression(unittest.TestCase):
+    def test_next_after(self):
+        cases = [
+            ("*/15 * * * *", datetime(2026, 10, 18, 10, 7, 3), datetime(2026, 10, 18, 10, 15)),
+            ("0 9 * * mon-fri", datetime(2026, 10, 17, 10, 7), datetime(2026, 10, 19, 9, 0)),
+            ("0 0 29 feb *", datetime(2026, 3, 1), datetime(2028, 2, 29)),
+            ("@hourly", datetime(2026, 12, 31, 23, 30), datetime(2027, 1, 1)),
+            ("30 2 1,15 * *", datetime(2026, 10, 1, 2, 30), datetime(2026, 10, 15, 2, 30)),
+            # 日與星期都有限制時，符合其中一個就可以
+            ("0 0 13 * 5", datetime(2026, 10, 18), datetime(2026, 10, 23)),
+            # 0 與 7 都是星期日
+            ("0 0 * * 7", datetime(2026, 10, 18), datetime(2026, 10, 25)),
+            # 6 個欄位時第一個是秒
+            ("*/20 * * * * *", datetime(2026, 10, 18, 10, 0, 41), datetime(2026, 10, 18, 10, 1, 0)),
+        ]
+
+        for expr, dt, expected in cases:
+            with self.subTest(expr=expr):
+                self.assertEqual(CronExpression(expr).next_after(dt), expected)
+
+    def test_invalid(self):
+        for expr in ("* * * *", "60 * * * *", "* * * * 8", "*-5 * * * *", "5-1 * * * *", "*/0 * * * *", "x * * * *"):
+            with self.subTest(expr=expr):
+                with self.assertRaises(ValueError):
+                    CronExpression(expr)
+
+        with self.assertRaises(ValueError):
+            CronExpression("0 0 30 2 *").next_after(datetime(2026, 1, 1))
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = {
+            "log_file_path": os.path.join(self.tmp_dir, "test.log"),
+            "history_db": None,
+            "uptodate_cache": None,
+            "checkpoint_file": None,
+        }
+        self.results = []
+        self.daemon = Daemon(
+            log_file_path=os.path.join(self.tmp_dir, "daemon.log"),
+            on_finish=lambda name, result: self.results.append((name, result)),
+        )
+
+    def tearDown(self):
+        self.daemon.stop(cancel=True, timeout=10)
+
+        if self.daemon._logger is not None:
+            self.daemon._logger.close()
+
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def wait_until(condition, timeout: float = 10):
+        deadline = time.monotonic() + timeout
+
+        while not condition():
+            if time.monotonic() > deadline:
+                raise AssertionError("等待逾時")
+
+            time.sleep(0.02)
+
+    def start_logger(self):
+        """不啟動 `serve` ，直接測試 `_trigger` 與 `_fire` 時需要的 log 紀錄器"""
+
+        self.daemon._logger = Logger("booflow.daemon", self.daemon.log_file_path)
+
+    def test_add(self):
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": "true", "schedule": "*/5 * * * *"},
+        ]
+
+        self.assertEqual(self.daemon.add("wf", tasks, [("A", "B")], self.config, schedule="@daily"), ["wf", "wf:B"])
+
+        # 任務的排程只會執行這個任務
+        self.assertEqual(list(self.daemon._entries["wf:B"].booflow.task_obj._names), ["B"])
+
+        with self.assertRaises(ValueError):
+            self.daemon.add("wf", tasks, [("A", "B")], self.config, schedule="@daily")
+
+        with self.assertRaises(ValueError):
+            self.daemon.add("other", tasks, [("A", "B")], self.config, schedule="@daily", overlap="wait")
+
+    def test_serve(self):
+        tasks = [{"task_name": "A", "command": "true"}, {"task_name": "B", "command": "true"}]
+
+        self.daemon.add("wf", tasks, [("A", "B")], self.config, schedule="* * * * * *")
+
+        booflow = self.daemon._entries["wf"].booflow
+        task_obj = booflow.task_obj
+
+        thread = threading.Thread(target=self.daemon.serve, daemon=True)
+        thread.start()
+
+        self.wait_until(lambda: len(self.results) >= 2)
+
+        self.daemon.stop(timeout=10)
+        thread.join(timeout=10)
+
+        self.assertFalse(thread.is_alive())
+
+        # 每次執行都使用同一個任務依賴圖
+        self.assertIs(booflow.task_obj, task_obj)
+
+        for name, result in self.results:
+            self.assertEqual(name, "wf")
+            self.assertEqual(result["success_tasks"], {"A", "B"})
+
+        with open(self.daemon.log_file_path) as f:
+            text = f.read()
+
+        self.assertIn("常駐排程開始，排程: ['wf']", text)
+        self.assertIn("排程 wf 執行結束", text)
+
+    def test_overlap(self):
+        self.start_logger()
+
+        tasks = [{"task_name": "A", "command": "sleep 0.5"}, {"task_name": "B", "command": "true"}]
+
+        for overlap, runs in (("skip", 1), ("queue", 2), ("cancel", 2)):
+            with self.subTest(overlap=overlap):
+                self.results.clear()
+
+                self.daemon.add(overlap, tasks, [("A", "B")], self.config, schedule="@daily", overlap=overlap)
+                entry = self.daemon._entries[overlap]
+
+                with self.daemon._cond:
+                    self.daemon._trigger(entry)
+
+                self.wait_until(lambda: entry.booflow._wakeup is not None)
+
+                with self.daemon._cond:
+                    self.daemon._trigger(entry)
+
+                self.wait_until(lambda: entry.thread is None)
+
+                self.assertEqual(entry.runs, runs)
+                self.assertEqual([i[1]["cancelled"] for i in self.results], [overlap == "cancel", False][:runs])
+                self.assertEqual(self.results[-1][1]["success_tasks"], {"A", "B"})
+
+    def test_catchup(self):
+        self.start_logger()
+
+        tasks = [{"task_name": "A", "command": "true"}, {"task_name": "B", "command": "true"}]
+
+        triggered = []
+        self.daemon._trigger = triggered.append
+
+        for catchup, times in (("skip", 0), ("once", 1), ("all", self.daemon.max_catchup)):
+            with self.subTest(catchup=catchup):
+                triggered.clear()
+
+                self.daemon.add(catchup, tasks, [("A", "B")], self.config, schedule="* * * * *", catchup=catchup)
+                entry = self.daemon._entries[catchup]
+
+                # 主機休眠了一個小時
+                wall = time.time()
+                entry.next_run = wall - 3600
+
+                self.daemon._fire(entry, wall, time.monotonic())
+
+                self.assertEqual(len(triggered), times)
+                self.assertGreater(entry.next_run, wall)
+
+                # 準時醒來時只會執行一次
+                triggered.clear()
+                entry.next_run = wall - 1
+
+                self.daemon._fire(entry, wall, time.monotonic())
+
+                self.assertEqual(len(triggered), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,313 @@
+"""
+Author: weijay
+Date: 2026-10-18 18:20:37
+LastEditors: weijay
+LastEditTime: 2026-10-18 18:20:37
+Description: Distributed 模組 單元測試
+"""
+
+import os
+import json
+import asyncio
+import sys
+import time
+import shutil
+import signal
+import socket
+import tempfile
+import unittest
+import threading
+import subprocess
+
+from booflow.distributed import Coordinator
+
+TEST_CASE_PREFIX = "./tests/test_case"
+
+
+class TestDistributed(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = {
+            "log_file_path": os.path.join(self.tmp_dir, "test.log"),
+            "history_db": None,
+            "uptodate_cache": None,
+            "checkpoint_file": None,
+            "max_workers": 4,
+            "heartbeat_timeout": 1,
+        }
+        self.procs = []
+
+    def tearDown(self):
+        for proc in self.procs:
+            if proc.poll() is None:
+                proc.kill()
+
+            proc.wait()
+
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def start_worker(self, coordinator: Coordinator, worker_id: str, *args: str) -> subprocess.Popen:
+        """啟動一個本機的 worker 程序，並等待它連線到 coordinator"""
+
+        host, port = coordinator.start()
+
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "booflow.distributed", "--coordinator", f"{host}:{port}"]
+            + ["--worker-id", worker_id, "--heartbeat-interval", "0.2", *args]
+        )
+        self.procs.append(proc)
+
+        self.wait_until(lambda: worker_id in coordinator.workers)
+
+        return proc
+
+    @staticmethod
+    def wait_until(condition, timeout: float = 10):
+        deadline = time.monotonic() + timeout
+
+        while not condition():
+            if time.monotonic() > deadline:
+                raise AssertionError("等待逾時")
+
+            time.sleep(0.02)
+
+    @staticmethod
+    def run_in_thread(coordinator: Coordinator) -> tuple:
+        result = {}
+
+        thread = threading.Thread(target=lambda: result.update(coordinator.run()), daemon=True)
+        thread.start()
+
+        return thread, result
+
+    def test_run_with_labels(self):
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": "true", "labels": ["gpu"]},
+            {"task_name": "C", "command": f"python3 {TEST_CASE_PREFIX}/case2.py", "retry": 1, "retry_delay": 0},
+        ]
+
+        coordinator = Coordinator(tasks, [("A", "B"), ("A", "C")], self.config)
+
+        self.start_worker(coordinator, "cpu", "--slots", "2")
+        self.start_worker(coordinator, "gpu", "--labels", "gpu")
+
+        result = coordinator.run()
+
+        self.assertEqual(result["success_tasks"], {"A", "B"})
+        self.assertEqual(set(result["faile_tasks"]), {"C"})
+
+        self.assertEqual([i["worker"] for i in result["task_attempts"]["B"]], ["gpu"])
+        self.assertEqual([i["attempt"] for i in result["task_attempts"]["C"]], [1, 2])
+        self.assertEqual(result["task_attempts"]["C"][0]["failure_kind"], "program error")
+
+        # 結束後 worker 也會結束
+        for proc in self.procs:
+            self.assertEqual(proc.wait(timeout=10), 0)
+
+    def test_arun(self):
+        tasks = [{"task_name": "A", "command": "true"}, {"task_name": "B", "command": "true"}]
+
+        coordinator = Coordinator(tasks, [("A", "B")], self.config)
+
+        self.start_worker(coordinator, "w1")
+
+        result = asyncio.run(coordinator.arun())
+
+        self.assertEqual(result["success_tasks"], {"A", "B"})
+        self.assertEqual([i["worker"] for i in result["task_attempts"]["B"]], ["w1"])
+
+    def test_stalled_worker(self):
+        # A 的設定很大， coordinator 送給停止讀取訊息的 worker 時會阻塞
+        tasks = [
+            {"task_name": "A", "command": "true", "payload": "x" * (16 << 20)},
+            {"task_name": "B", "command": "true"},
+        ]
+
+        coordinator = Coordinator(tasks, [("A",), ("B",)], self.config)
+        host, port = coordinator.start()
+
+        stalled = socket.socket()
+        stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stalled.connect((host, port))
+        stalled.sendall(b'{"type": "hello", "worker_id": "stalled", "slots": 1}\n')
+
+        self.wait_until(lambda: "stalled" in coordinator.workers)
+
+        try:
+            thread, result = self.run_in_thread(coordinator)
+
+            # 送出訊息時沒有持有鎖，其他 worker 仍然可以連線並執行任務
+            self.start_worker(coordinator, "w1")
+
+            thread.join(timeout=30)
+
+        finally:
+            stalled.close()
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(result["success_tasks"], {"A", "B"})
+        self.assertEqual([i["worker"] for i in result["task_attempts"]["A"]], ["w1"])
+
+    def test_token(self):
+        self.config["coordinator_token"] = "secret"
+
+        coordinator = Coordinator([{"task_name": "A", "command": "true"}], [("A",)], self.config)
+        host, port = coordinator.start()
+
+        try:
+            for token in (None, "wrong", 1):
+                sock = socket.create_connection((host, port))
+                sock.sendall(json.dumps({"type": "hello", "worker_id": f"bad-{token}", "token": token}).encode() + b"\n")
+
+                # token 錯誤時 coordinator 會直接關閉連線
+                sock.settimeout(5)
+                self.assertEqual(sock.recv(1), b"")
+                sock.close()
+
+                self.assertEqual(coordinator.workers, {})
+
+        finally:
+            coordinator.stop()
+
+        # worker 可以從環境變數取得 token
+        coordinator = Coordinator([{"task_name": "A", "command": "true"}], [("A",)], self.config)
+
+        os.environ["BOOFLOW_TOKEN"] = "secret"
+
+        try:
+            self.start_worker(coordinator, "w1")
+
+        finally:
+            del os.environ["BOOFLOW_TOKEN"]
+
+        self.assertEqual(coordinator.run()["success_tasks"], {"A"})
+
+    def test_handshake_timeout(self):
+        self.config["handshake_timeout"] = 0.5
+
+        coordinator = Coordinator([{"task_name": "A", "command": "true"}], [("A",)], self.config)
+        host, port = coordinator.start()
+
+        try:
+            sock = socket.create_connection((host, port))
+
+            # 沒有送出 hello 的連線會被關閉
+            sock.settimeout(5)
+            self.assertEqual(sock.recv(1), b"")
+            sock.close()
+
+            self.assertEqual(coordinator.workers, {})
+
+        finally:
+            coordinator.stop()
+
+    def test_no_worker_for_labels(self):
+        self.config["worker_wait_timeout"] = 0.5
+
+        tasks = [
+            {"task_name": "A", "command": "true"},
+            {"task_name": "B", "command": "true", "labels": ["gpu"], "retry": 0},
+            {"task_name": "C", "command": "true"},
+        ]
+
+        coordinator = Coordinator(tasks, [("A", "B"), ("B", "C")], self.config)
+
+        self.start_worker(coordinator, "cpu")
+
+        result = coordinator.run()
+
+        # 沒有 worker 擁有 gpu label ， B 等待一段時間後失敗，不會一直等待
+        self.assertEqual(result["success_tasks"], {"A"})
+        self.assertEqual(result["faile_tasks"], {"B"})
+        self.assertEqual(result["not_execute_tasks"], {"C"})
+
+        with open(self.config["log_file_path"]) as f:
+            log = f.read()
+
+        self.assertIn("沒有連線中的 worker 擁有任務 B 需要的所有 label: ['gpu']", log)
+        self.assertIn("錯誤種類: no worker", log)
+
+    def test_run_map(self):
+        out_dir = os.path.join(self.tmp_dir, "out")
+        os.mkdir(out_dir)
+
+        tasks = [
+            {"task_name": "M", "command": f"touch {out_dir}/{{item}}", "map": {"range": [8]}, "max_in_flight": 2},
+            {"task_name": "B", "command": "true"},
+        ]
+
+        coordinator = Coordinator(tasks, [("M", "B")], self.config)
+
+        self.start_worker(coordinator, "first", "--slots", "2")
+
+        result = coordinator.run()
+
+        self.assertEqual(result["success_tasks"], {"M", "B"})
+        self.assertEqual(sorted(os.listdir(out_dir), key=int), [str(i) for i in range(8)])
+
+    def test_reschedule_on_worker_exit(self):
+        tasks = [{"task_name": "A", "command": "sleep 0.5"}, {"task_name": "B", "command": "true"}]
+
+        coordinator = Coordinator(tasks, [("A", "B")], self.config)
+
+        first = self.start_worker(coordinator, "first")
+
+        thread, result = self.run_in_thread(coordinator)
+
+        self.wait_until(lambda: any(coordinator._workers["first"].jobs.values()))
+
+        first.kill()
+        self.start_worker(coordinator, "second")
+
+        thread.join(timeout=30)
+
+        self.assertEqual(result["success_tasks"], {"A", "B"})
+        self.assertEqual([i["worker"] for i in result["task_attempts"]["A"]], ["second"])
+        self.assertEqual(result["task_attempts"]["A"][0]["attempt"], 1)
+
+    def test_reschedule_on_heartbeat_timeout(self):
+        tasks = [{"task_name": "A", "command": "sleep 0.5"}, {"task_name": "B", "command": "true"}]
+
+        coordinator = Coordinator(tasks, [("A", "B")], self.config)
+
+        stuck = self.start_worker(coordinator, "stuck")
+
+        thread, result = self.run_in_thread(coordinator)
+
+        self.wait_until(lambda: any(coordinator._workers["stuck"].jobs.values()))
+
+        # 暫停 worker ，連線還在但不會再送出 heartbeat
+        os.kill(stuck.pid, signal.SIGSTOP)
+        self.start_worker(coordinator, "alive")
+
+        thread.join(timeout=30)
+
+        os.kill(stuck.pid, signal.SIGCONT)
+
+        self.assertEqual(result["success_tasks"], {"A", "B"})
+        self.assertEqual([i["worker"] for i in result["task_attempts"]["A"]], ["alive"])
+
+        with open(self.config["log_file_path"]) as f:
+            self.assertIn("worker stuck 已斷線，重新排程任務: ['A']", f.read())
+
+    def test_deadline_cancels_remote_task(self):
+        tasks = [{"task_name": "A", "command": "sleep 30"}, {"task_name": "B", "command": "true"}]
+
+        self.config["deadline"] = 0.5
+
+        coordinator = Coordinator(tasks, [("A", "B")], self.config)
+
+        self.start_worker(coordinator, "worker")
+
+        start = time.monotonic()
+        result = coordinator.run()
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(result["cut_off_tasks"], {"A"})
+        self.assertEqual(result["not_execute_tasks"], {"B"})
+        self.assertEqual(result["task_attempts"]["A"][0]["failure_kind"], "cut off")
+
+
+if __name__ == "__main__":
+    unittest.main()
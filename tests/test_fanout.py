@@ -0,0 +1,152 @@
+"""
+Author: weijay
+Date: 2026-10-18 16:40:25
+LastEditors: weijay
+LastEditTime: 2026-10-18 16:40:25
+Description: fanout 模組 單元測試
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from booflow.fanout import MapState, iter_params, validate_map
+
+
+class TestFanout(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_iter_params(self):
+        self.assertEqual(list(iter_params({"list": ["a", 1]})), ["a", "1"])
+        self.assertEqual(list(iter_params({"range": [0, 6, 2]})), ["0", "2", "4"])
+
+        for name in ("b.csv", "a.csv", "c.txt"):
+            open(os.path.join(self.tmp_dir, name), "w").close()
+
+        paths = iter_params({"glob": os.path.join(self.tmp_dir, "*.csv")})
+        self.assertEqual(sorted(os.path.basename(i) for i in paths), ["a.csv", "b.csv"])
+
+        lines = os.path.join(self.tmp_dir, "lines.txt")
+
+        with open(lines, "w") as f:
+            f.write("x\n\n  y  \n")
+
+        self.assertEqual(list(iter_params({"lines": lines})), ["x", "y"])
+
+    def test_validate_map(self):
+        validate_map({"task_name": "A", "map": {"range": [3]}, "max_in_flight": 2})
+
+        for config in (
+            {"task_name": "A", "map": {}},
+            {"task_name": "A", "map": ["a"]},
+            {"task_name": "A", "map": {"range": [3], "list": []}},
+            {"task_name": "A", "map": {"files": "*"}},
+            {"task_name": "A", "map": {"range": [3]}, "max_in_flight": 0},
+        ):
+            with self.assertRaises(ValueError):
+                validate_map(config)
+
+    def test_expand(self):
+        config = {
+            "task_name": "A",
+            "command": "echo {item} {index}",
+            "outputs": ["out/{item}.txt"],
+            "retry": 0,
+            "map": {"list": ["x", "y", "z"]},
+            "max_in_flight": 2,
+        }
+
+        state = MapState(config, max_in_flight=8)
+
+        self.assertEqual(state.max_in_flight, 2)
+
+        first, item = state.expand()
+
+        self.assertEqual(item, "x")
+        self.assertEqual(
+            first, {"task_name": "A[0]", "command": "echo x 0", "outputs": ["out/x.txt"], "retry": 0}
+        )
+
+        state.expand()
+
+        # 同時存在的實例數量達到上限後，不會再讀取參數
+        self.assertFalse(state.can_expand)
+
+        state.instance_done("A[0]", "x", True)
+        self.assertTrue(state.can_expand)
+
+        self.assertEqual(state.expand()[0]["command"], "echo z 2")
+        self.assertIsNone(state.expand())
+        self.assertTrue(state.exhausted)
+        self.assertFalse(state.finished)
+
+        state.instance_done("A[1]", "y", False)
+        state.instance_done("A[2]", "z", True)
+
+        self.assertTrue(state.finished)
+        self.assertEqual(state.finished_names, ["A[0]", "A[1]", "A[2]"])
+        self.assertEqual(state.result(), (False, "map error", "1 個實例失敗: A[1]=y"))
+
+    def test_result(self):
+        state = MapState({"task_name": "A", "command": "true", "map": {"range": [2]}}, max_in_flight=4)
+
+        self.assertEqual(state.max_in_flight, 4)
+
+        while state.expand() is not None:
+            pass
+
+        state.instance_done("A[0]", "0", True)
+        state.instance_done("A[1]", "1", True)
+
+        self.assertEqual(state.result(), (True, None, "2 個實例執行完成"))
+
+        # 被中斷時還沒有讀取完參數
+        state = MapState({"task_name": "A", "command": "true", "map": {"range": [2]}}, max_in_flight=4)
+        state.expand()
+        state.stopped = True
+        state.instance_done("A[0]", "0", False)
+
+        self.assertTrue(state.finished)
+        self.assertEqual(state.result(), (False, "cut off", None))
+
+    def test_source_error(self):
+        # 檔案在第一次讀取參數時才會開啟
+        state = MapState({"task_name": "A", "command": "true", "map": {"lines": "/nonexistent"}}, max_in_flight=1)
+
+        self.assertIsNone(state.error)
+        self.assertIsNone(state.expand())
+        self.assertTrue(state.finished)
+        self.assertTrue(state.error.startswith("FileNotFoundError"))
+
+        status, reason, message = state.result()
+
+        self.assertEqual((status, reason), (False, "map error"))
+        self.assertIn("無法讀取參數來源", message)
+
+        # range 的參數錯誤在建立時就會發生
+        state = MapState({"task_name": "A", "command": "true", "map": {"range": ["a"]}}, max_in_flight=1)
+
+        self.assertTrue(state.error.startswith("TypeError"))
+        self.assertIsNone(state.expand())
+        self.assertFalse(state.result()[0])
+
+    def test_close(self):
+        lines = os.path.join(self.tmp_dir, "lines.txt")
+
+        with open(lines, "w") as f:
+            f.write("a\nb\n")
+
+        state = MapState({"task_name": "A", "command": "true", "map": {"lines": lines}}, max_in_flight=1)
+        state.expand()
+        state.close()
+
+        self.assertIsNone(state.expand())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Author: weijay
+Date: 2026-10-18 10:41:27
+LastEditors: weijay
+LastEditTime: 2026-10-18 10:41:27
+Description: History 模組 單元測試
+"""
+
+import os
+import sqlite3
+import shutil
+import tempfile
+import unittest
+
+from booflow.history import History
+
+
+def make_attempt(attempt: int, start_time: float, duration: float, failure_kind: str = None) -> dict:
+    return {
+        "attempt": attempt,
+        "start_time": start_time,
+        "end_time": start_time + duration,
+        "duration": duration,
+        "returncode": 0 if failure_kind is None else 1,
+        "failure_kind": failure_kind,
+        "output_size": 10,
+        "rusage": {"user_time": 0.5, "system_time": 0.1, "max_rss_kb": 1024},
+    }
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.history = History(os.path.join(self.tmp_dir, "history.db"), batch_size=3)
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def count(self) -> int:
+        return self.history._conn.execute("SELECT COUNT(*) FROM task_attempts").fetchone()[0]
+
+    def test_record_batch(self):
+        self.history.start_run("run1", 0)
+
+        self.history.record("run1", "A", [make_attempt(1, 0, 1)])
+        self.history.record("run1", "B", [make_attempt(1, 0, 1)])
+
+        self.assertEqual(self.count(), 0)
+
+        self.history.record("run1", "C", [make_attempt(1, 0, 1)])
+
+        self.assertEqual(self.count(), 3)
+
+        self.history.record("run1", "D", [make_attempt(1, 0, 1)])
+        self.history.finish_run("run1", 10, 4, 0)
+
+        self.assertEqual(self.count(), 4)
+        self.assertEqual(
+            self.history._conn.execute("SELECT ended_at, success_count FROM runs").fetchone(), (10, 4)
+        )
+
+    def test_duration_percentiles(self):
+        for i in range(1, 101):
+            self.history.record(f"run{i}", "A", [make_attempt(1, i, float(i))])
+
+        self.history.record("run0", "A", [make_attempt(1, 0, 1000, "time out")])
+
+        result = self.history.duration_percentiles()
+
+        self.assertEqual(result["A"]["count"], 100)
+        self.assertAlmostEqual(result["A"]["p50"], 50.5)
+        self.assertAlmostEqual(result["A"]["p95"], 95.05)
+
+        self.assertEqual(self.history.duration_percentiles(task_name="B"), {})
+        self.assertEqual(self.history.duration_percentiles(since=91)["A"]["count"], 10)
+
+    def test_task_durations(self):
+        for i, duration in enumerate([1, 2, 3, 100]):
+            self.history.record(f"run{i}", "A", [make_attempt(1, i, duration)])
+
+        self.assertEqual(self.history.task_durations(), {"A": 2.5})
+        self.assertEqual(self.history.task_durations(window=1), {"A": 100})
+
+    def test_regressions(self):
+        for i in range(10):
+            self.history.record(f"run{i}", "A", [make_attempt(1, i, 1)])
+            self.history.record(f"run{i}", "B", [make_attempt(1, i, 1)])
+
+        self.history.record("run10", "A", [make_attempt(1, 10, 3.5)])
+        self.history.record("run10", "B", [make_attempt(1, 10, 1.1)])
+        self.history.flush()
+
+        result = self.history.regressions(threshold=3)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]["task_name"], "A")
+        self.assertEqual(result[0]["run_id"], "run10")
+        self.assertAlmostEqual(result[0]["ratio"], 3.5)
+
+    def test_record_rusage(self):
+        self.history.record("run1", "A", [make_attempt(1, 0, 1)])
+        self.history.flush()
+
+        self.assertEqual(
+            self.history._conn.execute("SELECT user_time, system_time, max_rss_kb FROM task_attempts").fetchone(),
+            (0.5, 0.1, 1024),
+        )
+
+    def test_migrate(self):
+        db_path = os.path.join(self.tmp_dir, "old.db")
+
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            """
+            CREATE TABLE task_attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL, task_name TEXT NOT NULL,
+                attempt INTEGER NOT NULL, start_time REAL NOT NULL, end_time REAL NOT NULL, duration REAL NOT NULL,
+                exit_status INTEGER, failure_kind TEXT, output_size INTEGER
+            )
+            """
+        )
+        conn.close()
+
+        history = History(db_path)
+        history.record("run1", "A", [make_attempt(1, 0, 1)])
+        history.close()
+
+        conn = sqlite3.connect(db_path)
+        self.assertEqual(conn.execute("SELECT max_rss_kb FROM task_attempts").fetchone(), (1024,))
+        conn.close()
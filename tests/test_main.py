@@ -0,0 +1,83 @@
+"""
+Author: weijay
+Date: 2026-10-18 19:40:26
+LastEditors: weijay
+LastEditTime: 2026-10-18 19:40:26
+Description: 命令列執行 單元測試
+"""
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+from booflow.__main__ import main
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.workflow_file = os.path.join(self.tmp_dir, "workflow.json")
+
+        self.workflow = {
+            "tasks": [{"task_name": i, "command": "true"} for i in "ABCD"],
+            "order": [["A", "B"], ["B", "C"], ["A", "D"]],
+            "config": {
+                "log_file_path": os.path.join(self.tmp_dir, "test.log"),
+                "history_db": None,
+                "uptodate_cache": None,
+                "checkpoint_file": None,
+            },
+        }
+
+        self.write_workflow()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_workflow(self):
+        with open(self.workflow_file, "w") as f:
+            json.dump(self.workflow, f)
+
+    def run_main(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            code = main([self.workflow_file, *argv])
+
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_run(self):
+        code, stdout, _ = self.run_main("--targets", "C")
+
+        self.assertEqual(code, 0)
+        self.assertIn("執行成功的任務: ['A', 'B', 'C']", stdout)
+
+    def test_run_failed(self):
+        self.workflow["tasks"][1]["command"] = "ls ./not_exist_dir"
+        self.write_workflow()
+
+        code, stdout, _ = self.run_main("--max-workers", "2")
+
+        self.assertEqual(code, 1)
+        self.assertIn("執行失敗的任務: ['B']", stdout)
+        self.assertIn("沒有執行的任務: ['C']", stdout)
+
+    def test_list(self):
+        code, stdout, _ = self.run_main("--start-from", "A", "--exclude", "B", "--list")
+
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout.split(), ["A", "D"])
+
+    def test_invalid(self):
+        code, _, stderr = self.run_main("--targets", "X")
+
+        self.assertEqual(code, 2)
+        self.assertIn("targets 中有不在流程中的任務: ['X']", stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Author: weijay
+Date: 2026-10-18 16:32:05
+LastEditors: weijay
+LastEditTime: 2026-10-18 16:32:05
+Description: Metrics 模組 單元測試
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import threading
+import urllib.request
+
+from booflow.metrics import Registry, Counter, Gauge, Histogram, CONTENT_TYPE
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter(self):
+        counter = self.registry.register(Counter("jobs", "help"))
+        counter.inc()
+        counter.inc(2)
+
+        self.assertIn("# TYPE jobs counter\n# HELP jobs help\njobs_total 3", self.registry.expose())
+
+    def test_gauge_with_labels(self):
+        gauge = self.registry.register(Gauge("queue", "help", labelnames=("name",)))
+        gauge.labels('a"b').set(1.5)
+
+        self.assertIn('queue{name="a\\"b"} 1.5', self.registry.expose())
+
+        with self.assertRaises(ValueError):
+            gauge.labels("a", "b")
+
+    def test_histogram(self):
+        histogram = self.registry.register(Histogram("latency", "help", labelnames=("task",), buckets=(1, 5)))
+
+        for value in (0.5, 1, 3, 10):
+            histogram.labels("A").observe(value)
+
+        text = self.registry.expose()
+
+        self.assertIn('latency_bucket{task="A",le="1.0"} 2', text)
+        self.assertIn('latency_bucket{task="A",le="5.0"} 3', text)
+        self.assertIn('latency_bucket{task="A",le="+Inf"} 4', text)
+        self.assertIn('latency_sum{task="A"} 14.5', text)
+        self.assertIn('latency_count{task="A"} 4', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+    def test_expose_while_adding_labels(self):
+        counter = self.registry.register(Counter("jobs", "help", ["task"]))
+        errors = []
+
+        def expose():
+            try:
+                for _ in range(200):
+                    self.registry.expose()
+
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=expose)
+        thread.start()
+
+        # 輸出的同時新增子指標
+        for i in range(5000):
+            counter.labels(str(i)).inc()
+
+        thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(counter._items()), 5000)
+
+    def test_duplicate_name(self):
+        self.registry.register(Counter("jobs", "help"))
+
+        with self.assertRaises(ValueError):
+            self.registry.register(Gauge("jobs", "help"))
+
+    def test_write_textfile(self):
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            self.registry.register(Counter("jobs", "help")).inc()
+
+            path = os.path.join(tmp_dir, "booflow.prom")
+            self.registry.write_textfile(path)
+
+            with open(path) as f:
+                self.assertEqual(f.read(), self.registry.expose())
+
+            self.assertEqual(os.listdir(tmp_dir), ["booflow.prom"])
+
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_serve(self):
+        self.registry.register(Counter("jobs", "help")).inc()
+
+        server = self.registry.serve(0)
+
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as resp:
+                self.assertEqual(resp.headers["Content-Type"], CONTENT_TYPE)
+                self.assertIn("jobs_total 1", resp.read().decode("utf8"))
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Author: weijay
+Date: 2026-10-18 17:41:12
+LastEditors: weijay
+LastEditTime: 2026-10-18 17:41:12
+Description: Planner 模組 單元測試
+"""
+
+import unittest
+
+from booflow import Task
+from booflow.planner import simulate, critical_path, fill_durations
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        # A -> B -> D ， A -> C -> D ， E 獨立
+        self.order = [("A", "B"), ("A", "C"), ("B", "D"), ("C", "D"), ("E", "F")]
+        self.durations = {"A": 1, "B": 4, "C": 2, "D": 1, "E": 3, "F": 1}
+
+    def test_fill_durations(self):
+        filled, estimated = fill_durations(["A", "B", "C"], {"A": 1, "B": 3})
+
+        self.assertEqual(filled, {"A": 1, "B": 3, "C": 2})
+        self.assertEqual(estimated, ["C"])
+
+        filled, estimated = fill_durations(["A"], {})
+
+        self.assertEqual(filled, {"A": 1.0})
+
+    def test_critical_path(self):
+        path, length = critical_path(Task(self.order), self.durations)
+
+        self.assertEqual(path, ["A", "B", "D"])
+        self.assertEqual(length, 6)
+
+    def test_simulate(self):
+        result = simulate(Task(self.order), self.durations, 1)
+
+        self.assertEqual(result["makespan"], 12)
+        self.assertEqual(result["busy_time"], 12)
+        self.assertEqual(result["peak_running"], 1)
+
+        result = simulate(Task(self.order), self.durations, 2)
+
+        # A, E -> B, C(E 結束後) -> F -> D
+        self.assertEqual(result["makespan"], 6)
+        self.assertEqual(dict((i[0], i[1:]) for i in result["schedule"])["D"], (5, 6))
+
+    def test_simulate_peak_running(self):
+        # B 、 C 同時結束，D 、 E 開始時不會與 B 、 C 重複計算
+        order = [("A", "B"), ("A", "C"), ("B", "D"), ("C", "E")]
+
+        result = simulate(Task(order), {i: 1 for i in "ABCDE"}, 10)
+
+        self.assertEqual(result["makespan"], 3)
+        self.assertEqual(result["peak_running"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
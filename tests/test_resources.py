@@ -0,0 +1,83 @@
+"""
+Author: weijay
+Date: 2026-10-18 14:05:37
+LastEditors: weijay
+LastEditTime: 2026-10-18 14:05:37
+Description: Resources 模組 單元測試
+"""
+
+import unittest
+
+from booflow import Cron
+from booflow.resources import Resources
+
+
+class TestResources(unittest.TestCase):
+    @staticmethod
+    def cron(**config) -> Cron:
+        return Cron({"task_name": "task", "command": "true", **config})
+
+    def test_default_capacity(self):
+        resources = Resources()
+
+        self.assertGreaterEqual(resources.cpus, 1)
+
+    def test_invalid_pool(self):
+        with self.assertRaises(ValueError):
+            Resources(pools={"db": 0})
+
+    def test_fits(self):
+        resources = Resources(cpus=4, memory=1024)
+
+        big = self.cron(cpus=3, memory=512)
+        small = self.cron(cpus=2)
+
+        self.assertTrue(resources.fits(big))
+
+        resources.acquire(big)
+
+        self.assertFalse(resources.fits(small))
+        self.assertFalse(resources.fits(self.cron(memory=600)))
+
+        # 沒有宣告資源的任務不受限制
+        self.assertTrue(resources.fits(self.cron()))
+
+        resources.release(big)
+
+        self.assertTrue(resources.fits(small))
+        self.assertEqual((resources.used_cpus, resources.used_memory), (0, 0))
+
+    def test_fits_with_reserved(self):
+        resources = Resources(cpus=4, memory=1024)
+        resources.acquire(self.cron(cpus=2))
+
+        self.assertTrue(resources.fits(self.cron(cpus=2)))
+        self.assertFalse(resources.fits(self.cron(cpus=2), reserved=(4, 0)))
+        self.assertTrue(resources.fits(self.cron(), reserved=(4, 0)))
+
+    def test_oversized(self):
+        resources = Resources(cpus=4, memory=1024)
+        huge = self.cron(cpus=16, memory=4096)
+
+        self.assertTrue(resources.is_oversized(huge))
+        self.assertEqual(resources.demand(huge), (4, 1024))
+        self.assertTrue(resources.fits(huge))
+
+    def test_pool(self):
+        resources = Resources(cpus=4, pools={"db": 1})
+        db = self.cron(pool="db")
+
+        self.assertTrue(resources.pool_available(db))
+
+        resources.acquire(db)
+
+        self.assertFalse(resources.pool_available(db))
+        self.assertTrue(resources.pool_available(self.cron(pool="other")))
+
+        resources.release(db)
+
+        self.assertTrue(resources.pool_available(db))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,69 +13,57 @@ from booflow import Task
 
 
 class TestTask(unittest.TestCase):
+    @staticmethod
+    def to_dict(names, offsets, edges) -> dict:
+        """將 CSR 格式的有向圖轉換成 {"task_name" : [下游任務名稱]}"""
+
+        return {names[i]: [names[e] for e in edges[offsets[i]:offsets[i + 1]]] for i in range(len(names))}
+
     def test_tasks_order_to_graph(self):
         test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D")]
 
-        task_obj = Task([])
+        names, ids, offsets, edges, indegree = Task._tasks_order_to_graph(test_tasks_order)
 
-        graph, indegree, reverse_depne_graph = task_obj._tasks_order_to_graph(test_tasks_order)
+        self.assertEqual(names, ["A", "B", "C", "D"])
+        self.assertEqual(ids, {"A": 0, "B": 1, "C": 2, "D": 3})
 
-        test_graph = defaultdict(set)
-        test_graph["A"].add("B")
-        test_graph["A"].add("C")
-        test_graph["B"].add("D")
+        self.assertEqual(self.to_dict(names, offsets, edges), {"A": ["B", "C"], "B": ["D"], "C": [], "D": []})
+        self.assertEqual(list(indegree), [0, 1, 1, 1])
 
-        test_indegree = defaultdict(int)
-        test_indegree["A"] = 0
-        test_indegree["B"] = 1
-        test_indegree["C"] = 1
-        test_indegree["D"] = 1
+    def test_reverse_graph(self):
+        task_obj = Task([("A", "B"), ("A", "C"), ("B", "D"), ("C", "D")])
 
-        test_rever_depen_graph = defaultdict(set)
-        test_rever_depen_graph["B"].add("A")
-        test_rever_depen_graph["C"].add("A")
-        test_rever_depen_graph["D"].add("B")
+        reverse_offsets, reverse_edges = task_obj._reverse_graph()
 
-        self.assertEqual(graph, test_graph)
-        self.assertEqual(indegree, test_indegree)
-        self.assertEqual(reverse_depne_graph, test_rever_depen_graph)
+        self.assertEqual(
+            self.to_dict(task_obj._names, reverse_offsets, reverse_edges),
+            {"A": [], "B": ["A"], "C": ["A"], "D": ["B", "C"]},
+        )
 
     def test_gen_tasks_queue(self):
-        task_obj = Task([])
-
-        test_graph = defaultdict(set)
-        test_graph["A"].add("B")
-        test_graph["A"].add("C")
-        test_graph["B"].add("D")
+        names, _, offsets, edges, indegree = Task._tasks_order_to_graph([("A", "B"), ("A", "C"), ("B", "D")])
 
-        test_indegree = defaultdict(int)
-        test_indegree["A"] = 0
-        test_indegree["B"] = 1
-        test_indegree["C"] = 1
-        test_indegree["D"] = 1
-
-        task_queue = task_obj._gen_tasks_queue(test_graph, test_indegree)
+        task_queue = Task._gen_tasks_queue(offsets, edges, indegree)
 
         test_task_queue_list = []
         test_task_queue_list.append(["A", "B", "C", "D"])
         test_task_queue_list.append(["A", "C", "B", "D"])
 
-        self.assertIn(list(task_queue), test_task_queue_list)
+        self.assertIn([names[i] for i in task_queue], test_task_queue_list)
+
+    def test_tasks_order_to_graph_with_duplicate_order(self):
+        names, _, offsets, edges, indegree = Task._tasks_order_to_graph([("A", "B"), ("C", "B"), ("A", "B"), ("A", "C")])
+
+        self.assertEqual(self.to_dict(names, offsets, edges), {"A": ["B", "C"], "B": [], "C": ["B"]})
+        self.assertEqual(list(indegree), [0, 2, 1])
 
     def test_remove_faile_task(self):
         test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D")]
 
         task_obj = Task(test_tasks_order)
 
-        test_graph = defaultdict(set)
-        test_graph["A"].add("B")
-        test_graph["A"].add("C")
-        test_graph["B"].add("D")
-        test_graph["C"]
-        test_graph["D"]
-
         self.assertTrue(len(task_obj.faile_tasks) == 0)
-        self.assertEqual(task_obj._graph, test_graph)
+        self.assertFalse(task_obj.is_empty)
 
         task_obj.remove_faile_task("A")
 
@@ -85,27 +73,116 @@ class TestTask(unittest.TestCase):
         test_faile_tasks["A"].add("D")
 
         self.assertEqual(task_obj.faile_tasks, test_faile_tasks)
+        self.assertTrue(task_obj.is_empty)
+
+    def test_remove_faile_task_with_shared_descendant(self):
+        test_tasks_order = [("A", "C"), ("B", "C"), ("C", "D")]
+
+        task_obj = Task(test_tasks_order)
+
+        self.assertEqual(task_obj.next, "A")
+        self.assertEqual(task_obj.next, "B")
+
+        task_obj.report("A", False)
+
+        self.assertEqual(task_obj.faile_tasks["A"], {"C", "D"})
+
+        # C 已經因為 A 失敗而取消，B 成功後也不能執行
+        task_obj.report("B", True)
+
+        self.assertIsNone(task_obj.next)
+        self.assertTrue(task_obj.is_empty)
+
+    def test_remove_faile_task_with_deep_chain(self):
+        test_tasks_order = [(f"t{i}", f"t{i + 1}") for i in range(10000)]
+
+        task_obj = Task(test_tasks_order)
+
+        self.assertEqual(task_obj.next, "t0")
+
+        task_obj.report("t0", False)
+
+        self.assertEqual(len(task_obj.faile_tasks["t0"]), 10000)
+        self.assertTrue(task_obj.is_empty)
+
+    def test_edges(self):
+        task_obj = Task([("A", "B"), ("A", "C"), ("B", "D"), ("A", "B")])
+
+        self.assertEqual(list(task_obj.edges()), [("A", "B"), ("A", "C"), ("B", "D")])
+
+    def test_graph_accessors(self):
+        task_obj = Task([("A", "B"), ("A", "C"), ("B", "D"), ("C", "D"), ("E",)])
+
+        self.assertEqual(task_obj.task_names, ["A", "B", "C", "D", "E"])
+        self.assertEqual(task_obj.topological_order(), ["A", "E", "B", "C", "D"])
+        self.assertEqual(task_obj.successors("A"), ["B", "C"])
+        self.assertEqual(task_obj.successors("D"), [])
+        self.assertEqual(task_obj.predecessors("D"), ["B", "C"])
+        self.assertEqual(task_obj.predecessors("E"), [])
+
+        # 與目前的執行狀態無關
+        task_obj.report(task_obj.next, False)
+
+        self.assertEqual(task_obj.topological_order(), ["A", "E", "B", "C", "D"])
+
+    def test_standalone_task(self):
+        task_obj = Task([("A", "B"), ("C",), ("B",)])
+
+        self.assertEqual(task_obj._names, ["A", "B", "C"])
+        self.assertEqual(list(task_obj.edges()), [("A", "B")])
+        self.assertEqual({task_obj.next, task_obj.next}, {"A", "C"})
+
+    def test_reset(self):
+        for policy in (Task.FIFO, Task.CRITICAL_PATH):
+            task_obj = Task([("A", "B"), ("A", "C"), ("C", "D")], policy=policy)
+
+            task_obj.report(task_obj.next, True)
+            task_obj.report(task_obj.next, False)
+
+            task_obj.reset()
+
+            self.assertEqual(task_obj.success_tasks, set())
+            self.assertEqual(task_obj.faile_tasks, {})
+            self.assertEqual(task_obj.ready_count, 1)
+
+            order = []
 
-        test_graph = defaultdict(set)
-        test_graph["C"]
-        test_graph["D"]
+            while not task_obj.is_empty:
+                task_name = task_obj.next
+                order.append(task_name)
+                task_obj.report(task_name, True)
 
-        self.assertEqual(task_obj._graph, test_graph)
+            self.assertEqual(sorted(order), ["A", "B", "C", "D"])
+
+    def test_impact(self):
+        test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D"), ("C", "D"), ("E", "D")]
+
+        for impact_index in (False, True):
+            task_obj = Task(test_tasks_order, impact_index=impact_index)
+
+            self.assertEqual(task_obj.impact("A"), {"B", "C", "D"})
+            self.assertEqual(task_obj.impact_count("A"), 3)
+            self.assertEqual(task_obj.impact_count("D"), 0)
+            self.assertEqual(task_obj.impact_report(top=2), [("A", 3), ("B", 1)])
+
+            # D 已經因為 E 失敗而取消，A 失敗時只會再取消 B 、 C
+            task_obj.report("E", False)
+
+            self.assertEqual(task_obj.impact("A"), {"B", "C"})
 
     def test_remove_success_task(self):
         test_task_order = [("A", "B"), ("A", "C"), ("B", "D")]
 
         task_obj = Task(test_task_order)
 
-        test_graph = defaultdict(set)
-        test_graph["A"].add("B")
-        test_graph["A"].add("C")
-        test_graph["B"].add("D")
-        test_graph["C"]
-        test_graph["D"]
+        def indegree(task_name):
+            return task_obj._indegree[task_obj._ids[task_name]]
 
-        self.assertTrue(len(task_obj.faile_tasks) == 0)
-        self.assertEqual(task_obj._graph, test_graph)
+        def ready_queue():
+            return [task_obj._names[i] for i in task_obj._ready_queue]
+
+        self.assertEqual(indegree("B"), 1)
+        self.assertEqual(ready_queue(), ["A"])
 
         task_obj.remove_success_task("A")
 
@@ -114,32 +191,10 @@ class TestTask(unittest.TestCase):
 
         self.assertEqual(test_success_tasks, task_obj.success_tasks)
 
-        test_graph = defaultdict(set)
-        test_graph["B"].add("D")
-        test_graph["D"]
-        test_graph["C"]
-
-        test_indepndent_tasks = deque()
-        test_indepndent_tasks.append("C")
-
-        self.assertEqual(task_obj._graph, test_graph)
-        self.assertEqual(task_obj._independent_tasks_queue, test_indepndent_tasks)
-
-    def test_graph_to_tasks_order(self):
-        task_obj = Task([])
-
-        test_graph = defaultdict(set)
-        test_graph["A"].add("B")
-        test_graph["A"].add("C")
-        test_graph["B"].add("D")
-        test_graph["C"]
-        test_graph["D"]
-
-        test_tasks_order_queue_list = []
-        test_tasks_order_queue_list.append([("A", "B"), ("A", "C"), ("B", "D")])
-        test_tasks_order_queue_list.append([("A", "C"), ("A", "B"), ("B", "D")])
-
-        self.assertIn(task_obj._graph_to_tasks_order(test_graph), test_tasks_order_queue_list)
+        self.assertEqual(indegree("B"), 0)
+        self.assertEqual(indegree("C"), 0)
+        self.assertEqual(indegree("D"), 1)
+        self.assertEqual(ready_queue(), ["A", "B", "C"])
 
     def test_update_tasks_order_queue(self):
         test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D")]
@@ -156,7 +211,7 @@ class TestTask(unittest.TestCase):
 
         task_obj.update_tasks_order_queue()
 
-        self.assertEqual(task_obj.tasks_order_queue, deque(["B", "D"]))
+        self.assertEqual(task_obj.tasks_order_queue, deque(["B", "C", "D"]))
 
     def test_is_task_can_be_execute(self):
         test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D")]
@@ -238,3 +293,57 @@ class TestTask(unittest.TestCase):
         task_obj.update_tasks_order_queue()
 
         self.assertTrue(task_obj.is_empty)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            Task([], policy="unknow")
+
+    def test_upward_rank(self):
+        test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D")]
+        durations = {"A": 1, "B": 2, "C": 10, "D": 3}
+
+        task_obj = Task(test_tasks_order, policy="critical_path", durations=durations)
+
+        self.assertEqual(task_obj.rank, {"A": 11, "B": 5, "C": 10, "D": 3})
+
+    def test_next_with_critical_path(self):
+        test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D"), ("E", "F")]
+        durations = {"A": 1, "B": 2, "C": 10, "D": 3, "E": 1, "F": 1}
+
+        task_obj = Task(test_tasks_order, policy="critical_path", durations=durations)
+
+        self.assertEqual(task_obj.next, "A")
+        self.assertEqual(task_obj.next, "E")
+
+        task_obj.report("A", True)
+        task_obj.report("E", True)
+
+        # C 到結束的路徑最長，所以先執行
+        self.assertEqual(task_obj.next, "C")
+        self.assertEqual(task_obj.next, "B")
+        self.assertEqual(task_obj.next, "F")
+        self.assertIsNone(task_obj.next)
+
+    def test_upward_rank_with_unknow_duration(self):
+        test_tasks_order = [("A", "B"), ("A", "C")]
+
+        task_obj = Task(test_tasks_order, policy="critical_path", durations={"A": 2, "B": 4})
+
+        # C 沒有資料，使用已知任務的平均執行時間
+        self.assertEqual(task_obj.rank["C"], 3)
+        self.assertEqual(task_obj.rank["A"], 6)
+
+    def test_restore(self):
+        test_tasks_order = [("A", "B"), ("A", "C"), ("B", "D")]
+
+        task_obj = Task(test_tasks_order)
+
+        # D 的依賴任務 B 沒有成功，不會被還原
+        restored = task_obj.restore(["D", "A"])
+
+        self.assertEqual(restored, {"A"})
+        self.assertEqual(task_obj.success_tasks, {"A"})
+
+        self.assertEqual(task_obj.next, "B")
+        self.assertEqual(task_obj.next, "C")
+        self.assertIsNone(task_obj.next)
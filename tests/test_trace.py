@@ -0,0 +1,111 @@
+"""
+Author: weijay
+Date: 2026-10-18 17:05:41
+LastEditors: weijay
+LastEditTime: 2026-10-18 17:05:41
+Description: Trace 模組 單元測試
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from booflow.trace import Trace
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.trace = Trace("run")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _attempt(self, attempt: int, start: float, end: float, failure_kind=None) -> dict:
+        t0 = self.trace._t0
+
+        return {
+            "attempt": attempt,
+            "start_time": t0 + start,
+            "end_time": t0 + end,
+            "returncode": 0 if failure_kind is None else 1,
+            "failure_kind": failure_kind,
+        }
+
+    def _events(self, ph: str) -> list:
+        path = os.path.join(self.tmp_dir, "trace.json")
+        self.trace.save(path, [("A", "B"), ("A", "C"), ("B", "D")])
+
+        with open(path) as f:
+            data = json.load(f)
+
+        self.assertEqual(data["otherData"]["run_id"], "run")
+
+        return [i for i in data["traceEvents"] if i["ph"] == ph]
+
+    def test_lanes(self):
+        # A 與 B 同時執行，C 在 A 結束後重複使用 A 的軌道
+        self.assertEqual(self.trace.start("A"), 0)
+        self.assertEqual(self.trace.start("B"), 1)
+
+        self.trace.finish("A", self._attempt(1, 0, 1), (True, None, None))
+
+        self.assertEqual(self.trace.start("C"), 0)
+
+        self.trace.finish("C", self._attempt(1, 1, 2), (True, None, None))
+        self.trace.finish("B", self._attempt(1, 0, 3), (True, None, None))
+
+        spans = {i["name"]: i for i in self._events("X")}
+
+        self.assertEqual({i: spans[i]["tid"] for i in spans}, {"A": 0, "B": 1, "C": 0})
+        self.assertAlmostEqual(spans["B"]["dur"], 3e6)
+        self.assertEqual(len([i for i in self._events("M") if i["name"] == "thread_name"]), 2)
+
+    def test_retry_and_timeout(self):
+        self.trace.start("A")
+        self.trace.finish("A", self._attempt(1, 0, 1, "time out"), (False, "time out", None))
+        self.trace.retry("A", 0.5)
+
+        self.trace.start("A")
+        self.trace.finish("A", self._attempt(2, 1.5, 2), (True, None, None))
+
+        self.assertEqual([i["args"]["attempt"] for i in self._events("X")], [1, 2])
+
+        instants = self._events("i")
+
+        self.assertEqual([i["name"] for i in instants], ["time out", "retry"])
+        self.assertEqual(instants[1]["args"], {"task": "A", "delay": 0.5})
+        self.assertAlmostEqual(instants[1]["ts"], 1e6)
+
+    def test_skip(self):
+        self.trace.start("A")
+        self.trace.finish("A", None, (True, None, None), skipped=True)
+
+        self.assertEqual(self._events("X"), [])
+        self.assertEqual([i["name"] for i in self._events("i")], ["skip"])
+
+    def test_flows(self):
+        self.trace.start("A")
+        self.trace.finish("A", self._attempt(1, 0, 1), (True, None, None))
+
+        self.trace.start("B")
+        self.trace.start("C")
+        self.trace.finish("B", self._attempt(1, 1, 2), (True, None, None))
+        self.trace.finish("C", self._attempt(1, 1, 3), (True, None, None))
+
+        starts = self._events("s")
+        finishes = self._events("f")
+
+        # D 沒有執行，所以不會有 B -> D 的箭頭
+        self.assertEqual(len(starts), 2)
+        self.assertEqual([i["id"] for i in starts], [i["id"] for i in finishes])
+
+        self.assertTrue(all(i["tid"] == 0 and i["ts"] < 1e6 for i in starts))
+        self.assertEqual(sorted(i["tid"] for i in finishes), [0, 1])
+        self.assertTrue(all(i["ts"] == 1e6 for i in finishes))
+
+
+if __name__ == "__main__":
+    unittest.main()
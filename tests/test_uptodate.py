@@ -0,0 +1,100 @@
+"""
+Author: weijay
+Date: 2026-10-18 11:02:45
+LastEditors: weijay
+LastEditTime: 2026-10-18 11:02:45
+Description: UpToDateCache 模組 單元測試
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from booflow.uptodate import UpToDateCache
+
+
+class TestUpToDateCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, "cache.json")
+
+        self.input_file = os.path.join(self.tmp_dir, "input.txt")
+        self.output_file = os.path.join(self.tmp_dir, "output.txt")
+
+        with open(self.input_file, "w") as f:
+            f.write("hello")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_check(self):
+        cache = UpToDateCache(self.cache_file)
+
+        up_to_date, fingerprint = cache.check("A", "cmd", [self.input_file], [self.output_file])
+
+        self.assertFalse(up_to_date)
+
+        cache.update("A", fingerprint)
+        cache.save()
+
+        # 輸出檔案不存在
+        self.assertFalse(UpToDateCache(self.cache_file).check("A", "cmd", [self.input_file], [self.output_file])[0])
+
+        with open(self.output_file, "w") as f:
+            f.write("out")
+
+        self.assertTrue(UpToDateCache(self.cache_file).check("A", "cmd", [self.input_file], [self.output_file])[0])
+
+        # 指令改變
+        self.assertFalse(UpToDateCache(self.cache_file).check("A", "cmd2", [self.input_file], [self.output_file])[0])
+
+        # 輸入檔案內容改變
+        with open(self.input_file, "w") as f:
+            f.write("world")
+
+        self.assertFalse(UpToDateCache(self.cache_file).check("A", "cmd", [self.input_file], [self.output_file])[0])
+
+    def test_glob_inputs(self):
+        cache = UpToDateCache(self.cache_file)
+
+        fingerprint = cache.fingerprint("cmd", [os.path.join(self.tmp_dir, "*.txt")])
+
+        with open(os.path.join(self.tmp_dir, "new.txt"), "w") as f:
+            f.write("new")
+
+        self.assertNotEqual(fingerprint, cache.fingerprint("cmd", [os.path.join(self.tmp_dir, "*.txt")]))
+
+    def test_directory_inputs(self):
+        cache = UpToDateCache(self.cache_file)
+
+        # src/** 也會符合 src/ 與 src/sub/ 資料夾，只保留一般檔案
+        os.makedirs(os.path.join(self.tmp_dir, "src", "sub"))
+
+        with open(os.path.join(self.tmp_dir, "src", "sub", "a.py"), "w") as f:
+            f.write("a")
+
+        pattern = os.path.join(self.tmp_dir, "src", "**")
+
+        self.assertEqual(cache.expand([pattern]), [os.path.join(self.tmp_dir, "src", "sub", "a.py")])
+
+        _, fingerprint = cache.check("A", "cmd", [pattern], [])
+        self.assertIsNotNone(fingerprint)
+
+        # 無法讀取的輸入 (直接指定資料夾) 不會讓執行中斷，任務一定會重新執行
+        cache.update("A", "previous")
+
+        self.assertEqual(cache.file_hash(os.path.join(self.tmp_dir, "src")), UpToDateCache.UNREADABLE)
+        self.assertEqual(cache.check("A", "cmd", [os.path.join(self.tmp_dir, "src")], []), (False, None))
+
+    def test_file_hash_fast_path(self):
+        cache = UpToDateCache(self.cache_file)
+
+        digest = cache.file_hash(self.input_file)
+
+        # mtime 與檔案大小沒有改變時，不會重新讀取檔案
+        with mock.patch("builtins.open", side_effect=AssertionError("should not read")):
+            self.assertEqual(cache.file_hash(self.input_file), digest)
+
+        self.assertIsNone(cache.file_hash(os.path.join(self.tmp_dir, "missing.txt")))
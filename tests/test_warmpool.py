@@ -0,0 +1,89 @@
+"""
+Author: weijay
+Date: 2026-10-18 19:05:13
+LastEditors: weijay
+LastEditTime: 2026-10-18 19:05:13
+Description: WarmPool 模組 單元測試
+"""
+
+import os
+import signal
+import tempfile
+import unittest
+
+from booflow import Cron
+from booflow.warmpool import WarmPool, WarmProcess, is_python_script
+
+TEST_CASE_PREFIX = "./tests/test_case"
+
+
+class TestWarmPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = WarmPool(size=2, preload=["decimal"])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def run_cron(self, command: str, **config) -> Cron:
+        cron = Cron({"task_name": "task", "command": command, **config})
+        cron.warm_pool = self.pool
+
+        self.assertTrue(cron.uses_warm_pool)
+
+        cron.result = cron.run()
+
+        return cron
+
+    def test_is_python_script(self):
+        self.assertTrue(is_python_script(["python3", "task.py"]))
+        self.assertTrue(is_python_script(["/usr/bin/python3.11", "task.py", "-v"]))
+        self.assertFalse(is_python_script(["python3", "-m", "task"]))
+        self.assertFalse(is_python_script(["python3"]))
+        self.assertFalse(is_python_script(["bash", "task.py"]))
+
+    def test_spawn(self):
+        with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+            proc = self.pool.spawn(["python3", f"{TEST_CASE_PREFIX}/case7.py", "3", "a b"], stdout_file, stderr_file)
+
+            self.assertIsInstance(proc, WarmProcess)
+            self.assertEqual(proc.wait(), 3)
+            self.assertIsNotNone(proc.rusage)
+
+            stdout_file.seek(0)
+
+            self.assertEqual(stdout_file.read().decode(), "['3', 'a b'] True __main__\n")
+
+    def test_run_with_cron(self):
+        cron = self.run_cron(f"python3 {TEST_CASE_PREFIX}/case7.py 0")
+
+        self.assertEqual(cron.result, (True, None, "['0'] True __main__"))
+        self.assertEqual(cron.attempts[0]["returncode"], 0)
+
+        cron = self.run_cron(f"python3 {TEST_CASE_PREFIX}/case2.py")
+
+        self.assertEqual(cron.result[1], "program error")
+        self.assertTrue(cron.result[2].startswith('Traceback (most recent call last):  File "./tests/test_case/case2.py"'))
+        self.assertEqual(cron.attempts[0]["returncode"], 1)
+
+    def test_timeout(self):
+        cron = self.run_cron(f"python3 {TEST_CASE_PREFIX}/case3.py", timeout=0.3)
+
+        self.assertEqual(cron.result, (False, "time out", None))
+        self.assertEqual(cron.attempts[0]["returncode"], -signal.SIGTERM)
+
+    def test_restart_dead_zygote(self):
+        for zygote in list(self.pool._zygotes):
+            os.kill(zygote.proc.pid, signal.SIGKILL)
+            zygote.proc.wait()
+
+        # 第一次使用到已經結束的 zygote 時會失敗並重新啟動
+        results = [self.run_cron(f"python3 {TEST_CASE_PREFIX}/case7.py 0").result for _ in range(4)]
+
+        self.assertEqual(results[:2], [(False, "unknow error", "warm pool 的直譯器意外結束")] * 2)
+        self.assertEqual(results[2:], [(True, None, "['0'] True __main__")] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
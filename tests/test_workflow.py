@@ -0,0 +1,156 @@
+"""
+Author: weijay
+Date: 2026-10-18 19:12:08
+LastEditors: weijay
+LastEditTime: 2026-10-18 19:12:08
+Description: workflow 模組 單元測試
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from booflow import Task
+from booflow import workflow
+from booflow.workflow import WorkflowError, compile_workflow, select_workflow
+
+
+class TestWorkflow(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, "plan.pickle")
+
+        self.tasks = [{"task_name": i, "command": "true"} for i in "ABCDE"]
+        self.order = [("A", "B"), ("A", "C"), ("B", "D"), ("C", "D")]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_compile(self):
+        compiled = compile_workflow(self.tasks, self.order)
+
+        self.assertEqual(compiled.names, ("A", "B", "C", "D", "E"))
+        self.assertEqual([compiled.names[i] for i in compiled.topo_order], ["A", "E", "B", "C", "D"])
+        self.assertIsNone(compiled.digest)
+
+        # E 沒有出現在任務順序中
+        self.assertEqual(compiled.warnings, ("任務 ['E'] 沒有出現在任務順序中，會當作沒有依賴關係的獨立任務執行",))
+
+        # 不可變更
+        with self.assertRaises(AttributeError):
+            compiled.names = ()
+
+        # 使用編譯結果建立的 Task 與直接建立的結果相同
+        task_obj = Task(self.order, compiled=compiled)
+        order = []
+
+        while not task_obj.is_empty:
+            task_name = task_obj.next
+            order.append(task_name)
+            task_obj.report(task_name, True)
+
+        self.assertEqual(order, ["A", "E", "B", "C", "D"])
+
+        # 執行時不會改變編譯結果
+        task_obj.reset()
+        self.assertEqual(list(compiled.indegree), [0, 1, 1, 2, 0])
+
+    def test_errors(self):
+        tasks = self.tasks + [{"task_name": "A", "command": "echo"}, {"task_name": "F"}]
+        order = self.order + [("D", "B"), ("C", "X"), ("A", "B", "C")]
+
+        with self.assertRaises(WorkflowError) as cm:
+            compile_workflow(tasks, order)
+
+        errors = cm.exception.errors
+
+        self.assertEqual(len(errors), 5)
+        self.assertIn("第 6 個任務沒有 task_name 或 command", errors[0])
+        self.assertEqual(errors[1], "任務名稱重複: ['A']")
+        self.assertIn("錯誤的任務順序: [('A', 'B', 'C')]", errors[2])
+        self.assertEqual(errors[3], "任務順序中有不在任務清單中的任務: ['X']")
+        self.assertEqual(errors[4], "任務順序中有循環: B -> D -> B")
+        self.assertEqual(cm.exception.cycle, ["B", "D", "B"])
+
+        self.assertIsInstance(cm.exception, ValueError)
+        self.assertIn("任務名稱重複", str(cm.exception))
+
+    def test_self_loop(self):
+        with self.assertRaises(WorkflowError) as cm:
+            compile_workflow(self.tasks, [("A", "A")])
+
+        self.assertEqual(cm.exception.cycle, ["A", "A"])
+
+    def test_cache(self):
+        compiled = compile_workflow(self.tasks, self.order, cache_file=self.cache_file)
+
+        self.assertTrue(os.path.exists(self.cache_file))
+        self.assertIsNotNone(compiled.digest)
+
+        # 流程定義沒有改變時直接讀取快取，不會重新編譯
+        with mock.patch.object(workflow, "_compile", side_effect=AssertionError("不應該重新編譯")):
+            cached = compile_workflow(self.tasks, self.order, cache_file=self.cache_file)
+
+        self.assertEqual(cached, compiled)
+
+        # 任務設定改變時重新編譯
+        tasks = self.tasks[:4] + [{"task_name": "E", "command": "true", "timeout": 10}]
+
+        changed = compile_workflow(tasks, self.order, cache_file=self.cache_file)
+
+        self.assertNotEqual(changed.digest, compiled.digest)
+
+        with open(self.cache_file, "rb") as f:
+            self.assertEqual(pickle.load(f)[0], changed.digest)
+
+    def test_broken_cache(self):
+        with open(self.cache_file, "wb") as f:
+            f.write(b"broken")
+
+        compiled = compile_workflow(self.tasks, self.order, cache_file=self.cache_file)
+
+        self.assertEqual(compiled.names, ("A", "B", "C", "D", "E"))
+
+
+    def select(self, **kwargs):
+        tasks = [{"task_name": i, "command": "true"} for i in "ABCDEF"]
+        order = [("A", "B"), ("B", "D"), ("C", "D"), ("D", "E"), ("F",)]
+
+        compiled = compile_workflow(tasks, order)
+        selected_tasks, selected_order = select_workflow(compiled, tasks, order, **kwargs)
+
+        return [i["task_name"] for i in selected_tasks], selected_order
+
+    def test_select(self):
+        cases = [
+            ({}, "ABCDEF", [("A", "B"), ("B", "D"), ("C", "D"), ("D", "E"), ("F",)]),
+            ({"targets": ["D"]}, "ABCD", [("A", "B"), ("B", "D"), ("C", "D")]),
+            ({"start_from": ["B"]}, "BDE", [("B", "D"), ("D", "E")]),
+            ({"targets": ["D"], "start_from": ["B"]}, "BD", [("B", "D")]),
+            # 只經由被排除的任務才會被選到的任務也不會執行
+            ({"targets": ["D"], "exclude": ["B"]}, "CD", [("C", "D")]),
+            ({"start_from": ["A"], "exclude": ["D"]}, "AB", [("A", "B")]),
+            # 上下游任務都沒有被選到的任務改為獨立任務
+            ({"exclude": ["B", "D"]}, "ACEF", [("F",), ("A",), ("C",), ("E",)]),
+            ({"targets": ["F", "C"]}, "CF", [("F",), ("C",)]),
+        ]
+
+        for kwargs, names, order in cases:
+            with self.subTest(**kwargs):
+                self.assertEqual(self.select(**kwargs), (list(names), order))
+
+    def test_select_unknown(self):
+        with self.assertRaises(WorkflowError) as cm:
+            self.select(targets=["X"], exclude=["Y", "A"])
+
+        self.assertEqual(
+            cm.exception.errors,
+            ["targets 中有不在流程中的任務: ['X']", "exclude 中有不在流程中的任務: ['Y']"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()